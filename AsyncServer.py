@@ -0,0 +1,221 @@
+import asyncio, socket, struct, sys, errno, logging
+from ServerWorker import ServerWorker, HAS_SENDMSG, openPortPair
+from RtspParser import RtspParseError
+from SessionRegistry import SessionRegistry
+from Rtcp import parseRtcp
+
+logger = logging.getLogger(__name__)
+
+# fila de erros do socket (Linux): guarda cada datagrama recusado com o endereço de destino
+HAS_ERRQUEUE = sys.platform.startswith('linux') and hasattr(socket, 'MSG_ERRQUEUE')
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+
+class AsyncServerWorker(ServerWorker):
+    """Sessão RTSP servida pelo laço de eventos (sem threads por cliente).
+
+    Reaproveita a máquina de estados de `ServerWorker`; troca apenas o
+    transporte das respostas RTSP e o agendamento dos quadros, que passa a
+    usar timers do laço de eventos e um transporte UDP compartilhado.
+    """
+
+    def __init__(self, clientInfo, loop, rtpTransport, rtpSocket, rtcp):
+        super().__init__(clientInfo)
+        self.loop = loop
+        self.rtpTransport = rtpTransport
+        self.rtpSocket = rtpSocket
+        self.rtp = rtpTransport.get_protocol()
+        self.rtcp = rtcp
+
+    def sendRtspReply(self, reply):
+        self.clientInfo['rtspTransport'].write(reply.encode('utf-8'))
+
+    def closeConnection(self):
+        self.clientInfo['rtspTransport'].close()
+
+    def localAddress(self):
+        return self.clientInfo['rtspTransport'].get_extra_info('sockname')[0]
+
+    def expire(self, reason):
+        # o coletor roda em outra thread: a sessão só é mexida dentro do laço
+        self.loop.call_soon_threadsafe(super().expire, reason)
+
+    def openRtp(self):
+        # o transporte UDP é do servidor, não da sessão; só registra o destino para os erros ICMP
+        self.rtp.destinations[self.rtpAddress()] = self
+
+    def closeRtp(self):
+        self.rtcp.sessions.pop(self.ssrc, None)
+        if 'rtpPort' in self.clientInfo and self.rtp.destinations.get(self.rtpAddress()) is self:
+            del self.rtp.destinations[self.rtpAddress()]
+
+    def openRtcp(self):
+        # os relatórios chegam pelo socket RTCP do servidor e são entregues pelo SSRC
+        self.rtcp.sessions[self.ssrc] = self
+
+    def pollRtcp(self):
+        pass
+
+    def serverPorts(self):
+        return (self.rtpSocket.getsockname()[1], self.rtcp.port)
+
+    def now(self):
+        return self.loop.time()
+
+    def scheduleAt(self, deadline, callback):
+        """Prazos viram timers do próprio laço de eventos."""
+        self.loop.call_at(deadline, callback)
+
+    def clock(self):
+        return self.loop.time, self.loop.call_at
+
+    def sendPackets(self, packets):
+        """Envia direto pelo socket (scatter-gather) enquanto o transporte não tiver fila."""
+        address = self.rtpAddress()
+        rtpSocket = self.rtpSocket
+        for i, (header, payload) in enumerate(packets):
+            if not HAS_SENDMSG or self.rtpTransport.get_write_buffer_size():
+                break
+            try:
+                rtpSocket.sendmsg((header, payload), (), 0, address)
+            except (BlockingIOError, InterruptedError):
+                break
+            except ConnectionRefusedError:
+                # erro pendente de um envio anterior, talvez de outra sessão: vai para quem recusou
+                self.rtp.errorReceived()
+                break
+        else:
+            return
+
+        # socket cheio: o restante fica na fila do transporte, preservando a ordem
+        for header, payload in packets[i:]:
+            self.rtpTransport.sendto(b"".join((header, payload)), address)
+
+class RtpProtocol(asyncio.DatagramProtocol):
+    """Socket RTP compartilhado: atribui cada ICMP "porta inalcançável" à sessão de destino.
+
+    O erro de um socket não conectado não diz o destino; com `IP_RECVERR`
+    o kernel guarda na fila de erros cada datagrama recusado e para onde
+    ele ia. Sem isso (fora do Linux), a sessão só expira pelo timeout.
+    """
+
+    def __init__(self, rtpSocket):
+        self.rtpSocket = rtpSocket
+        self.destinations = {}     # (IP, porta RTP) -> AsyncServerWorker
+
+    def error_received(self, exc):
+        # recvfrom/sendto do transporte devolveram o erro pendente
+        self.errorReceived()
+
+    def errorReceived(self):
+        """Esvazia a fila de erros, contando cada recusa na sessão do destino."""
+        if not HAS_ERRQUEUE:
+            return
+        while True:
+            try:
+                _, ancdata, _, address = self.rtpSocket.recvmsg(1, 512, socket.MSG_ERRQUEUE)
+            except OSError:
+                return
+            for level, type, data in ancdata:
+                if level != socket.IPPROTO_IP or type != IP_RECVERR:
+                    continue
+                # sock_extended_err começa pelo errno
+                if struct.unpack_from('=I', data)[0] == errno.ECONNREFUSED:
+                    worker = self.destinations.get(address)
+                    if worker is not None:
+                        worker.rtpRefused()
+
+class RtcpProtocol(asyncio.DatagramProtocol):
+    """Socket RTCP compartilhado: entrega cada relatório à sessão do SSRC relatado."""
+
+    def __init__(self):
+        self.sessions = {}     # SSRC -> AsyncServerWorker
+        self.port = 0
+
+    def connection_made(self, transport):
+        self.port = transport.get_extra_info('sockname')[1]
+
+    def datagram_received(self, data, addr):
+        for block in parseRtcp(data):
+            worker = self.sessions.get(block['ssrc'])
+            if worker is not None:
+                worker.handleRtcp(block)
+
+class RtspProtocol(asyncio.Protocol):
+    """Conexão de controle RTSP de um cliente."""
+
+    def __init__(self, loop, rtpTransport, rtpSocket, rtcp, connections):
+        self.loop = loop
+        self.rtpTransport = rtpTransport
+        self.rtpSocket = rtpSocket
+        self.rtcp = rtcp
+        self.connections = connections
+        self.worker = None
+
+    def connection_made(self, transport):
+        self.connections.add(self)
+        clientInfo = {}
+        clientInfo['rtspTransport'] = transport
+        clientInfo['rtspSocket'] = (None, transport.get_extra_info('peername'))
+        self.worker = AsyncServerWorker(clientInfo, self.loop, self.rtpTransport, self.rtpSocket, self.rtcp)
+        SessionRegistry.shared().register(self.worker)
+
+    def data_received(self, data):
+        try:
+            self.worker.rtspDataReceived(data)
+        except RtspParseError as e:
+            logger.warning("Requisição RTSP inválida: %s", e)
+            self.worker.clientInfo['rtspTransport'].close()
+        except Exception as e:
+            logger.warning("Erro ao processar RTSP: %s", e)
+
+    def connection_lost(self, exc):
+        self.connections.discard(self)
+        self.worker.releaseSession()
+        SessionRegistry.shared().unregister(self.worker)
+
+class AsyncServer:
+    """Servidor RTSP/RTP em um único laço asyncio."""
+
+    def __init__(self, port, listenSocket=None, reusePort=False):
+        self.port = port
+        self.listenSocket = listenSocket    # socket já em escuta, herdado do processo pai
+        self.reusePort = reusePort
+        self.connections = set()
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+
+        # um único par de sockets UDP (RTP par, RTCP = RTP + 1) atende todas as sessões
+        rtpSocket, rtcpSocket = openPortPair("0.0.0.0")
+        rtpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        rtpSocket.setblocking(False)
+        rtcpSocket.setblocking(False)
+        if HAS_ERRQUEUE:
+            rtpSocket.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        rtpTransport, _ = await loop.create_datagram_endpoint(lambda: RtpProtocol(rtpSocket), sock=rtpSocket)
+        rtcpTransport, rtcp = await loop.create_datagram_endpoint(RtcpProtocol, sock=rtcpSocket)
+
+        factory = lambda: RtspProtocol(loop, rtpTransport, rtpSocket, rtcp, self.connections)
+        if self.listenSocket is not None:
+            server = await loop.create_server(factory, sock=self.listenSocket, backlog=1024)
+        else:
+            server = await loop.create_server(factory, "", self.port, backlog=1024,
+                                              reuse_port=self.reusePort or None)
+
+        logger.info("Servidor RTSP (asyncio) ouvindo na porta %d...", self.port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            # desligamento: encerra as sessões abertas
+            for protocol in list(self.connections):
+                protocol.worker.stopRtp()
+                protocol.worker.clientInfo['rtspTransport'].close()
+            rtpTransport.close()
+            rtcpTransport.close()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,256 @@
+import os, socket, threading, ipaddress, logging
+from random import randint
+from VideoStream import VideoStream
+from FrameCache import FrameCache
+from MediaCatalog import MediaCatalog
+from Rfc2435 import Rfc2435Packetizer
+from FramePacketizer import packetizeFrame, planBursts, MAX_RTP_PAYLOAD, CLOCK_RATE
+
+logger = logging.getLogger(__name__)
+
+# grupos de escopo administrativo (RFC 2365): um por arquivo, a partir deste
+MULTICAST_GROUP = '239.255.42.1'
+MULTICAST_PORT = 5004
+MULTICAST_TTL = 1
+
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+class BroadcastChannel:
+    """Um arquivo transmitido ao vivo para todas as sessões que o assistem.
+
+    Cada quadro é lido, fragmentado e empacotado uma única vez. No multicast
+    os pacotes saem uma vez para o grupo; na distribuição unicast os mesmos
+    payloads (fatias do quadro) vão para cada sessão, só com o SSRC e a
+    sequência dela regravados no cabeçalho, o que mantém RTCP, NACK e a
+    adaptação de taxa por sessão. O arquivo recomeça quando acaba.
+    """
+
+    def __init__(self, hub, path, group, now, scheduleAt, interface=None):
+        # `now`/`scheduleAt` são do motor (escalonador ou laço de eventos), nunca de uma
+        # sessão: o canal sobrevive a quem o criou
+        self.hub = hub
+        self.path = path
+        self.group = group            # (endereço, porta) do multicast, ou None para unicast
+        self.now = now
+        self.scheduleAt = scheduleAt
+        self.stream = VideoStream(path, FrameCache.active())
+        self.stream.startPrefetch()
+        self.frameInterval = 1.0 / self.stream.frameRate()
+        self.ssrc = randint(1, 0xFFFFFFFF)
+        self.rtpSeq = randint(0, 0xFFFF)
+        self.timestampBase = randint(0, 0xFFFFFFFF)
+        self.jpeg = Rfc2435Packetizer(MAX_RTP_PAYLOAD)
+        self.members = set()          # sessões com SETUP feito
+        self.active = set()           # sessões em PLAY
+        self.frames = 0               # quadros transmitidos: relógio de mídia do canal
+        self.event = None             # evento do laço de envio em curso
+        self.socket = None
+        if group is not None:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1024 * 1024)
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, hub.ttl)
+            if interface:
+                # sai pela interface em que os clientes falam RTSP (127.0.0.1 nos testes)
+                self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+
+    def transportHeader(self):
+        """Transport da resposta ao SETUP no multicast."""
+        address, port = self.group
+        return (f"Transport: RTP/AVP;multicast;destination={address};port={port}-{port + 1};"
+                f"ttl={self.hub.ttl};ssrc={self.ssrc:08X}\r\n")
+
+    def start(self):
+        """Começa (ou retoma) a transmissão; chamado sob `hub.lock`."""
+        if self.event is None:
+            self.event = threading.Event()
+            logger.info("Canal %s no ar (%s)", self.path,
+                        "multicast %s:%d" % self.group if self.group else "unicast")
+            event = self.event
+            self.scheduleAt(self.now(), lambda: self.sendNextFrame(self.now(), event))
+
+    def stop(self):
+        """Suspende a transmissão; chamado sob `hub.lock`."""
+        if self.event is not None:
+            self.event.set()
+            self.event = None
+            logger.info("Canal %s suspenso: ninguém assistindo", self.path)
+
+    def close(self):
+        self.stop()
+        # fechados no escalonador, depois de alguma rajada ainda em andamento
+        self.scheduleAt(self.now(), self.stream.close)
+        if self.socket is not None:
+            self.scheduleAt(self.now(), self.socket.close)
+
+    def mediaTimestamp(self, frameNumber):
+        ticks = round((frameNumber - 1) * CLOCK_RATE / self.stream.frameRate())
+        return (self.timestampBase + ticks) & 0xFFFFFFFF
+
+    def makeRtpPackets(self, frame, frameNumber):
+        """Pacotes do quadro com o SSRC e a sequência do canal."""
+        # `frameNumber` é o relógio do canal; o quadro acabado de ler no arquivo é o anterior ao atual
+        packets = packetizeFrame(self.stream, self.stream.frameNbr() - 1, frame, self.rtpSeq, self.ssrc,
+                                 self.mediaTimestamp(frameNumber), self.jpeg)
+        self.rtpSeq = (self.rtpSeq + len(packets)) & 0xFFFF
+        return packets
+
+    def sendNextFrame(self, deadline, event):
+        """Empacota o quadro uma vez e o distribui em rajadas; agenda o próximo."""
+        if event.isSet():
+            return
+        frame = self.stream.nextFrame()
+        if frame is None:
+            # fim do arquivo: o canal ao vivo recomeça do início
+            self.stream.rewind()
+            frame = self.stream.nextFrame()
+            if frame is None:
+                return
+        self.frames += 1
+        packets = self.makeRtpPackets(frame, self.frames)
+
+        if self.group is not None:
+            targets = []
+        else:
+            with self.hub.lock:
+                workers = list(self.active)
+            # cada sessão decide se recebe o quadro (adaptação de taxa) e regrava SSRC/sequência
+            targets = []
+            for worker in workers:
+                own = worker.prepareBroadcast(packets, self.frames)
+                if own is not None:
+                    targets.append((worker, own))
+
+        for when, burst in planBursts(len(packets), deadline, self.frameInterval):
+            if when <= deadline:
+                self.sendBurst(packets, targets, burst, event)
+            else:
+                self.scheduleAt(when, lambda burst=burst: self.sendBurst(packets, targets, burst, event))
+
+        nextDeadline = deadline + self.frameInterval
+        now = self.now()
+        if now - nextDeadline > self.frameInterval:
+            nextDeadline = now
+        self.scheduleAt(nextDeadline, lambda: self.sendNextFrame(nextDeadline, event))
+
+    def sendBurst(self, packets, targets, burst, event):
+        """Envia a fatia `burst` do quadro ao grupo ou, com as cópias de cada sessão, a cada uma."""
+        if event.isSet():
+            return
+        if self.group is not None:
+            self.sendGroup(packets[burst])
+        for worker, own in targets:
+            worker.sendBurst(own[burst], worker.clientInfo['event'])
+
+    def sendGroup(self, packets):
+        """Uma cópia de cada pacote para o grupo multicast, sirva a quantos servir."""
+        try:
+            for header, payload in packets:
+                if HAS_SENDMSG:
+                    self.socket.sendmsg((header, payload), (), 0, self.group)
+                else:
+                    self.socket.sendto(b"".join((header, payload)), self.group)
+        except OSError as e:
+            logger.warning("Erro envio multicast %s:%d: %s", self.group[0], self.group[1], e)
+
+class BroadcastHub:
+    """Canais ao vivo do processo, um por arquivo, compartilhados pelas sessões.
+
+    Com o modo `unicast` ou `multicast` ativo, o SETUP de um arquivo entra
+    no canal dele (criado sob demanda) em vez de abrir um `VideoStream`
+    próprio; o canal para quando ninguém está em PLAY e é desfeito quando
+    sai a última sessão. Assim o custo de leitura e empacotamento cresce
+    com o número de arquivos, não de espectadores.
+    """
+
+    OFF = 'off'
+    UNICAST = 'unicast'
+    MULTICAST = 'multicast'
+
+    mode = OFF
+    groupBase = MULTICAST_GROUP
+    port = MULTICAST_PORT
+    ttl = MULTICAST_TTL
+    _shared = None
+    _sharedLock = threading.Lock()
+
+    @classmethod
+    def configure(cls, mode=OFF, groupBase=MULTICAST_GROUP, port=MULTICAST_PORT, ttl=MULTICAST_TTL):
+        cls.mode = mode
+        cls.groupBase = groupBase
+        cls.port = port
+        cls.ttl = ttl
+
+    @classmethod
+    def shared(cls):
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}      # caminho real -> canal
+        self.groups = {}        # caminho real -> endereço do grupo (fixo enquanto o processo vive)
+
+    def enabled(self):
+        return self.mode != self.OFF
+
+    def groupFor(self, path):
+        """(endereço, porta) do grupo multicast do arquivo; chamado sob `lock`."""
+        address = self.groups.get(path)
+        if address is None:
+            address = str(ipaddress.IPv4Address(self.groupBase) + len(self.groups))
+            self.groups[path] = address
+        return (address, self.port)
+
+    def describeGroup(self, filename):
+        """(endereço, porta, ttl) anunciados no SDP do DESCRIBE, ou `None` sem multicast."""
+        if self.mode != self.MULTICAST:
+            return None
+        path = MediaCatalog.shared().resolve(filename)
+        if path is None:
+            return None
+        with self.lock:
+            address, port = self.groupFor(path)
+        return (address, port, self.ttl)
+
+    def join(self, filename, worker):
+        """Canal do arquivo (criado se preciso) com `worker` como membro; `IOError` se não existir."""
+        path = MediaCatalog.shared().resolve(filename)
+        if path is None or not os.path.isfile(path):
+            raise IOError("arquivo não encontrado: %s" % filename)
+        with self.lock:
+            channel = self.channels.get(path)
+            if channel is None:
+                group = self.groupFor(path) if self.mode == self.MULTICAST else None
+                now, scheduleAt = worker.clock()
+                channel = BroadcastChannel(self, path, group, now, scheduleAt, worker.localAddress())
+                self.channels[path] = channel
+            channel.members.add(worker)
+        return channel
+
+    def activate(self, channel, worker):
+        """Sessão em PLAY: o canal transmite enquanto houver alguma."""
+        with self.lock:
+            channel.active.add(worker)
+            # quem chega no meio precisa das tabelas de quantização antes do refresh
+            channel.jpeg.resendTables()
+            channel.start()
+
+    def deactivate(self, channel, worker):
+        with self.lock:
+            channel.active.discard(worker)
+            if not channel.active:
+                channel.stop()
+
+    def leave(self, channel, worker):
+        """Sessão encerrada: o canal sem membros é desfeito."""
+        with self.lock:
+            channel.members.discard(worker)
+            channel.active.discard(worker)
+            if not channel.active:
+                channel.stop()
+            if channel.members or self.channels.get(channel.path) is not channel:
+                return
+            del self.channels[channel.path]
+        channel.close()
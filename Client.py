@@ -1,11 +1,18 @@
 from tkinter import *
 import tkinter.messagebox as tkMessageBox
-from PIL import Image, ImageTk
-import socket, threading, sys, os
-from RtpPacket import RtpPacket
+from PIL import ImageTk
+import socket, threading, sys, os, random
+from RtpReceiver import RtpReceiver, openMulticastSocket
+from Rfc2435 import Rfc2435Reassembler
+from FrameDecoder import FrameDecoder
+from JitterBuffer import JitterBuffer
+from RtspParser import RtspParser
+from MediaCatalog import parseSdp
+from Rtcp import ReceptionStats, NackTracker, buildReceiverReport, buildNack, RTCP_INTERVAL
 
-CACHE_FILE_NAME = "cache-"
-CACHE_FILE_EXT = ".jpg"
+# tamanho da área de vídeo e intervalo de atualização da tela (ms)
+DISPLAY_SIZE = (640, 480)
+DISPLAY_POLL_MS = 10
 
 class Client:
     # Constantes de Estado
@@ -20,8 +27,9 @@ class Client:
     PAUSE = 2
     TEARDOWN = 3
     DESCRIBE = 4
+    KEEPALIVE = 5
     
-    def __init__(self, master, serveraddr, serverport, rtpport, filename):
+    def __init__(self, master, serveraddr, serverport, rtpport, filename, jitterDelay=0.1):
         self.master = master
         self.master.protocol("WM_DELETE_WINDOW", self.handler)
         self.createWidgets()
@@ -36,11 +44,27 @@ class Client:
         self.connectToServer()
         self.frameNbr = 0
         
-        # Buffer e Estatísticas
-        self.buffer = b"" 
-        self.packetsLost = 0
-        self.totalPackets = 0
-        self.lastSeqNum = 0
+        # Remontagem, buffer de reprodução, decodificação e Estatísticas
+        self.reassembler = Rfc2435Reassembler()
+        self.jitterBuffer = JitterBuffer(delay=jitterDelay)
+        self.decoder = FrameDecoder(DISPLAY_SIZE, source=self.jitterBuffer)
+        self.decoder.start()
+        self.master.after(DISPLAY_POLL_MS, self.refreshDisplay)
+        # recepção (RFC 3550) e relatórios RTCP para o servidor adaptar a taxa
+        self.reception = ReceptionStats()
+        self.nack = NackTracker()
+        self.ssrc = random.randint(1, 0xFFFFFFFF)
+        self.serverRtcpPort = None
+        self.rtcpSocket = None
+        self.receiver = None
+        self.lastReport = 0.0
+        self.sdp = {}     # atributos do último DESCRIBE
+        self.sessionTimeout = 60    # `;timeout=` do Session no SETUP
+        self.keepAliveTimer = None
+        # Range/Scale do próximo PLAY e busca pendente até o PAUSE ser confirmado
+        self.playStart = None
+        self.playScale = None
+        self.pendingSeek = None
         # Mapeia CSeq -> requestCode para corresponder replies independentemente da ordem
         self.requests = {}
         
@@ -70,9 +94,18 @@ class Client:
         self.label = Label(self.master, height=19)
         self.label.grid(row=0, column=0, columnspan=5, sticky=W+E+N+S, padx=5, pady=5) 
         
+        # Linha do tempo (busca com Range: npt=) e velocidade (Scale:)
+        self.timeline = Scale(self.master, from_=0, to=0, resolution=0.5, orient=HORIZONTAL, showvalue=1, label="Ir para (s)")
+        self.timeline.grid(row=2, column=0, columnspan=4, sticky=W+E, padx=5)
+        self.timeline.bind("<ButtonRelease-1>", lambda e: self.seekMovie(self.timeline.get()))
+        self.speed = StringVar(self.master, "1x")
+        self.speedMenu = OptionMenu(self.master, self.speed, "0.5x", "1x", "2x", "4x", "8x", "16x",
+                                    command=self.changeSpeed)
+        self.speedMenu.grid(row=2, column=4, padx=2, pady=2)
+
         # Barra de status
         self.statusLabel = Label(self.master, text="Estado: INIT - Aguardando Setup", bd=1, relief=SUNKEN, anchor=W)
-        self.statusLabel.grid(row=2, column=0, columnspan=5, sticky=W+E)
+        self.statusLabel.grid(row=3, column=0, columnspan=5, sticky=W+E)
         
         self.updateButtonStates()
 
@@ -113,84 +146,136 @@ class Client:
         self.master.after(100, self._destroy_window)
         
     def _destroy_window(self):
-        try:
-            self.master.destroy()
-            os.remove(CACHE_FILE_NAME + str(self.sessionId) + CACHE_FILE_EXT)
+        self.decoder.stop()
+        try: self.master.destroy()
         except: pass
 
     def pauseMovie(self):
         if self.state == self.PLAYING:
             self.sendRtspRequest(self.PAUSE)
     
-    def playMovie(self):
+    def seekMovie(self, start):
+        """Recomeça a reprodução em `start` segundos (`None`: do ponto atual) na velocidade escolhida.
+
+        Tocando, pausa antes e o novo PLAY sai quando o PAUSE for confirmado.
+        """
+        scale = float(self.speed.get().rstrip('x'))
+        if self.state == self.PLAYING:
+            self.pendingSeek = (start, scale)
+            self.pauseMovie()
+        elif self.state == self.READY:
+            self.playMovie(start, scale)
+
+    def changeSpeed(self, value):
+        """Nova velocidade no menu: tocando, vale já (do ponto atual); senão, no próximo Play."""
+        if self.state == self.PLAYING:
+            self.seekMovie(None)
+
+    def playMovie(self, start=None, scale=None):
+        """PLAY a partir de `start` segundos (senão, de onde parou), na velocidade `scale`."""
+        if scale is None:
+            scale = float(self.speed.get().rstrip('x'))
         if self.state == self.READY:
+            if self.receiver is None:
+                # o SETUP respondeu, mas a porta RTP (ou o grupo multicast) não abriu
+                tkMessageBox.showerror('Erro de Recepção', 'Sem porta RTP para receber o vídeo; use Teardown e abra o cliente de novo.')
+                return
+            self.playStart = start
+            self.playScale = scale if scale != 1 else None
+            # o relógio de reprodução recomeça a cada PLAY
+            self.reassembler.reset()
+            self.jitterBuffer.reset()
+            self.nack.reset()
+            # pacotes que chegaram depois do PAUSE não pertencem a este PLAY
+            self.receiver.flush()
             threading.Thread(target=self.listenRtp).start()
             self.playEvent = threading.Event()
             self.playEvent.clear()
             self.sendRtspRequest(self.PLAY)
     
     def listenRtp(self):        
-        """Recebe pacotes RTP e reconstrói quadros JPEG."""
+        """Consome os fragmentos da etapa de recepção e reconstrói quadros JPEG."""
+        receiver = self.receiver
         while True:
-            try:
-                # recebe pacote RTP
-                data = self.rtpSocket.recv(20480)
-                if data:
-                    rtpPacket = RtpPacket()
-                    rtpPacket.decode(data)
-                    
-                    # anexa payload ao buffer
-                    self.buffer += rtpPacket.getPayload()
-                    
-                    # procura marcadores JPEG (SOI/EOI)
-                    start = self.buffer.find(b'\xff\xd8')
-                    end = self.buffer.find(b'\xff\xd9')
-                    
-                    if start != -1 and end != -1 and end > start:
-                        # quadro completo: recorta, salva e atualiza GUI
-                        complete_frame = self.buffer[start : end + 2]
-                        self.buffer = self.buffer[end + 2:]
-                        self.updateMovie(self.writeFrame(complete_frame))
-                        
-                        # estatísticas de perda (baseado em seqNum)
-                        currSeq = rtpPacket.seqNum()
-                        if self.totalPackets > 0 and (currSeq - self.lastSeqNum) > 1:
-                             self.packetsLost += (currSeq - self.lastSeqNum - 1)
-                        self.lastSeqNum = currSeq
-                        self.totalPackets += 1
-                        
-                        loss = (self.packetsLost/self.totalPackets)*100 if self.totalPackets > 0 else 0
-                        # atualiza título com taxa de perda (thread-safe)
-                        self.master.after(0, lambda: self.master.title(f"StreamingService | Seq: {currSeq} |  Perda: {loss:.1f}%"))
-                        
-                    if len(self.buffer) > 500000: 
-                        print("Limpando buffer sujo.")
-                        self.buffer = b""
-
-            except:
+            batch = receiver.get(0.5)
+            if not batch:
                 if self.playEvent.isSet(): break
                 if self.teardownAcked == 1:
+                    receiver.stop()
                     try:
                         self.rtpSocket.shutdown(socket.SHUT_RDWR)
                         self.rtpSocket.close()
+                        self.rtcpSocket.close()
                     except: pass
                     break
+                continue
+
+            for index, start, end, currSeq, timestamp, marker, pt, ssrc, now in batch:
+                payload = receiver.take(index, start, end)
+
+                # estatísticas de perda e jitter, relatadas ao servidor por RTCP
+                self.reception.update(ssrc, currSeq, timestamp, now)
+                if now - self.lastReport >= RTCP_INTERVAL:
+                    self.sendReceiverReport(now)
+                # lacunas viram pedidos de reenvio (NACK)
+                self.nack.onPacket(currSeq, now)
+                missing = self.nack.due(now)
+                if missing:
+                    self.sendRtcp(buildNack(self.ssrc, ssrc, missing))
+
+                # fragmentos de um quadro compartilham o timestamp RTP
+                complete_frame = self.reassembler.push(timestamp, currSeq, marker, payload, pt)
+
+                if complete_frame is not None:
+                    # quadro completo: exibido no instante do seu timestamp
+                    self.jitterBuffer.put(timestamp, complete_frame)
+
+                    loss = self.reception.lossRatio() * 100
+                    dropped = self.reassembler.dropped
+                    jb = self.jitterBuffer.stats()
+                    # atualiza título com taxa de perda (thread-safe)
+                    self.master.after(0, lambda currSeq=currSeq: self.master.title(
+                        f"StreamingService | Seq: {currSeq} |  Perda: {loss:.1f}% | Descartados: {dropped + jb['discarded']}"
+                        f" | Atrasados: {jb['late']} | Buffer: {jb['delay'] * 1000:.0f} ms"))
                     
-    def writeFrame(self, data):
-        """Grava quadro JPEG em arquivo temporário e retorna o caminho."""
-        cachename = CACHE_FILE_NAME + str(self.sessionId) + CACHE_FILE_EXT
+    def scheduleKeepAlive(self):
+        """Renova a sessão a cada metade do timeout enquanto ela existir."""
+        if self.keepAliveTimer is not None:
+            self.master.after_cancel(self.keepAliveTimer)
+        self.keepAliveTimer = self.master.after(self.sessionTimeout * 500, self.keepAlive)
+
+    def keepAlive(self):
+        self.keepAliveTimer = None
+        if self.state == self.INIT:
+            return
+        self.sendRtspRequest(self.KEEPALIVE)
+        self.scheduleKeepAlive()
+
+    def sendReceiverReport(self, now):
+        """Envia um RR (perda, jitter, maior seq) à porta RTCP do servidor."""
+        self.lastReport = now
+        self.sendRtcp(buildReceiverReport(self.ssrc, [self.reception.report()]))
+
+    def sendRtcp(self, packet):
+        if self.rtcpSocket is None or self.serverRtcpPort is None:
+            return
         try:
-            file = open(cachename, "wb")
-            file.write(data)
-            file.close()
-        except: pass
-        return cachename
+            self.rtcpSocket.sendto(packet, (self.serverAddr, self.serverRtcpPort))
+        except OSError:
+            pass
+
+    def refreshDisplay(self):
+        """Laço do Tk: exibe o quadro decodificado mais recente, se houver."""
+        image = self.decoder.latest()
+        if image is not None:
+            self.updateMovie(image)
+        self.master.after(DISPLAY_POLL_MS, self.refreshDisplay)
     
-    def updateMovie(self, imageFile):
-        """Atualiza `Label` com a imagem do arquivo dado."""
+    def updateMovie(self, image):
+        """Atualiza `Label` com a imagem (PIL) já decodificada."""
         try:
-            photo = ImageTk.PhotoImage(Image.open(imageFile))
-            self.label.configure(image = photo, width=640,height=480) 
+            photo = ImageTk.PhotoImage(image)
+            self.label.configure(image = photo, width=DISPLAY_SIZE[0], height=DISPLAY_SIZE[1]) 
             self.label.image = photo
         except: pass
         
@@ -209,12 +294,16 @@ class Client:
         if requestCode == self.SETUP and self.state == self.INIT:
             # thread de recepção já iniciada em connectToServer
             self.rtspSeq += 1
-            request = f"SETUP {self.fileName} RTSP/1.0\r\nCSeq: {self.rtspSeq}\r\nTransport: RTP/AVP;unicast;client_port={self.rtpPort}\r\n"
+            request = f"SETUP {self.fileName} RTSP/1.0\r\nCSeq: {self.rtspSeq}\r\nTransport: RTP/AVP;unicast;client_port={self.rtpPort}-{self.rtpPort + 1}\r\n"
             self.requests[self.rtspSeq] = self.SETUP
             
         elif requestCode == self.PLAY and self.state == self.READY:
             self.rtspSeq += 1
             request = f"PLAY {self.fileName} RTSP/1.0\r\nCSeq: {self.rtspSeq}\r\nSession: {self.sessionId}\r\n"
+            if self.playStart is not None:
+                request += f"Range: npt={self.playStart:.3f}-\r\n"
+            if self.playScale is not None:
+                request += f"Scale: {self.playScale:g}\r\n"
             self.requests[self.rtspSeq] = self.PLAY
             
         elif requestCode == self.PAUSE and self.state == self.PLAYING:
@@ -233,17 +322,28 @@ class Client:
             request = f"DESCRIBE {self.fileName} RTSP/1.0\r\nCSeq: {self.rtspSeq}\r\nAccept: application/sdp\r\n"
             self.requests[self.rtspSeq] = self.DESCRIBE
             
+        # GET_PARAMETER vazio: mantém a sessão viva enquanto não chega RTCP (pausa, multicast)
+        elif requestCode == self.KEEPALIVE and self.state != self.INIT:
+            self.rtspSeq += 1
+            request = f"GET_PARAMETER {self.fileName} RTSP/1.0\r\nCSeq: {self.rtspSeq}\r\nSession: {self.sessionId}\r\n"
+            self.requests[self.rtspSeq] = self.KEEPALIVE
+            
         else: return
         
+        # linha em branco: fim do cabeçalho (o servidor lê as requisições de forma incremental)
+        request += "\r\n"
         self.rtspSocket.send(request.encode('utf-8'))
         print('\nDados enviados:\n' + request)
     
     def recvRtspReply(self):
         """Loop que lê respostas RTSP do servidor."""
+        parser = RtspParser()
         while True:
             try:
                 reply = self.rtspSocket.recv(4096)
-                if reply: self.parseRtspReply(reply.decode('utf-8'))
+                if not reply: break
+                for message in parser.feed(reply):
+                    self.parseRtspReply(message)
                 
                 if self.requestSent == self.TEARDOWN:
                     self.rtspSocket.shutdown(socket.SHUT_RDWR)
@@ -251,26 +351,16 @@ class Client:
                     break
             except: break
 
-    def parseRtspReply(self, data):
-        """Analisa resposta RTSP e atualiza estado e GUI."""
-        print("Dados recebidos:\n" + data)
-        lines = data.splitlines()
-        if not lines: return
-        
-        try: status_code = int(lines[0].split(' ')[1])
-        except: status_code = 0
-        
-        seq_num = 0
-        session_id = 0
+    def parseRtspReply(self, reply):
+        """Analisa resposta RTSP (`RtspMessage`) e atualiza estado e GUI."""
+        print("Dados recebidos:\n" + reply.startLine)
+        status_code = reply.statusCode
         
         # extrai CSeq e Session
-        for line in lines:
-            if "CSeq" in line:
-                try: seq_num = int(line.split("CSeq:")[1])
-                except: pass
-            if "Session" in line:
-                try: session_id = int(line.split("Session:")[1])
-                except: pass
+        try: seq_num = int(reply.cseq())
+        except ValueError: seq_num = 0
+        try: session_id = int(reply.session() or 0)
+        except ValueError: session_id = 0
 
         # Use the CSeq from the reply to identify which request this reply corresponds to.
         if seq_num in self.requests:
@@ -283,48 +373,87 @@ class Client:
             if status_code == 200:
                 if req == self.SETUP:
                     self.state = self.READY
-                    self.openRtpPort()
+                    _, _, timeout = (reply.header('session') or "").partition(';timeout=')
+                    if timeout.isdigit():
+                        self.sessionTimeout = int(timeout)
+                    self.scheduleKeepAlive()
+                    # server_port=RTP-RTCP: destino dos relatórios do receptor
+                    serverPort = reply.transportParam('server_port')
+                    if serverPort and '-' in serverPort:
+                        self.serverRtcpPort = int(serverPort.split('-')[1])
+                    group = None
+                    if reply.transportParam('multicast') is not None:
+                        group = (reply.transportParam('destination'), int(reply.transportParam('port').split('-')[0]))
+                    self.openRtpPort(group)
                 elif req == self.PLAY:
                     # Requer sessão válida
                     if session_id == self.sessionId or self.sessionId == 0:
                         self.state = self.PLAYING
+                        # Range: npt=início-fim efetivo: ajusta a linha do tempo
+                        _, _, span = (reply.header('range') or "").partition('npt=')
+                        try:
+                            end = float(span.partition('-')[2])
+                            self.master.after(0, lambda: self.timeline.configure(to=end))
+                        except ValueError:
+                            pass
                 elif req == self.PAUSE:
                     if session_id == self.sessionId:
                         self.state = self.READY
                         try: self.playEvent.set()
                         except: pass
+                        if self.pendingSeek is not None:
+                            start, scale = self.pendingSeek
+                            self.pendingSeek = None
+                            self.master.after(0, lambda: self.playMovie(start, scale))
                 elif req == self.TEARDOWN:
                     if session_id == self.sessionId:
                         self.state = self.INIT
                         self.teardownAcked = 1
                 elif req == self.DESCRIBE:
                     # Exibe SDP (DESCRIBE)
-                    parts = data.split('\r\n\r\n')
-                    if len(parts) > 1:
-                        sdp_body = parts[1]
-                        tkMessageBox.showinfo("Session Description (SDP)", sdp_body)
-                    else:
-                        parts = data.split('\n\n')
-                        if len(parts) > 1:
-                            sdp_body = parts[1]
-                            tkMessageBox.showinfo("Session Description (SDP)", sdp_body)
+                    if reply.body:
+                        self.sdp = parseSdp(reply.body)
+                        # a=range:npt=0-duração
+                        try:
+                            duration = float(self.sdp.get('range', "").partition('-')[2])
+                            self.master.after(0, lambda: self.timeline.configure(to=duration))
+                        except ValueError:
+                            pass
+                        tkMessageBox.showinfo("Session Description (SDP)", reply.body)
 
             # Atualiza botões na Thread principal
             self.master.after(0, self.updateButtonStates)
     
-    def openRtpPort(self):
-        """Abre socket UDP para receber vídeo."""
-        self.rtpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        
-        # Aumenta buffer do Kernel para 2MB para evitar perda em vídeo HD
-        self.rtpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2 * 1024 * 1024) 
-        
+    def openRtpPort(self, group=None):
+        """Abre socket UDP para receber vídeo (no grupo `group` = (IP, porta), se multicast)."""
+        # Aumenta buffer do Kernel (mín. 2MB) para alguns quadros do maior tamanho anunciado no SDP
+        maxFrame = int(self.sdp.get('x-maxframesize', 0))
+        rcvbuf = max(2 * 1024 * 1024, 8 * maxFrame)
+        self.state = self.READY
+        if group is not None:
+            try:
+                self.rtpSocket = openMulticastSocket(group[0], group[1], self.rtspSocket.getsockname()[0], rcvbuf)
+            except OSError:
+                tkMessageBox.showwarning('Erro de Multicast', f'Não foi possível entrar no grupo {group[0]}:{group[1]}')
+                return
+        else:
+            self.rtpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.rtpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf) 
+            try:
+                self.rtpSocket.bind(("", self.rtpPort))
+            except:
+                tkMessageBox.showwarning('Erro de Bind', f'Não foi possível usar a PORTA={self.rtpPort}')
         self.rtpSocket.settimeout(0.5)
+        # leitura do socket numa thread própria, separada da remontagem
+        self.receiver = RtpReceiver(self.rtpSocket)
+        self.receiver.start()
+        
+        # RTCP na porta RTP + 1 (convenção do RFC 3550)
+        self.rtcpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
-            self.state = self.READY
-            self.rtpSocket.bind(("", self.rtpPort))
-        except:
-            tkMessageBox.showwarning('Erro de Bind', f'Não foi possível usar a PORTA={self.rtpPort}')
+            self.rtcpSocket.bind(("", self.rtpPort + 1))
+        except OSError:
+            self.rtcpSocket.bind(("", 0))
 
     def handler(self):
         """Trata o fechamento da janela."""
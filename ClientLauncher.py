@@ -8,13 +8,15 @@ if __name__ == "__main__":
         serverPort = sys.argv[2]
         rtpPort = sys.argv[3]
         fileName = sys.argv[4]    
+        # atraso inicial do buffer de reprodução, em ms (opcional)
+        jitterDelay = int(sys.argv[5]) / 1000 if len(sys.argv) > 5 else 0.1
     except:
-        print("[Uso: ClientLauncher.py Server_IP Server_Port RTP_Port Video_File]")
-        print("Exemplo: python3 ClientLauncher.py 127.0.0.1 12000 5008 movie.Mjpeg")
+        print("[Uso: ClientLauncher.py Server_IP Server_Port RTP_Port Video_File [Buffer_ms]]")
+        print("Exemplo: python3 ClientLauncher.py 127.0.0.1 12000 5008 movie.Mjpeg 100")
         sys.exit(0)
     
     root = Tk()
 
-    app = Client(root, serverAddr, serverPort, rtpPort, fileName)
+    app = Client(root, serverAddr, serverPort, rtpPort, fileName, jitterDelay)
     app.master.title("StreamingService")    
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+
+# orçamento padrão de memória do cache (bytes)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# segundo elemento da chave do índice de quadros de um arquivo (os quadros usam o número)
+INDEX = 'index'
+
+def entrySize(value):
+    """Bytes ocupados por um quadro (`bytes`) ou por um índice (par de `array`)."""
+    if isinstance(value, tuple):
+        return sum(len(a) * a.itemsize for a in value)
+    return len(value)
+
+class FrameCache:
+    """Cache LRU de quadros compartilhado por todas as sessões do processo.
+
+    Guarda cada quadro como uma cópia `bytes`, lida uma vez e servida a
+    todas as sessões, e os índices de quadros dos arquivos; os dois contam
+    no mesmo orçamento e saem pela mesma ordem LRU. Com orçamento zero o
+    cache fica desligado (`active()` devolve `None`) e os quadros saem
+    como fatias do mmap, sem cópia, com o page cache do sistema fazendo o
+    papel de cache compartilhado.
+    """
+
+    _shared = None
+    _sharedLock = threading.Lock()
+
+    def __init__(self, maxBytes=DEFAULT_MAX_BYTES):
+        self.maxBytes = maxBytes
+        self.currBytes = 0
+        # (arquivo, nº quadro) -> bytes; (arquivo, INDEX) -> (inícios, fins)
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def shared(cls):
+        """Instância única do processo (criada sob demanda)."""
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def active(cls):
+        """Cache compartilhado, ou `None` se desativado (`--cache-mb 0`)."""
+        cache = cls.shared()
+        return cache if cache.maxBytes > 0 else None
+
+    @classmethod
+    def configure(cls, maxBytes):
+        """Define o orçamento do cache compartilhado."""
+        cache = cls.shared()
+        with cache.lock:
+            cache.maxBytes = maxBytes
+            cache.evict()
+        return cache
+
+    def getIndex(self, fileKey, builder):
+        """Retorna o índice de quadros do arquivo, construindo-o só se não estiver no cache."""
+        return self.get((fileKey, INDEX), builder)
+
+    def get(self, key, loader):
+        """Retorna o quadro `key`; em caso de falta, carrega com `loader()` e armazena."""
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self.frames.move_to_end(key)
+                self.hits += 1
+                return frame
+            self.misses += 1
+
+        frame = loader()
+        size = entrySize(frame)
+        if size > self.maxBytes:
+            return frame
+
+        with self.lock:
+            cached = self.frames.get(key)
+            if cached is not None:
+                # outra sessão carregou antes: todas passam a compartilhar a mesma cópia
+                return cached
+            self.frames[key] = frame
+            self.currBytes += size
+            self.evict()
+        return frame
+
+    def peek(self, key):
+        """Retorna o quadro `key` se estiver no cache (sem carregar)."""
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self.frames.move_to_end(key)
+                self.hits += 1
+            return frame
+
+    def evict(self):
+        """Remove as entradas menos usadas até caber no orçamento (chamar com `lock`).
+
+        Um índice removido continua válido para as sessões que já o têm; o
+        próximo `VideoStream` do arquivo o reconstrói.
+        """
+        while self.currBytes > self.maxBytes and self.frames:
+            _, value = self.frames.popitem(last=False)
+            self.currBytes -= entrySize(value)
+            self.evictions += 1
+
+    def stats(self):
+        """Contadores do cache."""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'frames': sum(1 for _, n in self.frames if n != INDEX),
+                'indexes': sum(1 for _, n in self.frames if n == INDEX),
+                'bytes': self.currBytes,
+                'maxBytes': self.maxBytes,
+            }
@@ -0,0 +1,96 @@
+import io, queue, threading
+from PIL import Image
+
+class FrameDecoder:
+    """Decodifica quadros JPEG em memória, numa thread própria.
+
+    Os quadros chegam por uma fila curta e saem, já no tamanho de exibição,
+    por outra; quando a exibição fica para trás, os quadros mais velhos são
+    descartados em vez de acumular atraso.
+    """
+
+    def __init__(self, size=(640, 480), maxPending=2, maxReady=2, source=None):
+        self.size = size
+        # `source`: objeto com `get(timeout)` (ex.: JitterBuffer) no lugar da fila interna
+        self.source = source
+        self.pending = queue.Queue(maxPending)
+        self.ready = queue.Queue(maxReady)
+        self.decoded = 0
+        self.dropped = 0
+        self.errors = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="FrameDecoder", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def submit(self, data):
+        """Enfileira um quadro JPEG (`bytes`); descarta o mais velho se a fila estiver cheia."""
+        self.putLatest(self.pending, data)
+
+    def run(self):
+        while self.running:
+            if self.source is not None:
+                data = self.source.get(timeout=0.5)
+                if data is None:
+                    continue
+            else:
+                try:
+                    data = self.pending.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            try:
+                image = self.decode(data)
+            except Exception:
+                self.errors += 1
+                continue
+            self.decoded += 1
+            self.putLatest(self.ready, image)
+
+    def decode(self, data):
+        """Decodifica já reduzido ao tamanho de exibição.
+
+        O modo draft do JPEG decodifica direto em 1/2, 1/4 ou 1/8 da
+        resolução; só o ajuste fino restante passa por `resize`.
+        """
+        image = Image.open(io.BytesIO(data))
+        image.draft('RGB', self.size)
+        width, height = self.size
+        if image.width <= width and image.height <= height:
+            image.load()
+            return image
+        scale = min(width / image.width, height / image.height)
+        newSize = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        return image.resize(newSize, Image.BILINEAR)
+
+    def latest(self):
+        """Quadro decodificado mais recente (ou `None`); os anteriores são descartados."""
+        image = None
+        while True:
+            try:
+                newer = self.ready.get_nowait()
+            except queue.Empty:
+                return image
+            if image is not None:
+                self.dropped += 1
+            image = newer
+
+    def putLatest(self, q, item):
+        """`put` que, com a fila cheia, descarta o item mais antigo."""
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
@@ -0,0 +1,43 @@
+from RtpPacket import RtpPacket
+from Rfc2435 import PT_JFIF
+
+# MTU Ethernet seguro ~1400 bytes
+MAX_RTP_PAYLOAD = 1400
+
+# relógio de mídia RTP para MJPEG (RFC 3551)
+CLOCK_RATE = 90000
+
+# pacotes por rajada; as rajadas de um quadro se espalham por esta fração do intervalo
+BURST_PACKETS = 8
+BURST_SPREAD = 0.5
+
+def packetizeFrame(stream, n, frame, seq, ssrc, timestamp, packetizer):
+    """Lista de (cabeçalho, payload) do quadro `n` (a partir de 0) de `stream`, já lido em `frame`.
+
+    Cada fragmento tem seu número de sequência, a partir de `seq`; todos
+    compartilham o timestamp do quadro e o marcador vai no último. Com
+    `.rtpx` (Prepack.py) os fragmentos e cabeçalhos vêm prontos do arquivo;
+    senão, quadros no formato do RFC 2435 (PT 26) levam só os dados da
+    varredura e os demais vão como JFIF inteiro fatiado (PT 96). Os
+    payloads são fatias do quadro, sem cópia.
+    """
+    prepacked = stream.prepacked
+    if prepacked is not None and prepacked.maxPayload == MAX_RTP_PAYLOAD:
+        packets = prepacked.packets(n, frame, seq, ssrc, timestamp, packetizer)
+    else:
+        packets = packetizer.packetize(frame, seq, ssrc, timestamp)
+    if packets is None:
+        view = memoryview(frame)
+        payloads = [view[offset : offset + MAX_RTP_PAYLOAD] for offset in range(0, len(view), MAX_RTP_PAYLOAD)]
+        packets = RtpPacket.encodeBatch(payloads, seq, PT_JFIF, ssrc, timestamp)
+    return packets
+
+def planBursts(count, deadline, interval):
+    """[(instante, fatia)] das rajadas de um quadro de `count` pacotes, a partir de `deadline`.
+
+    As rajadas se espalham por `BURST_SPREAD` de `interval`, o tempo até o
+    próximo envio; a primeira sai no próprio prazo do quadro.
+    """
+    starts = range(0, count, BURST_PACKETS)
+    step = interval * BURST_SPREAD / len(starts)
+    return [(deadline + i * step, slice(start, start + BURST_PACKETS)) for i, start in enumerate(starts)]
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+
+class FrameReassembler:
+    """Remonta quadros JPEG a partir dos fragmentos RTP.
+
+    Os fragmentos de cada quadro em trânsito (identificado pelo timestamp
+    RTP) ficam guardados pelo número de sequência, então podem chegar fora
+    de ordem, como os reenviados por NACK. O primeiro fragmento é o que
+    começa com SOI e o último o que traz o bit de marcador; o quadro sai,
+    com uma única cópia, quando todos os do meio chegaram. A memória fica
+    limitada a `maxFrames` quadros em trânsito: o mais antigo é descartado
+    para abrir espaço.
+    """
+
+    def __init__(self, maxFrames=8, history=64):
+        self.maxFrames = maxFrames
+        self.history = history
+        self.frames = {}               # id do quadro -> [fragmentos {seq: payload}, seq inicial, seq final]
+        self.finished = OrderedDict()  # ids já entregues ou descartados (ignora reenvios tardios)
+        self.completed = 0
+        self.dropped = 0
+
+    def push(self, frameId, seq, marker, payload):
+        """Adiciona um fragmento; devolve o quadro (`bytes`) quando ele se completa."""
+        frame = self.frames.get(frameId)
+        if frame is None:
+            if frameId in self.finished:
+                return None
+            if len(self.frames) >= self.maxFrames:
+                # o quadro mais antigo não se completou a tempo
+                self.drop(next(iter(self.frames)))
+            frame = [{}, None, None]
+            self.frames[frameId] = frame
+
+        fragments = frame[0]
+        if seq in fragments:
+            return None
+        fragments[seq] = payload
+        if payload[:2] == SOI:
+            frame[1] = seq
+        if marker:
+            frame[2] = seq
+
+        start, end = frame[1], frame[2]
+        if start is None or end is None:
+            return None
+        count = ((end - start) & 0xFFFF) + 1
+        if len(fragments) < count:
+            return None
+
+        self.finish(frameId)
+        try:
+            data = b"".join([fragments[(start + i) & 0xFFFF] for i in range(count)])
+        except KeyError:
+            # sobrou fragmento fora do intervalo (SOI dentro do quadro?): inconsistente
+            self.dropped += 1
+            return None
+        if data[-2:] != EOI:
+            self.dropped += 1
+            return None
+        self.completed += 1
+        return data
+
+    def finish(self, frameId):
+        del self.frames[frameId]
+        self.finished[frameId] = True
+        if len(self.finished) > self.history:
+            self.finished.popitem(last=False)
+
+    def drop(self, frameId):
+        """Descarta um quadro incompleto."""
+        self.finish(frameId)
+        self.dropped += 1
+
+    def reset(self):
+        """Descarta todos os quadros em trânsito (ex.: após PAUSE)."""
+        for frameId in list(self.frames):
+            self.drop(frameId)
+        self.finished.clear()
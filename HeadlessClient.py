@@ -0,0 +1,314 @@
+import socket, selectors, time, argparse, statistics, random
+from RtpReceiver import RtpReceiver, MAX_BATCH, openMulticastSocket
+from Rfc2435 import Rfc2435Reassembler
+from RtspParser import RtspParser
+from MediaCatalog import parseSdp
+from RtpCapture import CaptureWriter
+from Rtcp import ReceptionStats, NackTracker, buildReceiverReport, buildNack, RTCP_INTERVAL
+
+# quadros do maior tamanho (SDP `a=x-maxframesize`) que cabem no buffer de recepção
+RECEIVE_BUFFER_FRAMES = 8
+
+def playHeaders(start=None, scale=None):
+    """Cabeçalhos `Range`/`Scale` de um PLAY (vazio sem busca nem avanço rápido)."""
+    headers = ""
+    if start is not None:
+        headers += f"Range: npt={start:.3f}-\r\n"
+    if scale is not None:
+        headers += f"Scale: {scale:g}\r\n"
+    return headers
+
+class HeadlessSession:
+    """Sessão RTSP/RTP sem interface: só recebe, remonta e mede."""
+
+    def __init__(self, serverAddr, serverPort, fileName, rtpPort=0, simulatedLoss=0.0, bandwidth=None, capture=None):
+        self.serverAddr = serverAddr
+        self.serverPort = serverPort
+        self.fileName = fileName
+        self.rtspSeq = 0
+        self.sessionId = 0
+        self.parser = RtspParser()
+        self.replies = []
+
+        self.rtpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.rtpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2 * 1024 * 1024)
+        self.rtpSocket.bind(("", rtpPort))
+        self.rtpSocket.setblocking(False)
+        self.rtpPort = self.rtpSocket.getsockname()[1]
+        # `CaptureWriter` que grava os datagramas como chegaram, antes da perda simulada
+        self.capture = capture
+        self.openReceiver()
+
+        # relatórios do receptor saem de um socket próprio (o servidor só olha o SSRC)
+        self.rtcpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.reception = ReceptionStats()
+        self.nack = NackTracker()
+        self.ssrc = random.randint(1, 0xFFFFFFFF)
+        self.serverRtcpPort = None
+        self.lastReport = 0.0
+        self.simulatedLoss = simulatedLoss
+        # `Bandwidth:` do SETUP (bit/s): o servidor escolhe a versão que cabe
+        self.bandwidth = bandwidth
+
+        self.reassembler = Rfc2435Reassembler()
+        self.packets = 0
+        self.bytes = 0
+        self.frameTimes = []
+
+    def connect(self):
+        self.rtspSocket = socket.create_connection((self.serverAddr, self.serverPort))
+
+    def format(self, method, extra="", body=""):
+        """Monta uma requisição RTSP (mesmo formato do `Client`)."""
+        self.rtspSeq += 1
+        request = f"{method} {self.fileName} RTSP/1.0\r\nCSeq: {self.rtspSeq}\r\n"
+        if self.sessionId:
+            request += f"Session: {self.sessionId}\r\n"
+        if body:
+            extra += f"Content-Type: text/parameters\r\nContent-Length: {len(body.encode('utf-8'))}\r\n"
+        return request + extra + "\r\n" + body
+
+    def readReply(self):
+        """Devolve a próxima resposta (`RtspMessage`), lendo do socket se preciso."""
+        while not self.replies:
+            chunk = self.rtspSocket.recv(4096)
+            if not chunk:
+                return None
+            self.replies.extend(self.parser.feed(chunk))
+        reply = self.replies.pop(0)
+        if reply.session() and not self.sessionId:
+            self.sessionId = int(reply.session())
+        serverPort = reply.transportParam('server_port')
+        if serverPort and '-' in serverPort:
+            self.serverRtcpPort = int(serverPort.split('-')[1])
+        if reply.transportParam('multicast') is not None:
+            self.joinGroup(reply.transportParam('destination'), int(reply.transportParam('port').split('-')[0]))
+        return reply
+
+    def joinGroup(self, group, port):
+        """Troca o socket RTP por um inscrito no grupo multicast do canal."""
+        self.rtpSocket.close()
+        self.rtpSocket = openMulticastSocket(group, port, self.rtspSocket.getsockname()[0])
+        self.rtpSocket.setblocking(False)
+        self.openReceiver()
+
+    def openReceiver(self):
+        # sem thread: lido no laço do seletor, e cada slot volta ao pool logo após a cópia
+        self.receiver = RtpReceiver(self.rtpSocket, slots=MAX_BATCH)
+        if self.capture is not None:
+            self.receiver.tap = self.capture.write
+
+    def request(self, method, extra="", body=""):
+        """Envia uma requisição RTSP e lê a resposta."""
+        self.rtspSocket.sendall(self.format(method, extra, body).encode('utf-8'))
+        return self.readReply()
+
+    def setupHeaders(self):
+        headers = f"Transport: RTP/AVP;unicast;client_port={self.rtpPort}\r\n"
+        if self.bandwidth:
+            headers += f"Bandwidth: {self.bandwidth}\r\n"
+        return headers
+
+    def setup(self):
+        return self.request("SETUP", self.setupHeaders())
+
+    def setRendition(self, name=None, bandwidth=None):
+        """SET_PARAMETER: troca de versão pelo nome ou pela banda disponível (bit/s)."""
+        return self.request("SET_PARAMETER", body=f"rendition: {name}\r\n" if name else f"bandwidth: {bandwidth}\r\n")
+
+    def play(self, start=None, scale=None):
+        """PLAY a partir de `start` segundos (senão, de onde parou), na velocidade `scale`."""
+        return self.request("PLAY", playHeaders(start, scale))
+
+    def startPipelined(self, start=None, scale=None):
+        """DESCRIBE+SETUP+PLAY num único segmento TCP: uma só ida e volta."""
+        requests = (self.format("DESCRIBE", "Accept: application/sdp\r\n")
+                    + self.format("SETUP", self.setupHeaders())
+                    + self.format("PLAY", playHeaders(start, scale)))
+        self.rtspSocket.sendall(requests.encode('utf-8'))
+        replies = [self.readReply() for _ in range(3)]
+        if replies[0] is not None and replies[0].statusCode == 200:
+            self.sizeReceiveBuffer(replies[0].body)
+        return replies
+
+    def sizeReceiveBuffer(self, sdp):
+        """Ajusta o buffer do socket RTP para alguns quadros do maior tamanho anunciado."""
+        maxFrame = int(parseSdp(sdp).get('x-maxframesize', 0))
+        if maxFrame:
+            size = max(2 * 1024 * 1024, RECEIVE_BUFFER_FRAMES * maxFrame)
+            self.rtpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+
+    def teardown(self):
+        try:
+            self.request("TEARDOWN")
+            self.rtspSocket.close()
+        except OSError:
+            pass
+        self.rtcpSocket.close()
+
+    def onReadable(self):
+        """Esvazia a fila de datagramas do socket."""
+        while True:
+            batch = self.receiver.receiveBatch()
+            if not batch:
+                return
+            for desc in batch:
+                self.onPacket(*desc)
+
+    def onPacket(self, index, start, end, currSeq, timestamp, marker, pt, ssrc, now):
+        if self.simulatedLoss and random.random() < self.simulatedLoss:
+            self.receiver.release(index)
+            return
+        payload = self.receiver.take(index, start, end)
+        self.packets += 1
+        self.bytes += end
+
+        self.reception.update(ssrc, currSeq, timestamp, now)
+        if now - self.lastReport >= RTCP_INTERVAL:
+            self.sendReceiverReport(now)
+        self.nack.onPacket(currSeq, now)
+        missing = self.nack.due(now)
+        if missing and self.serverRtcpPort is not None:
+            self.rtcpSocket.sendto(buildNack(self.ssrc, ssrc, missing), (self.serverAddr, self.serverRtcpPort))
+
+        frame = self.reassembler.push(timestamp, currSeq, marker, payload, pt)
+        if frame is not None:
+            self.frameTimes.append(now)
+
+    def sendReceiverReport(self, now):
+        self.lastReport = now
+        if self.serverRtcpPort is not None:
+            report = buildReceiverReport(self.ssrc, [self.reception.report()])
+            self.rtcpSocket.sendto(report, (self.serverAddr, self.serverRtcpPort))
+
+    def report(self, duration):
+        """Estatísticas da sessão ao fim do teste."""
+        gaps = [b - a for a, b in zip(self.frameTimes, self.frameTimes[1:])]
+        return {
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'frames': len(self.frameTimes),
+            'framesDropped': self.reassembler.dropped,
+            'fps': len(self.frameTimes) / duration if duration > 0 else 0.0,
+            # perda residual: pacotes que nem o reenvio por NACK recuperou
+            'loss': self.reception.lossRatio(),
+            'nacked': self.nack.requested,
+            'recovered': self.nack.recovered,
+            'jitterMs': statistics.pstdev(gaps) * 1000 if len(gaps) > 1 else 0.0,
+            'interarrivalMs': statistics.mean(gaps) * 1000 if gaps else 0.0,
+        }
+
+class LoadGenerator:
+    """Dispara N sessões simuladas num único processo e agrega os resultados."""
+
+    def __init__(self, serverAddr, serverPort, fileName, sessions=10, basePort=0, pipeline=False, simulatedLoss=0.0,
+                 start=None, scale=None, bandwidth=None, capture=None):
+        self.serverAddr = serverAddr
+        self.serverPort = serverPort
+        self.fileName = fileName
+        self.sessionCount = sessions
+        self.basePort = basePort
+        self.pipeline = pipeline
+        self.simulatedLoss = simulatedLoss
+        self.start = start
+        self.scale = scale
+        self.bandwidth = bandwidth
+        self.capture = capture      # arquivo `.rtpcap` da primeira sessão
+        self.sessions = []
+
+    def run(self, duration):
+        """Conecta, toca por `duration` segundos e devolve o relatório."""
+        selector = selectors.DefaultSelector()
+        writer = CaptureWriter(self.capture) if self.capture else None
+        for i in range(self.sessionCount):
+            session = HeadlessSession(self.serverAddr, self.serverPort, self.fileName,
+                                      self.basePort + i if self.basePort else 0, self.simulatedLoss, self.bandwidth,
+                                      writer if i == 0 else None)
+            session.connect()
+            if self.pipeline:
+                session.startPipelined(self.start, self.scale)
+            else:
+                session.setup()
+            selector.register(session.rtpSocket, selectors.EVENT_READ, session)
+            self.sessions.append(session)
+
+        if not self.pipeline:
+            for session in self.sessions:
+                session.play(self.start, self.scale)
+
+        start = time.monotonic()
+        end = start + duration
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                break
+            for key, _ in selector.select(end - now):
+                key.data.onReadable()
+        elapsed = time.monotonic() - start
+
+        for session in self.sessions:
+            session.teardown()
+            selector.unregister(session.rtpSocket)
+            session.rtpSocket.close()
+        selector.close()
+        if writer is not None:
+            writer.close()
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        perSession = [s.report(elapsed) for s in self.sessions]
+        totalBytes = sum(r['bytes'] for r in perSession)
+        fps = [r['fps'] for r in perSession]
+        return {
+            'sessions': len(perSession),
+            'duration': elapsed,
+            'throughputMbps': totalBytes * 8 / elapsed / 1e6 if elapsed > 0 else 0.0,
+            'packets': sum(r['packets'] for r in perSession),
+            'frames': sum(r['frames'] for r in perSession),
+            'fpsMean': statistics.mean(fps) if fps else 0.0,
+            'fpsMin': min(fps) if fps else 0.0,
+            'lossMean': statistics.mean(r['loss'] for r in perSession) if perSession else 0.0,
+            'nacked': sum(r['nacked'] for r in perSession),
+            'recovered': sum(r['recovered'] for r in perSession),
+            'jitterMsMean': statistics.mean(r['jitterMs'] for r in perSession) if perSession else 0.0,
+            'perSession': perSession,
+        }
+
+def printReport(report, verbose=False):
+    print(f"Sessões: {report['sessions']}  Duração: {report['duration']:.1f} s")
+    print(f"Vazão total: {report['throughputMbps']:.1f} Mbit/s  Pacotes: {report['packets']}  Quadros: {report['frames']}")
+    print(f"FPS por sessão: média {report['fpsMean']:.1f}, mínimo {report['fpsMin']:.1f}")
+    print(f"Perda média: {report['lossMean'] * 100:.2f}%  Jitter entre quadros: {report['jitterMsMean']:.2f} ms")
+    print(f"NACK: {report['nacked']} pedidos, {report['recovered']} pacotes recuperados")
+    if verbose:
+        for i, r in enumerate(report['perSession']):
+            print(f"  #{i}: {r['fps']:.1f} fps, perda {r['loss'] * 100:.2f}%, jitter {r['jitterMs']:.2f} ms, descartados {r['framesDropped']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="HeadlessClient.py",
+        usage="%(prog)s Server_IP Server_Port Video_File [opções]",
+        epilog="Exemplo: python3 HeadlessClient.py 127.0.0.1 12000 movie.Mjpeg --sessions 50 --duration 10")
+    parser.add_argument("serverAddr")
+    parser.add_argument("serverPort", type=int)
+    parser.add_argument("fileName")
+    parser.add_argument("--sessions", type=int, default=1, help="número de sessões simultâneas")
+    parser.add_argument("--duration", type=float, default=10.0, help="duração do teste em segundos")
+    parser.add_argument("--base-port", type=int, default=0, help="primeira porta RTP (padrão: portas livres)")
+    parser.add_argument("--pipeline", action="store_true", help="envia DESCRIBE+SETUP+PLAY de uma vez")
+    parser.add_argument("--simulate-loss", type=float, default=0.0,
+                        help="fração de pacotes RTP descartados no cliente (simula um link ruim)")
+    parser.add_argument("--start", type=float, default=None, help="começa em START segundos do vídeo (Range: npt=)")
+    parser.add_argument("--scale", type=float, default=None, help="velocidade do PLAY; 4 = avanço rápido, 1 a cada 4 quadros (Scale:)")
+    parser.add_argument("--bandwidth", type=int, default=None,
+                        help="banda do cliente em bit/s (Bandwidth: no SETUP); o servidor escolhe a versão que cabe")
+    parser.add_argument("--capture", default=None,
+                        help="grava os datagramas RTP recebidos neste arquivo .rtpcap (só com --sessions 1)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostra o resultado de cada sessão")
+    args = parser.parse_args()
+    if args.capture and args.sessions != 1:
+        parser.error("--capture grava uma única sessão: use --sessions 1")
+
+    generator = LoadGenerator(args.serverAddr, args.serverPort, args.fileName, args.sessions, args.base_port, args.pipeline, args.simulate_loss,
+                              args.start, args.scale, args.bandwidth, args.capture)
+    printReport(generator.run(args.duration), args.verbose)
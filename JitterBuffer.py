@@ -0,0 +1,112 @@
+import heapq, threading, time
+
+class JitterBuffer:
+    """Buffer de reprodução: libera cada quadro no instante dado pelo timestamp RTP.
+
+    O relógio de reprodução é `base + timestamp/clockRate + delay`, onde
+    `base` acompanha o menor tempo de trânsito visto e `delay` se adapta ao
+    jitter de chegada medido como no RFC 3550 (seção 6.4.1).
+    """
+
+    def __init__(self, clockRate=90000, delay=0.1, minDelay=0.02, maxDelay=0.5, capacity=64):
+        self.clockRate = clockRate
+        self.minDelay = minDelay
+        self.maxDelay = maxDelay
+        self.capacity = capacity
+        self.initialDelay = delay
+        self.cond = threading.Condition()
+        self.played = 0
+        self.late = 0
+        self.discarded = 0
+        self.resyncs = 0
+        self.reset()
+
+    def reset(self):
+        """Esquece o relógio e os quadros pendentes (ex.: novo PLAY)."""
+        with self.cond:
+            self.heap = []
+            self.delay = self.initialDelay
+            self.jitter = 0.0
+            self.base = None
+            self.lastTs = None        # último timestamp recebido (32 bits)
+            self.extTs = 0            # timestamp estendido (sem volta em 2^32)
+            self.lastTransit = None
+            self.cond.notify_all()
+
+    def unwrap(self, timestamp):
+        """Estende o timestamp de 32 bits para não voltar a zero."""
+        if self.lastTs is not None:
+            diff = (timestamp - self.lastTs) & 0xFFFFFFFF
+            if diff >= 0x80000000:
+                diff -= 0x100000000
+            self.extTs += diff
+        else:
+            self.extTs = timestamp
+        self.lastTs = timestamp
+        return self.extTs
+
+    def put(self, timestamp, frame, arrival=None):
+        """Insere um quadro completo com seu timestamp RTP."""
+        if arrival is None:
+            arrival = time.monotonic()
+        with self.cond:
+            mediaTime = self.unwrap(timestamp) / self.clockRate
+            transit = arrival - mediaTime
+
+            # jitter de chegada (RFC 3550) e atraso-alvo de ~4 desvios
+            if self.lastTransit is not None:
+                self.jitter += (abs(transit - self.lastTransit) - self.jitter) / 16
+                target = min(self.maxDelay, max(self.minDelay, 4 * self.jitter))
+                self.delay += (target - self.delay) / 8
+            self.lastTransit = transit
+
+            if self.base is None or transit < self.base:
+                self.base = transit
+            playout = self.base + mediaTime + self.delay
+
+            if playout < arrival:
+                self.late += 1
+                if arrival - playout > self.maxDelay:
+                    # saltou no tempo (ex.: servidor reancorou): recomeça o relógio
+                    self.base = transit
+                    self.resyncs += 1
+                    playout = self.base + mediaTime + self.delay
+                else:
+                    return
+
+            if len(self.heap) >= self.capacity:
+                heapq.heappop(self.heap)
+                self.discarded += 1
+            heapq.heappush(self.heap, (playout, self.extTs, frame))
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Bloqueia até o próximo quadro vencer; devolve-o (ou `None` no timeout)."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                if self.heap:
+                    wait = self.heap[0][0] - now
+                    if wait <= 0:
+                        self.played += 1
+                        return heapq.heappop(self.heap)[2]
+                else:
+                    wait = None
+                if end is not None:
+                    if now >= end:
+                        return None
+                    wait = end - now if wait is None else min(wait, end - now)
+                self.cond.wait(wait)
+
+    def stats(self):
+        with self.cond:
+            return {
+                'played': self.played,
+                'late': self.late,
+                'discarded': self.discarded,
+                'resyncs': self.resyncs,
+                'delay': self.delay,
+                'jitter': self.jitter,
+                'pending': len(self.heap),
+            }
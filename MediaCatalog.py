@@ -0,0 +1,260 @@
+import os, json, threading, logging
+from VideoStream import VideoStream
+from FrameCache import FrameCache
+
+logger = logging.getLogger(__name__)
+
+# extensões servidas (comparadas em minúsculas)
+MEDIA_EXTENSIONS = ('.mjpeg', '.mjpg')
+
+# versões reduzidas de `<vídeo>` (RenditionBuilder.py): `<vídeo>.renditions/<nome>.Mjpeg` e o índice delas
+RENDITIONS_SUFFIX = '.renditions'
+RENDITIONS_MANIFEST = 'index.json'
+# nome da versão original na escada de qualidade
+SOURCE_RENDITION = 'source'
+
+# SDP pré-renderizado: só sessão, endereço e porta mudam por requisição
+SDP_TEMPLATE = (
+    "v=0\r\n"
+    "o=- {session} 1 IN IP4 {address}\r\n"
+    "s=Mjpeg Stream Python\r\n"
+    "i=Filme MJPEG\r\n"
+    "{connection}"
+    "t=0 0\r\n"
+    "a=range:npt=0-{duration:.3f}\r\n"
+    "m=video {{port}} RTP/AVP 26 96\r\n"
+    "a=rtpmap:26 JPEG/90000\r\n"
+    "a=rtpmap:96 X-JFIF/90000\r\n"
+    "a=control:streamid=0\r\n"
+    "a=framerate:{frameRate:g}\r\n"
+    "a=x-dimensions:{width},{height}\r\n"
+    "a=x-framecount:{frameCount}\r\n"
+    "a=x-maxframesize:{maxFrameSize}\r\n"
+    "{renditionLine}"
+)
+
+def jpegSize(data):
+    """(largura, altura) lidos do marcador SOF de um JPEG, ou (0, 0)."""
+    pos = 2
+    end = len(data)
+    while pos + 4 <= end:
+        if data[pos] != 0xFF:
+            return (0, 0)
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # bytes de preenchimento entre segmentos
+            pos += 1
+            continue
+        length = (data[pos + 2] << 8) | data[pos + 3]
+        # SOF0..SOF15, exceto DHT (C4), JPG (C8) e DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if pos + 9 > end:
+                return (0, 0)
+            height = (data[pos + 5] << 8) | data[pos + 6]
+            width = (data[pos + 7] << 8) | data[pos + 8]
+            return (width, height)
+        if marker == 0xDA:
+            return (0, 0)
+        pos += 2 + length
+    return (0, 0)
+
+def renditionDir(path):
+    return path + RENDITIONS_SUFFIX
+
+def manifestMtime(path):
+    try:
+        return os.stat(os.path.join(renditionDir(path), RENDITIONS_MANIFEST)).st_mtime_ns
+    except OSError:
+        return None
+
+def parseSdp(body):
+    """Atributos `a=` de um SDP como dict (o lado do cliente usa para se preparar)."""
+    attributes = {}
+    for line in body.splitlines():
+        if line.startswith("a="):
+            name, _, value = line[2:].partition(':')
+            attributes[name] = value
+    return attributes
+
+class MediaCatalog:
+    """Metadados e SDP dos vídeos servidos, mantidos em memória.
+
+    Cada entrada é calculada uma vez a partir do índice de quadros (que fica
+    no `FrameCache`, então o SETUP seguinte já o encontra pronto) e vale
+    enquanto o mtime e o tamanho do arquivo não mudarem.
+    """
+
+    _shared = None
+    _sharedLock = threading.Lock()
+
+    def __init__(self, root=".", cache=None):
+        self.root = root
+        self.cache = cache
+        self.entries = {}     # caminho real -> metadados
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared = cls(cache=FrameCache.active())
+            return cls._shared
+
+    def scan(self):
+        """Indexa todos os vídeos do diretório servido; devolve quantos há."""
+        count = 0
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # as versões reduzidas entram pela entrada do original
+            dirnames[:] = [d for d in dirnames if not d.endswith(RENDITIONS_SUFFIX)]
+            for name in filenames:
+                if name.lower().endswith(MEDIA_EXTENSIONS):
+                    if self.lookup(os.path.relpath(os.path.join(dirpath, name), self.root)) is not None:
+                        count += 1
+        return count
+
+    def resolve(self, filename):
+        """Caminho real de `filename` (relativo ao diretório servido), ou `None` se não for servível.
+
+        Recusa o que, resolvidos `..` e links simbólicos, cai fora do
+        diretório servido, e o que não tem extensão de vídeo.
+        """
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, filename))
+        try:
+            inside = os.path.commonpath([path, root]) == root
+        except ValueError:
+            # outro drive (Windows)
+            inside = False
+        if not inside or not path.lower().endswith(MEDIA_EXTENSIONS):
+            return None
+        return path
+
+    def lookup(self, filename):
+        """Metadados de `filename` (relativo ao diretório servido) ou `None` se não existir."""
+        path = self.resolve(filename)
+        if path is None:
+            logger.warning("Recusando caminho fora do catálogo: %r", filename)
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self.lock:
+                self.entries.pop(path, None)
+            return None
+        with self.lock:
+            entry = self.entries.get(path)
+        if (entry is not None and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size
+                and entry['renditionsMtime'] == manifestMtime(path)):
+            return entry
+        try:
+            entry = self.build(path)
+        except (IOError, OSError):
+            return None
+        with self.lock:
+            self.entries[path] = entry
+        return entry
+
+    def build(self, path):
+        """Abre o vídeo uma vez e resume o índice de quadros."""
+        stream = VideoStream(path, self.cache)
+        try:
+            starts, ends = stream.starts, stream.ends
+            sizes = [e - s for s, e in zip(starts, ends)]
+            first = stream.nextFrame()
+            width, height = jpegSize(first) if first is not None else (0, 0)
+            del first
+            frameRate = stream.frameRate()
+            frameCount = stream.frameCount()
+            entry = {
+                'path': path,
+                'mtime': stream.fileKey[1],
+                'size': stream.fileKey[2],
+                'frameCount': frameCount,
+                'frameRate': frameRate,
+                'duration': frameCount / frameRate,
+                'maxFrameSize': max(sizes, default=0),
+                'meanFrameSize': sum(sizes) // len(sizes) if sizes else 0,
+                'width': width,
+                'height': height,
+            }
+        finally:
+            stream.close()
+        entry['renditionsMtime'] = manifestMtime(path)
+        entry['renditions'] = self.loadRenditions(path, entry)
+        renditionLine = ""
+        if len(entry['renditions']) > 1:
+            renditionLine = "a=x-renditions:%s\r\n" % ",".join(
+                "%s %dx%d %d" % (r['name'], r['width'], r['height'], r['bitrate']) for r in entry['renditions'])
+        entry['sdp'] = SDP_TEMPLATE.format(session="{session}", address="{address}", connection="{connection}",
+                                           renditionLine=renditionLine, **entry)
+        logger.debug("Catálogo: %s (%d quadros, %.1f s)", path, entry['frameCount'], entry['duration'])
+        return entry
+
+    def loadRenditions(self, path, entry):
+        """Escada de qualidade do vídeo, da maior taxa para a menor (o original sempre incluído).
+
+        Cada item tem nome, caminho, dimensões e taxa média (bit/s). Versões
+        com outro número de quadros são ignoradas: a troca durante o PLAY
+        acontece na fronteira de quadro, pelo mesmo número de quadro.
+        """
+        source = {
+            'name': SOURCE_RENDITION, 'path': path, 'width': entry['width'], 'height': entry['height'],
+            'bitrate': round(entry['meanFrameSize'] * 8 * entry['frameRate']),
+        }
+        renditions = [source]
+        directory = renditionDir(path)
+        try:
+            with open(os.path.join(directory, RENDITIONS_MANIFEST)) as f:
+                manifest = json.load(f)
+        except OSError:
+            return renditions
+        except ValueError as e:
+            logger.warning("Índice de versões inválido em %s: %s", directory, e)
+            return renditions
+        for item in manifest.get('renditions', []):
+            if item.get('frames') != entry['frameCount'] or item.get('name') == SOURCE_RENDITION:
+                logger.warning("Ignorando versão %s de %s", item.get('name'), path)
+                continue
+            renditions.append({
+                'name': item['name'], 'path': os.path.join(directory, item['file']),
+                'width': item['width'], 'height': item['height'], 'bitrate': item['bitrate'],
+            })
+        renditions.sort(key=lambda r: r['bitrate'], reverse=True)
+        return renditions
+
+    def rendition(self, filename, name=None, bandwidth=None):
+        """Versão de `filename` pelo nome ou, com `bandwidth` (bit/s), a melhor que cabe nela.
+
+        Sem nenhum dos dois, o original. `None` se o arquivo ou o nome não existirem.
+        """
+        entry = self.lookup(filename)
+        if entry is None:
+            return None
+        renditions = entry['renditions']
+        if name is not None:
+            return next((r for r in renditions if r['name'] == name), None)
+        if bandwidth is not None:
+            # a maior que cabe; se nenhuma couber, a menor
+            return next((r for r in renditions if r['bitrate'] <= bandwidth), renditions[-1])
+        return next(r for r in renditions if r['name'] == SOURCE_RENDITION)
+
+    def describe(self, filename, session, address, port, group=None):
+        """Corpo SDP de `filename` ou `None` se o arquivo não existir.
+
+        Com `group` = (endereço, porta, ttl), anuncia o grupo multicast do canal ao vivo.
+        """
+        entry = self.lookup(filename)
+        if entry is None:
+            return None
+        connection = ""
+        if group is not None:
+            groupAddress, port, ttl = group
+            connection = "c=IN IP4 %s/%d\r\n" % (groupAddress, ttl)
+        return entry['sdp'].format(session=session, address=address, port=port, connection=connection)
+
+    def invalidate(self, filename=None):
+        with self.lock:
+            if filename is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(self.resolve(filename), None)
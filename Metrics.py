@@ -0,0 +1,244 @@
+import threading, time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# limites (s) dos histogramas: de 10 µs a ~1 s
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+class Histogram:
+    """Histograma de baldes fixos (formato Prometheus); `observe` é O(log b)."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', 'max')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)    # último balde: +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self):
+        return {'buckets': list(self.buckets), 'counts': list(self.counts),
+                'sum': self.sum, 'count': self.count, 'max': self.max}
+
+    @staticmethod
+    def merge(snapshots, buckets=LATENCY_BUCKETS):
+        """Soma snapshots de histogramas com os mesmos baldes."""
+        total = {'buckets': list(buckets), 'counts': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0, 'max': 0.0}
+        for snap in snapshots:
+            total['counts'] = [a + b for a, b in zip(total['counts'], snap['counts'])]
+            total['sum'] += snap['sum']
+            total['count'] += snap['count']
+            total['max'] = max(total['max'], snap['max'])
+        return total
+
+COUNTERS = ('framesSent', 'framesSkipped', 'packetsSent', 'bytesSent', 'rtcpReports',
+            'nacksReceived', 'packetsRetransmitted', 'prefetchStalls')
+HISTOGRAMS = ('sendLatency', 'pacingLateness', 'readTime')
+
+class SessionMetrics:
+    """Contadores e histogramas de uma sessão (escritos só pela thread de envio)."""
+
+    def __init__(self, sessionId=0):
+        self.sessionId = sessionId
+        self.started = time.monotonic()
+        self.framesSent = 0
+        self.framesSkipped = 0      # quadros pulados pela adaptação de taxa (RTCP)
+        self.packetsSent = 0
+        self.bytesSent = 0
+        self.rtcpReports = 0
+        self.nacksReceived = 0
+        self.packetsRetransmitted = 0
+        self.prefetchStalls = 0     # vezes em que o quadro devido ainda estava em leitura
+        self.sendLatency = Histogram()       # duração de cada chamada de envio (rajada)
+        self.pacingLateness = Histogram()    # atraso de cada quadro em relação ao prazo
+        self.readTime = Histogram()          # tempo de leitura do quadro no VideoStream
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        snap = {name: getattr(self, name) for name in COUNTERS}
+        snap.update({name: getattr(self, name).snapshot() for name in HISTOGRAMS})
+        snap['packetsPerSecond'] = self.packetsSent / elapsed if elapsed > 0 else 0.0
+        return snap
+
+class MetricsRegistry:
+    """Registro do processo: sessões ativas + totais das sessões já encerradas."""
+
+    _shared = None
+    _sharedLock = threading.Lock()
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.retired = []     # snapshots das sessões encerradas, já somados em um só
+
+    @classmethod
+    def shared(cls):
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def register(self, metrics):
+        with self.lock:
+            self.sessions[metrics.sessionId] = metrics
+
+    def unregister(self, sessionId):
+        with self.lock:
+            metrics = self.sessions.pop(sessionId, None)
+            if metrics is not None:
+                self.retired = [self.aggregate([metrics.snapshot()] + self.retired)]
+
+    def session(self, sessionId):
+        with self.lock:
+            return self.sessions.get(sessionId)
+
+    @staticmethod
+    def aggregate(snapshots):
+        """Soma snapshots de sessões (ou de processos) em um só."""
+        total = {name: sum(s[name] for s in snapshots) for name in COUNTERS}
+        total.update({name: Histogram.merge(s[name] for s in snapshots) for name in HISTOGRAMS})
+        total['packetsPerSecond'] = sum(s.get('packetsPerSecond', 0.0) for s in snapshots)
+        return total
+
+    def snapshot(self):
+        """Estado completo do processo: sessões ativas, agregado e extras (cache, etc.)."""
+        with self.lock:
+            active = {sid: m.snapshot() for sid, m in self.sessions.items()}
+            retired = list(self.retired)
+        total = self.aggregate(list(active.values()) + retired)
+        # pacotes/s do agregado contam apenas as sessões ativas
+        total['packetsPerSecond'] = sum(s['packetsPerSecond'] for s in active.values())
+        return {'sessions': active, 'total': total, 'extra': self.extra()}
+
+    def extra(self):
+        """Métricas de outros componentes do processo."""
+        from FrameCache import FrameCache
+        from PacingScheduler import PacingScheduler
+        cache = FrameCache.shared().stats()
+        # chaves já no formato de nome do Prometheus (sem o prefixo rtsp_)
+        extra = {
+            'frame_cache_hits_total': cache['hits'],
+            'frame_cache_misses_total': cache['misses'],
+            'frame_cache_evictions_total': cache['evictions'],
+            'frame_cache_bytes': cache['bytes'],
+        }
+        if PacingScheduler._shared is not None:
+            extra['scheduler_max_lateness_seconds'] = PacingScheduler._shared.lateness
+        return extra
+
+def renderParameters(snap, prefix=""):
+    """Texto `chave: valor` para o corpo de uma resposta GET_PARAMETER."""
+    lines = []
+    for name in COUNTERS + ('packetsPerSecond',):
+        value = snap[name]
+        lines.append(f"{prefix}{name}: {value:.1f}" if isinstance(value, float) else f"{prefix}{name}: {value}")
+    for name in HISTOGRAMS:
+        h = snap[name]
+        mean = h['sum'] / h['count'] if h['count'] else 0.0
+        lines.append(f"{prefix}{name}: mean={mean * 1000:.3f}ms max={h['max'] * 1000:.3f}ms count={h['count']}")
+    return "\r\n".join(lines) + "\r\n"
+
+PROMETHEUS_NAMES = {
+    'framesSent': ('rtsp_frames_sent_total', 'counter', 'Quadros enviados'),
+    'framesSkipped': ('rtsp_frames_skipped_total', 'counter', 'Quadros pulados pela adaptação de taxa'),
+    'rtcpReports': ('rtsp_rtcp_reports_total', 'counter', 'Relatórios RTCP do receptor recebidos'),
+    'nacksReceived': ('rtsp_nacks_received_total', 'counter', 'Pacotes NACK recebidos'),
+    'packetsRetransmitted': ('rtsp_packets_retransmitted_total', 'counter', 'Pacotes RTP reenviados por NACK'),
+    'prefetchStalls': ('rtsp_prefetch_stalls_total', 'counter', 'Quadros devidos ainda em leitura antecipada'),
+    'packetsSent': ('rtsp_packets_sent_total', 'counter', 'Pacotes RTP enviados'),
+    'bytesSent': ('rtsp_bytes_sent_total', 'counter', 'Bytes RTP enviados (cabeçalho + payload)'),
+    'packetsPerSecond': ('rtsp_packets_per_second', 'gauge', 'Pacotes por segundo desde o PLAY'),
+    'sendLatency': ('rtsp_send_call_seconds', 'histogram', 'Duração de cada chamada de envio'),
+    'pacingLateness': ('rtsp_pacing_lateness_seconds', 'histogram', 'Atraso de cada quadro em relação ao prazo'),
+    'readTime': ('rtsp_frame_read_seconds', 'histogram', 'Tempo de leitura de um quadro no VideoStream'),
+}
+
+def renderPrometheus(snap):
+    """Formato de texto do Prometheus: agregado (tudo) e por sessão (contadores e atraso máximo).
+
+    As séries por sessão ficam em famílias `rtsp_session_*` para que somar
+    uma família nunca conte o mesmo pacote duas vezes.
+    """
+    out = []
+    for key in COUNTERS + ('packetsPerSecond',):
+        name, kind, description = PROMETHEUS_NAMES[key]
+        out.append(f"# HELP {name} {description}")
+        out.append(f"# TYPE {name} {kind}")
+        out.append(f"{name} {snap['total'][key]}")
+        sessionName = name.replace('rtsp_', 'rtsp_session_', 1)
+        out.append(f"# TYPE {sessionName} {kind}")
+        for sid, session in snap['sessions'].items():
+            out.append(f'{sessionName}{{session="{sid}"}} {session[key]}')
+    out.append("# TYPE rtsp_session_pacing_lateness_max_seconds gauge")
+    for sid, session in snap['sessions'].items():
+        out.append(f'rtsp_session_pacing_lateness_max_seconds{{session="{sid}"}} {session["pacingLateness"]["max"]}')
+    for key in HISTOGRAMS:
+        name, kind, description = PROMETHEUS_NAMES[key]
+        h = snap['total'][key]
+        out.append(f"# HELP {name} {description}")
+        out.append(f"# TYPE {name} {kind}")
+        cumulative = 0
+        for bound, count in zip(h['buckets'] + ['+Inf'], h['counts']):
+            cumulative += count
+            out.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        out.append(f"{name}_sum {h['sum']}")
+        out.append(f"{name}_count {h['count']}")
+    out.append("# TYPE rtsp_sessions_active gauge")
+    out.append(f"rtsp_sessions_active {len(snap['sessions'])}")
+    for key, value in snap['extra'].items():
+        out.append(f"rtsp_{key} {value}")
+    return "\n".join(out) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    snapshot = staticmethod(lambda: MetricsRegistry.shared().snapshot())
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = renderPrometheus(self.snapshot()).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def startMetricsServer(port, host="127.0.0.1", snapshot=None):
+    """Sobe o endpoint HTTP `/metrics` numa thread; `snapshot` troca a fonte dos dados."""
+    handler = MetricsHandler
+    if snapshot is not None:
+        handler = type('MetricsHandler', (MetricsHandler,), {'snapshot': staticmethod(snapshot)})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    return server
+
+def mergeSnapshots(snapshots):
+    """Junta snapshots de vários processos (`{índice: snapshot}`) num só.
+
+    As sessões ganham o índice do processo no identificador, pois cada
+    processo sorteia os seus; extras em segundos ficam com o máximo, os
+    demais são somados.
+    """
+    sessions = {}
+    extra = {}
+    for index, snap in sorted(snapshots.items()):
+        for sid, session in snap['sessions'].items():
+            sessions[f"{index}/{sid}"] = session
+        for key, value in snap['extra'].items():
+            if key.endswith('_seconds'):
+                extra[key] = max(extra.get(key, 0.0), value)
+            else:
+                extra[key] = extra.get(key, 0) + value
+    total = MetricsRegistry.aggregate([snap['total'] for snap in snapshots.values()])
+    return {'sessions': sessions, 'total': total, 'extra': extra}
@@ -0,0 +1,64 @@
+import heapq, itertools, threading, time, logging
+
+logger = logging.getLogger(__name__)
+
+class PacingScheduler:
+    """Escalonador único de envio: um heap de prazos no relógio monotônico.
+
+    Todas as sessões do processo agendam aqui seus quadros e rajadas de
+    pacotes; uma só thread dorme até o próximo prazo e executa o callback,
+    em vez de uma thread dormindo por sessão.
+    """
+
+    _shared = None
+    _sharedLock = threading.Lock()
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()   # desempate estável entre prazos iguais
+        self.cond = threading.Condition()
+        self.lateness = 0.0                # maior atraso observado (s)
+        self.thread = threading.Thread(target=self.run, name="PacingScheduler", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def shared(cls):
+        """Instância única do processo (criada sob demanda)."""
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def now():
+        return time.monotonic()
+
+    def schedule(self, deadline, callback):
+        """Executa `callback()` no instante `deadline` (segundos de `time.monotonic()`)."""
+        with self.cond:
+            heapq.heappush(self.heap, (deadline, next(self.counter), callback))
+            # acorda a thread só se o novo prazo for o mais próximo
+            if self.heap[0][2] is callback:
+                self.cond.notify()
+
+    def run(self):
+        """Laço da thread: dorme até o prazo mais próximo e executa o que venceu."""
+        while True:
+            with self.cond:
+                while True:
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    delay = self.heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                deadline, _, callback = heapq.heappop(self.heap)
+
+            late = time.monotonic() - deadline
+            if late > self.lateness:
+                self.lateness = late
+            try:
+                callback()
+            except Exception:
+                logger.exception("Erro no escalonador")
@@ -0,0 +1,48 @@
+class PacketHistory:
+    """Anel dos últimos pacotes RTP enviados, indexado pelo número de sequência.
+
+    Guarda os mesmos pares (cabeçalho, payload) passados ao socket, sem
+    cópia, para reenviá-los quando o cliente pedir por NACK. `size` deve
+    dividir 65536 para que a volta do número de sequência caia no mesmo slot.
+    """
+
+    def __init__(self, size=1024, budget=0.2, holdoff=0.01):
+        self.size = size
+        self.budget = budget      # idade máxima (s) de um pacote que ainda vale reenviar
+        self.holdoff = holdoff    # intervalo mínimo (s) entre reenvios do mesmo pacote
+        self.seqs = [-1] * size
+        self.packets = [None] * size
+        self.sentAt = [0.0] * size
+        self.resentAt = [0.0] * size
+
+    def store(self, firstSeq, packets, now):
+        """Registra pacotes com números de sequência consecutivos a partir de `firstSeq`."""
+        size = self.size
+        for i, packet in enumerate(packets):
+            seq = (firstSeq + i) & 0xFFFF
+            slot = seq % size
+            self.seqs[slot] = seq
+            self.packets[slot] = packet
+            self.sentAt[slot] = now
+            self.resentAt[slot] = 0.0
+
+    def retransmit(self, seqs, now):
+        """Pacotes a reenviar para os `seqs` pedidos, dentro do orçamento de tempo.
+
+        Pacotes velhos demais (o quadro já passou do ponto de exibição no
+        cliente) ou reenviados há pouco são ignorados.
+        """
+        out = []
+        for seq in seqs:
+            slot = seq % self.size
+            if self.seqs[slot] != seq or now - self.sentAt[slot] > self.budget:
+                continue
+            if now - self.resentAt[slot] < self.holdoff:
+                continue
+            self.resentAt[slot] = now
+            out.append(self.packets[slot])
+        return out
+
+    def clear(self):
+        self.seqs = [-1] * self.size
+        self.packets = [None] * self.size
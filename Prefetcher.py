@@ -0,0 +1,172 @@
+import os, mmap, threading, logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# quadros lidos à frente de cada sessão e threads de E/S do processo
+DEFAULT_DEPTH = 8
+DEFAULT_THREADS = 4
+
+# maior leitura (bytes) feita de uma vez pelo `pread`
+MAX_READ = 8 * 1024 * 1024
+
+HAS_PREAD = hasattr(os, 'pread')
+HAS_FADVISE = hasattr(os, 'posix_fadvise')
+
+class Prefetcher:
+    """Leitura antecipada dos próximos quadros de um `VideoStream`.
+
+    Threads de E/S compartilhadas leem, com um único `pread` sequencial, os
+    `depth` quadros seguintes ao atual e os deixam prontos em memória. O
+    laço de envio só retira quadros prontos (`take`), então uma leitura
+    lenta (cache frio, disco em rede) atrasa a leitura antecipada, não o
+    escalonador compartilhado por todas as sessões.
+    """
+
+    depth = DEFAULT_DEPTH
+    threads = DEFAULT_THREADS
+    _pool = None
+    _poolLock = threading.Lock()
+
+    @classmethod
+    def configure(cls, depth=DEFAULT_DEPTH, threads=DEFAULT_THREADS):
+        """Define a profundidade (0 desativa) e as threads de E/S do processo."""
+        cls.depth = depth
+        cls.threads = threads
+
+    @classmethod
+    def pool(cls):
+        with cls._poolLock:
+            if cls._pool is None:
+                cls._pool = ThreadPoolExecutor(max_workers=cls.threads, thread_name_prefix="Prefetch")
+            return cls._pool
+
+    def __init__(self, stream, depth=None):
+        self.stream = stream
+        self.depth = depth or self.depth
+        self.lock = threading.Lock()
+        self.ready = {}          # nº do quadro -> bytes
+        self.nextLoad = 0        # próximo quadro ainda não pedido às threads de E/S
+        self.inflight = False
+        self.generation = 0      # muda a cada `reset`: leituras anteriores são descartadas
+        self.closed = False
+        self.loads = 0
+        if HAS_FADVISE:
+            try:
+                os.posix_fadvise(stream.file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        if isinstance(stream.data, mmap.mmap) and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            stream.data.madvise(mmap.MADV_SEQUENTIAL)
+
+    def schedule(self):
+        """Pede mais quadros às threads de E/S, se houver espaço na janela."""
+        with self.lock:
+            if self.inflight or self.closed:
+                return
+            self.nextLoad = max(self.nextLoad, self.stream.frameNum)
+            if self.nextLoad >= self.stream.frameCount() or len(self.ready) >= self.depth:
+                return
+            self.inflight = True
+        self.pool().submit(self.load)
+
+    def load(self):
+        try:
+            with self.lock:
+                generation = self.generation
+                stride = self.stream.stride
+                first = self.nextLoad
+                last = min(self.stream.frameCount(), self.stream.frameNum + self.depth * stride)
+            wanted = range(first, last, stride)
+            if wanted:
+                if stride == 1:
+                    frames = self.read(first, last)
+                else:
+                    # avanço rápido: só os quadros que serão enviados, um a um
+                    frames = [loaded for n in wanted for loaded in self.read(n, n + 1)]
+                with self.lock:
+                    if generation == self.generation:
+                        current = self.stream.frameNum
+                        for n, frame in frames:
+                            if n >= current:
+                                self.ready[n] = frame
+                        self.nextLoad = max(self.nextLoad, wanted[-1] + stride)
+                        self.loads += 1
+        except Exception:
+            # arquivo fechado no meio da leitura (TEARDOWN) não é erro
+            if not self.closed:
+                logger.exception("Erro na leitura antecipada de %s", self.stream.filename)
+        finally:
+            with self.lock:
+                self.inflight = False
+        self.schedule()
+
+    def read(self, first, last):
+        """Lê os quadros [first, last) com leituras grandes e sequenciais."""
+        stream = self.stream
+        starts, ends = stream.starts, stream.ends
+        cache = stream.cache
+        out = []
+        n = first
+        while n < last:
+            cached = cache.peek((stream.fileKey, n)) if cache is not None else None
+            if cached is not None:
+                out.append((n, cached))
+                n += 1
+                continue
+            # trecho contíguo de quadros a ler num só pread
+            end = n + 1
+            while end < last and ends[end] - starts[n] <= MAX_READ:
+                end += 1
+            offset = starts[n]
+            chunk = self.readRange(offset, ends[end - 1] - offset)
+            if HAS_FADVISE and end < stream.frameCount():
+                # avisa o kernel do trecho seguinte enquanto este é consumido
+                try:
+                    os.posix_fadvise(stream.file.fileno(), ends[end - 1],
+                                     ends[min(stream.frameCount(), end + self.depth) - 1] - ends[end - 1],
+                                     os.POSIX_FADV_WILLNEED)
+                except OSError:
+                    pass
+            # sem cache os quadros são fatias do trecho lido (sem cópia)
+            view = memoryview(chunk)
+            for i in range(n, end):
+                data = view[starts[i] - offset : ends[i] - offset]
+                frame = data if cache is None else cache.get((stream.fileKey, i), lambda data=data: bytes(data))
+                out.append((i, frame))
+            n = end
+        return out
+
+    def readRange(self, offset, length):
+        if HAS_PREAD:
+            return os.pread(self.stream.file.fileno(), length, offset)
+        return self.stream.data[offset : offset + length]
+
+    def take(self, n):
+        """Retira o quadro `n` se estiver pronto (senão `None`) e reabastece a janela."""
+        with self.lock:
+            frame = self.ready.pop(n, None)
+        self.schedule()
+        return frame
+
+    def isReady(self, n):
+        with self.lock:
+            return n in self.ready
+
+    def discard(self, n):
+        with self.lock:
+            self.ready.pop(n, None)
+        self.schedule()
+
+    def reset(self):
+        """Recomeça a leitura antecipada do quadro atual (após `seek`)."""
+        with self.lock:
+            self.ready.clear()
+            self.nextLoad = 0
+            self.generation += 1
+        self.schedule()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.ready.clear()
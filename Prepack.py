@@ -0,0 +1,248 @@
+"""Conversor offline dos vídeos `.Mjpeg` para o formato pré-empacotado.
+
+Gera, ao lado de cada vídeo, um `<arquivo>.rtpx` com o índice de quadros,
+os tempos de apresentação e os fragmentos RTP já calculados (com os
+cabeçalhos RFC 2435 prontos), que o `VideoStream` mapeia em memória no
+lugar de varrer o arquivo.
+
+Uso: python3 Prepack.py movie.Mjpeg [outro.Mjpeg | diretório ...] [--max-payload 1400]
+"""
+import os, sys, mmap, struct, argparse, logging
+from array import array
+from RtpPacket import HEADER, HEADER_SIZE
+from Rfc2435 import Rfc2435Packetizer, parseJpeg, PT_JPEG, PT_JFIF, QTABLE_HEADER, Q_DYNAMIC
+from FramePacketizer import MAX_RTP_PAYLOAD, CLOCK_RATE
+
+logger = logging.getLogger(__name__)
+
+PREPACK_SUFFIX = '.rtpx'
+MAGIC = b'MJPX'
+VERSION = 1
+# o do servidor; arquivos com outro tamanho só servem o índice de quadros
+DEFAULT_MAX_PAYLOAD = MAX_RTP_PAYLOAD
+
+# mágico, versão, ordem dos bytes (1 = little-endian), payload máximo, fps,
+# nº de quadros, nº de fragmentos, tamanho do bloco de cabeçalhos,
+# tamanho e mtime (ns) do `.Mjpeg` de origem
+FILE_HEADER = struct.Struct('=4sBBHdIIIQq')
+
+# seções, nesta ordem, alinhadas em 8 bytes: (nome, código do array, por quadro/fragmento)
+FRAME_SECTIONS = (('starts', 'Q'), ('ends', 'Q'), ('pts', 'Q'), ('firstFragment', 'I'),
+                  ('tablesHeader', 'I'), ('tablesHeaderLength', 'H'), ('pt', 'B'), ('q', 'B'))
+FRAGMENT_SECTIONS = (('fragmentStart', 'I'), ('fragmentEnd', 'I'), ('header', 'I'), ('headerLength', 'H'))
+
+def align(n):
+    return (n + 7) & ~7
+
+def sidecarPath(filename):
+    return filename + PREPACK_SUFFIX
+
+class PrepackedIndex:
+    """Um `.rtpx` mapeado em memória: índice de quadros e fragmentos RTP prontos.
+
+    Cada seção é um `memoryview` tipado sobre o mapeamento, então abrir o
+    arquivo não lê nem aloca nada por quadro. Por fragmento há o intervalo
+    do payload (relativo ao início do quadro) e os bytes que seguem o
+    cabeçalho RTP (cabeçalho RFC 2435, restart e tabelas); o primeiro
+    fragmento tem duas versões, sem e com as tabelas de quantização.
+    """
+
+    def __init__(self, file, data, header):
+        self.file = file
+        self.data = data
+        magic, version, little, self.maxPayload, self.fps, frames, fragments, blobSize, _, _ = header
+        self.view = view = memoryview(data)
+        offset = align(FILE_HEADER.size)
+        counts = [frames] * len(FRAME_SECTIONS) + [fragments] * len(FRAGMENT_SECTIONS)
+        for (name, code), count in zip(FRAME_SECTIONS + FRAGMENT_SECTIONS, counts):
+            if name == 'firstFragment':
+                # um a mais: o fim dos fragmentos do último quadro
+                count += 1
+            size = count * array(code).itemsize
+            setattr(self, name, view[offset : offset + size].cast(code))
+            offset = align(offset + size)
+        self.blob = view[offset : offset + blobSize]
+        if offset + blobSize > len(data):
+            raise ValueError("arquivo truncado")
+
+    @classmethod
+    def open(cls, filename, size, mtime):
+        """Índice de `filename`, ou `None` se não houver um `.rtpx` válido para esta versão do arquivo."""
+        try:
+            file = open(sidecarPath(filename), 'rb')
+        except OSError:
+            return None
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            header = FILE_HEADER.unpack_from(data)
+            magic, version, little, _, _, _, _, _, sourceSize, sourceMtime = header
+            if magic != MAGIC or version != VERSION or little != (sys.byteorder == 'little'):
+                raise ValueError("formato incompatível")
+            if (sourceSize, sourceMtime) != (size, mtime):
+                raise ValueError("desatualizado em relação ao vídeo")
+            return cls(file, data, header)
+        except (ValueError, OSError, struct.error) as e:
+            logger.warning("Ignorando %s: %s", sidecarPath(filename), e)
+            file.close()
+            return None
+
+    def frameCount(self):
+        return len(self.starts)
+
+    def packets(self, n, data, seq, ssrc, timestamp, packetizer):
+        """Lista de (cabeçalho, payload) do quadro `n` (a partir de 0) já lido em `data`.
+
+        Por pacote resta só empacotar os 12 bytes do cabeçalho RTP; as
+        tabelas vão conforme o estado de reenvio do `packetizer` da sessão.
+        O Q gravado na conversão numera as tabelas só deste arquivo: o que
+        sai é o que o `packetizer` deu a elas, o mesmo dos quadros
+        empacotados ao vivo na sessão (outra versão da escada, sem `.rtpx`).
+        """
+        first, last = self.firstFragment[n], self.firstFragment[n + 1]
+        pt = self.pt[n]
+        blob = self.blob
+        q = None
+        if pt == PT_JPEG:
+            # as tabelas fecham a versão do primeiro fragmento que as leva
+            end = self.tablesHeader[n] + self.tablesHeaderLength[n]
+            q = packetizer.qFor(bytes(blob[end - 128 : end]))
+        sendTables = q is not None and packetizer.tablesDue(q)
+        # Q é o 6º byte do cabeçalho RFC 2435; só regravado se diferir do arquivo
+        qByte = bytes((q,)) if q is not None and q != self.q[n] else None
+        view = memoryview(data)
+        starts, ends = self.fragmentStart, self.fragmentEnd
+        headers, lengths = self.header, self.headerLength
+        pack = HEADER.pack
+        timestamp &= 0xFFFFFFFF
+        ssrc &= 0xFFFFFFFF
+        packets = []
+        for i in range(first, last):
+            if i == first and sendTables:
+                offset = self.tablesHeader[n]
+                extra = blob[offset : offset + self.tablesHeaderLength[n]]
+            else:
+                offset = headers[i]
+                extra = blob[offset : offset + lengths[i]]
+            header = pack(0x80, (0x80 if i == last - 1 else 0) | pt, seq, timestamp, ssrc)
+            if qByte is None:
+                header += extra
+            else:
+                header = b"".join((header, extra[:5], qByte, extra[6:]))
+            packets.append((header, view[starts[i] : ends[i]]))
+            seq = (seq + 1) & 0xFFFF
+        return packets
+
+    def close(self):
+        for name, _ in FRAME_SECTIONS + FRAGMENT_SECTIONS:
+            getattr(self, name).release()
+        self.blob.release()
+        self.view.release()
+        self.data.close()
+        self.file.close()
+
+def convert(filename, maxPayload=DEFAULT_MAX_PAYLOAD):
+    """Gera o `.rtpx` de `filename`; devolve (quadros, fragmentos, quadros em RFC 2435)."""
+    # importado aqui: o VideoStream importa este módulo para ler os `.rtpx`
+    from VideoStream import VideoStream
+
+    stream = VideoStream(filename, prepacked=False)
+    try:
+        fps = stream.frameRate()
+        # refresh=1: o primeiro fragmento sempre sai com as tabelas, e com elas o
+        # espaço do payload é o menor; sem elas o pacote só fica um pouco mais curto
+        packetizer = Rfc2435Packetizer(maxPayload, refresh=1)
+        sections = {name: array(code) for name, code in FRAME_SECTIONS + FRAGMENT_SECTIONS}
+        blob = bytearray()
+        jpegFrames = 0
+        for n in range(stream.frameCount()):
+            start, end = stream.starts[n], stream.ends[n]
+            data = stream.view[start:end]
+            sections['starts'].append(start)
+            sections['ends'].append(end)
+            sections['pts'].append(round(n * CLOCK_RATE / fps))
+            sections['firstFragment'].append(len(sections['fragmentStart']))
+            packets = packetizer.packetize(data, 0, 0, 0)
+            frame = parseJpeg(data) if packets is not None else None
+            data.release()
+            if packets is None:
+                # fora do RFC 2435: JFIF inteiro fatiado, sem cabeçalho extra
+                sections['pt'].append(PT_JFIF)
+                sections['q'].append(0)
+                sections['tablesHeader'].append(0)
+                sections['tablesHeaderLength'].append(0)
+                for offset in range(0, end - start, maxPayload):
+                    sections['fragmentStart'].append(offset)
+                    sections['fragmentEnd'].append(min(offset + maxPayload, end - start))
+                    sections['header'].append(0)
+                    sections['headerLength'].append(0)
+                continue
+            jpegFrames += 1
+            q = packets[0][0][HEADER_SIZE + 5]
+            sections['pt'].append(PT_JPEG)
+            sections['q'].append(q)
+            offset = frame.scanStart
+            for i, (header, payload) in enumerate(packets):
+                extra = bytes(header[HEADER_SIZE:])
+                if i == 0:
+                    sections['tablesHeader'].append(len(blob))
+                    sections['tablesHeaderLength'].append(len(extra))
+                    blob += extra
+                    if q != Q_DYNAMIC:
+                        # mesma versão sem as tabelas: o cabeçalho delas só com comprimento zero
+                        tablesAt = len(extra) - QTABLE_HEADER.size - len(frame.tables)
+                        extra = extra[:tablesAt] + QTABLE_HEADER.pack(0, 0, 0)
+                sections['fragmentStart'].append(offset)
+                sections['fragmentEnd'].append(offset + len(payload))
+                sections['header'].append(len(blob))
+                sections['headerLength'].append(len(extra))
+                blob += extra
+                offset += len(payload)
+        sections['firstFragment'].append(len(sections['fragmentStart']))
+
+        _, mtime, size = stream.fileKey
+        header = FILE_HEADER.pack(MAGIC, VERSION, sys.byteorder == 'little', maxPayload, fps,
+                                  stream.frameCount(), len(sections['fragmentStart']), len(blob), size, mtime)
+    finally:
+        stream.close()
+
+    # escreve num temporário e renomeia: servidores no ar nunca veem um arquivo pela metade
+    path = sidecarPath(filename)
+    with open(path + '.tmp', 'wb') as out:
+        out.write(header.ljust(align(len(header)), b'\0'))
+        for name, _ in FRAME_SECTIONS + FRAGMENT_SECTIONS:
+            chunk = sections[name].tobytes()
+            out.write(chunk.ljust(align(len(chunk)), b'\0'))
+        out.write(blob)
+    os.replace(path + '.tmp', path)
+    return stream.frameCount(), len(sections['fragmentStart']), jpegFrames
+
+def findMedia(paths):
+    """Vídeos dos caminhos dados (diretórios são percorridos)."""
+    from MediaCatalog import MEDIA_EXTENSIONS, RENDITIONS_SUFFIX
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [d for d in dirnames if not d.endswith(RENDITIONS_SUFFIX)]
+            for name in sorted(filenames):
+                if name.lower().endswith(MEDIA_EXTENSIONS):
+                    yield os.path.join(dirpath, name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Prepack.py",
+        usage="%(prog)s Video_ou_Diretório [...] [opções]",
+        epilog="Exemplo: python3 Prepack.py movie.Mjpeg")
+    parser.add_argument("paths", nargs='+', help="vídeos .Mjpeg ou diretórios com vídeos")
+    parser.add_argument("--max-payload", type=int, default=DEFAULT_MAX_PAYLOAD,
+                        help="payload RTP máximo, igual ao do servidor (padrão: %d)" % DEFAULT_MAX_PAYLOAD)
+    args = parser.parse_args()
+
+    for filename in findMedia(args.paths):
+        try:
+            frames, fragments, jpegFrames = convert(filename, args.max_payload)
+        except IOError as e:
+            print(f"{filename}: erro: {e}")
+            continue
+        print(f"{sidecarPath(filename)}: {frames} quadros ({jpegFrames} em RFC 2435), {fragments} fragmentos")
@@ -0,0 +1,45 @@
+class RateController:
+    """Afina a taxa de quadros de uma sessão a partir dos relatórios RTCP.
+
+    A sessão envia um a cada `divisor` quadros. Perda alta dobra o divisor
+    e perda moderada o aumenta em um (recuo rápido); `recoverReports`
+    relatórios seguidos com pouca perda o reduzem em um (retomada gradual).
+    """
+
+    def __init__(self, maxDivisor=8, highLoss=0.10, lowLoss=0.02, recoverReports=3):
+        self.maxDivisor = maxDivisor
+        self.highLoss = highLoss
+        self.lowLoss = lowLoss
+        self.recoverReports = recoverReports
+        self.divisor = 1
+        self.goodReports = 0
+        self.loss = 0.0           # fração perdida no último relatório
+        self.jitter = 0.0         # jitter informado no último relatório (s)
+        self.reports = 0
+
+    def onReport(self, loss, jitter=0.0):
+        """Aplica um relatório; devolve `True` se o divisor mudou."""
+        self.reports += 1
+        self.loss = loss
+        self.jitter = jitter
+        previous = self.divisor
+        if loss >= self.highLoss:
+            self.divisor = min(self.maxDivisor, self.divisor * 2)
+            self.goodReports = 0
+        elif loss > self.lowLoss:
+            self.divisor = min(self.maxDivisor, self.divisor + 1)
+            self.goodReports = 0
+        else:
+            self.goodReports += 1
+            if self.goodReports >= self.recoverReports and self.divisor > 1:
+                self.divisor -= 1
+                self.goodReports = 0
+        return self.divisor != previous
+
+    def shouldSend(self, frameIndex):
+        """Se o quadro de índice `frameIndex` (0 = primeiro) deve ser enviado."""
+        return frameIndex % self.divisor == 0
+
+    def reset(self):
+        self.divisor = 1
+        self.goodReports = 0
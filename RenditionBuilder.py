@@ -0,0 +1,140 @@
+"""Gera a escada de qualidade dos vídeos `.Mjpeg` (resoluções e qualidades menores).
+
+Cada quadro é decodificado uma vez e reencodado em todas as versões, em
+lotes distribuídos por um pool de processos (o Pillow só libera o GIL em
+parte do trabalho). As versões ficam em `<vídeo>.renditions/`, com o mesmo
+número de quadros e taxa do original, cada uma com seu `.rtpx` (Prepack.py)
+e um `index.json` que o catálogo do servidor lê.
+
+Uso: python3 RenditionBuilder.py movie.Mjpeg [outro.Mjpeg | diretório ...] [--ladder 480p:480:80,360p:360:70] [--jobs N]
+"""
+import os, io, json, time, argparse, logging
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from VideoStream import VideoStream
+from MediaCatalog import RENDITIONS_MANIFEST, SOURCE_RENDITION, renditionDir, jpegSize
+from Prepack import convert as prepack, findMedia
+
+logger = logging.getLogger(__name__)
+
+# nome:altura:qualidade JPEG de cada degrau; degraus não menores que o original são pulados
+DEFAULT_LADDER = "480p:480:80,360p:360:70,240p:240:60"
+# quadros por tarefa do pool: grande o bastante para diluir a troca entre processos
+CHUNK_FRAMES = 16
+
+def parseLadder(text):
+    """[(nome, altura, qualidade)] a partir de `nome:altura:qualidade,...`."""
+    ladder = []
+    for rung in text.split(','):
+        name, height, quality = rung.strip().split(':')
+        if name == SOURCE_RENDITION:
+            raise ValueError("o nome %r é reservado ao original" % name)
+        ladder.append((name, int(height), int(quality)))
+    return ladder
+
+def targetSize(width, height, targetHeight):
+    """Dimensões com a mesma proporção, múltiplas de 16 (MCU 4:2:0, exigido pelo RFC 2435)."""
+    targetWidth = width * targetHeight / height
+    return (max(16, int(round(targetWidth / 16)) * 16), max(16, int(round(targetHeight / 16)) * 16))
+
+def encodeChunk(path, ranges, targets):
+    """Tarefa do pool: reencoda os quadros `ranges` [(início, fim)] de `path` em cada versão.
+
+    Devolve, por versão de `targets` [(largura, altura, qualidade)], a lista
+    dos quadros JPEG. O arquivo é lido aqui, no processo do pool, para só
+    os quadros prontos voltarem pelo pipe.
+    """
+    largest = max((w, h) for w, h, _ in targets)
+    out = [[] for _ in targets]
+    with open(path, 'rb') as f:
+        for start, end in ranges:
+            f.seek(start)
+            image = Image.open(io.BytesIO(f.read(end - start)))
+            # decodifica direto na menor escala DCT que ainda cobre a maior versão
+            image.draft('RGB', largest)
+            image = image.convert('RGB')
+            for frames, (width, height, quality) in zip(out, targets):
+                buffer = io.BytesIO()
+                # baseline 4:2:0 com as tabelas padrão de Huffman: empacotável no RFC 2435
+                image.resize((width, height), Image.BILINEAR).save(buffer, 'JPEG', quality=quality, subsampling=2)
+                frames.append(buffer.getvalue())
+    return out
+
+def build(filename, ladder, jobs=None, chunkFrames=CHUNK_FRAMES):
+    """Gera as versões de `filename`; devolve o resumo (quadros, segundos, versões)."""
+    started = time.perf_counter()
+    stream = VideoStream(filename)
+    try:
+        ranges = list(zip(stream.starts, stream.ends))
+        fps = stream.frameRate()
+        first = stream.nextFrame()
+        width, height = jpegSize(first) if first is not None else (0, 0)
+        del first
+    finally:
+        stream.close()
+    if not ranges or not height:
+        raise IOError("sem quadros JPEG legíveis: %s" % filename)
+
+    rungs = [(name, targetSize(width, height, h), quality) for name, h, quality in ladder if h < height]
+    if not rungs:
+        return {'frames': len(ranges), 'seconds': 0.0, 'renditions': []}
+    directory = renditionDir(filename)
+    os.makedirs(directory, exist_ok=True)
+    outputs = [open(os.path.join(directory, name + '.Mjpeg.tmp'), 'wb') for name, _, _ in rungs]
+    sizes = [0] * len(rungs)
+    targets = [(w, h, quality) for _, (w, h), quality in rungs]
+    chunks = [ranges[i : i + chunkFrames] for i in range(0, len(ranges), chunkFrames)]
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # `map` devolve na ordem dos quadros, qualquer que seja o processo que terminou antes
+            for result in pool.map(encodeChunk, repeat(filename), chunks, repeat(targets)):
+                for i, frames in enumerate(result):
+                    for frame in frames:
+                        outputs[i].write(frame)
+                        sizes[i] += len(frame)
+    finally:
+        for out in outputs:
+            out.close()
+    encoded = time.perf_counter() - started
+
+    manifest = []
+    for (name, (w, h), quality), size in zip(rungs, sizes):
+        path = os.path.join(directory, name + '.Mjpeg')
+        os.replace(path + '.tmp', path)
+        with open(path + '.fps', 'w') as f:
+            f.write("%g\n" % fps)
+        # índice e fragmentos prontos: a troca de versão no PLAY não varre o arquivo
+        prepack(path)
+        manifest.append({
+            'name': name, 'file': name + '.Mjpeg', 'width': w, 'height': h, 'quality': quality,
+            'frames': len(ranges), 'bitrate': round(size * 8 * fps / len(ranges)),
+        })
+    with open(os.path.join(directory, RENDITIONS_MANIFEST + '.tmp'), 'w') as f:
+        json.dump({'source': os.path.basename(filename), 'renditions': manifest}, f, indent=2)
+    os.replace(os.path.join(directory, RENDITIONS_MANIFEST + '.tmp'), os.path.join(directory, RENDITIONS_MANIFEST))
+    return {'frames': len(ranges), 'seconds': encoded, 'renditions': manifest}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="RenditionBuilder.py",
+        usage="%(prog)s Video_ou_Diretório [...] [opções]",
+        epilog="Exemplo: python3 RenditionBuilder.py movie.Mjpeg --ladder 480p:480:80,240p:240:60")
+    parser.add_argument("paths", nargs='+', help="vídeos .Mjpeg ou diretórios com vídeos")
+    parser.add_argument("--ladder", default=DEFAULT_LADDER,
+                        help="versões como nome:altura:qualidade, separadas por vírgula (padrão: %s)" % DEFAULT_LADDER)
+    parser.add_argument("--jobs", type=int, default=None, help="processos de codificação (padrão: um por núcleo)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_FRAMES, help="quadros por tarefa (padrão: %d)" % CHUNK_FRAMES)
+    args = parser.parse_args()
+    ladder = parseLadder(args.ladder)
+
+    for filename in findMedia(args.paths):
+        try:
+            summary = build(filename, ladder, args.jobs, args.chunk)
+        except IOError as e:
+            print(f"{filename}: erro: {e}")
+            continue
+        fps = summary['frames'] / summary['seconds'] if summary['seconds'] else 0.0
+        print(f"{filename}: {summary['frames']} quadros em {summary['seconds']:.1f} s ({fps:.1f} quadros/s)")
+        for r in summary['renditions']:
+            print(f"  {r['name']}: {r['width']}x{r['height']} q{r['quality']}, {r['bitrate'] / 1e6:.2f} Mbit/s")
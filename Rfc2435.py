@@ -0,0 +1,369 @@
+import struct
+from FrameReassembler import FrameReassembler, SOI, EOI
+
+# payload types: JPEG do RFC 2435 (estático, RFC 3551) e JFIF inteiro fatiado (dinâmico)
+PT_JPEG = 26
+PT_JFIF = 96
+
+# cabeçalho RTP + cabeçalho principal do RFC 2435 (seção 3.1):
+# tipo específico, offset do fragmento (24 bits), tipo, Q, largura/8, altura/8
+RTP_JPEG_HEADER = struct.Struct('!BBHIIIBBBB')
+JPEG_HEADER_SIZE = 8
+JPEG_HEADER = struct.Struct('!IBBBB')
+# cabeçalho de restart (seção 3.1.7) e de tabelas de quantização (seção 3.1.8)
+RESTART_HEADER = struct.Struct('!HH')
+QTABLE_HEADER = struct.Struct('!BBH')
+
+# Q com tabelas na banda: 128..254 são fixas por valor, 255 muda a cada quadro
+Q_INBAND = 128
+Q_DYNAMIC = 255
+# quadros entre reenvios das tabelas de um mesmo Q (receptores que perderam o primeiro envio)
+QTABLE_REFRESH = 30
+
+# maior quadro remontado no cliente
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+# ordem zigue-zague -> ordem natural dos 64 coeficientes
+ZIGZAG = (
+    0, 1, 8, 16, 9, 2, 3, 10, 17, 24, 32, 25, 18, 11, 4, 5,
+    12, 19, 26, 33, 40, 48, 41, 34, 27, 20, 13, 6, 7, 14, 21, 28,
+    35, 42, 49, 56, 57, 50, 43, 36, 29, 22, 15, 23, 30, 37, 44, 51,
+    58, 59, 52, 45, 38, 31, 39, 46, 53, 60, 61, 54, 47, 55, 62, 63,
+)
+
+# tabelas de quantização de referência (JPEG, anexo K.1), em ordem natural
+LUMA_QUANTIZER = (
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+)
+CHROMA_QUANTIZER = (
+    17, 18, 24, 47, 99, 99, 99, 99,
+    18, 21, 26, 66, 99, 99, 99, 99,
+    24, 26, 56, 99, 99, 99, 99, 99,
+    47, 66, 99, 99, 99, 99, 99, 99,
+) + (99,) * 32
+
+# tabelas de Huffman padrão (anexo K.3): (classe, id) -> contagens por tamanho + símbolos
+HUFFMAN_TABLES = {
+    (0, 0): bytes((0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0)) + bytes(range(12)),
+    (0, 1): bytes((0, 3, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0)) + bytes(range(12)),
+    (1, 0): bytes((0, 2, 1, 3, 3, 2, 4, 3, 5, 5, 4, 4, 0, 0, 1, 0x7d)) + bytes((
+        0x01, 0x02, 0x03, 0x00, 0x04, 0x11, 0x05, 0x12, 0x21, 0x31, 0x41, 0x06, 0x13, 0x51, 0x61, 0x07,
+        0x22, 0x71, 0x14, 0x32, 0x81, 0x91, 0xa1, 0x08, 0x23, 0x42, 0xb1, 0xc1, 0x15, 0x52, 0xd1, 0xf0,
+        0x24, 0x33, 0x62, 0x72, 0x82, 0x09, 0x0a, 0x16, 0x17, 0x18, 0x19, 0x1a, 0x25, 0x26, 0x27, 0x28,
+        0x29, 0x2a, 0x34, 0x35, 0x36, 0x37, 0x38, 0x39, 0x3a, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48, 0x49,
+        0x4a, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58, 0x59, 0x5a, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68, 0x69,
+        0x6a, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78, 0x79, 0x7a, 0x83, 0x84, 0x85, 0x86, 0x87, 0x88, 0x89,
+        0x8a, 0x92, 0x93, 0x94, 0x95, 0x96, 0x97, 0x98, 0x99, 0x9a, 0xa2, 0xa3, 0xa4, 0xa5, 0xa6, 0xa7,
+        0xa8, 0xa9, 0xaa, 0xb2, 0xb3, 0xb4, 0xb5, 0xb6, 0xb7, 0xb8, 0xb9, 0xba, 0xc2, 0xc3, 0xc4, 0xc5,
+        0xc6, 0xc7, 0xc8, 0xc9, 0xca, 0xd2, 0xd3, 0xd4, 0xd5, 0xd6, 0xd7, 0xd8, 0xd9, 0xda, 0xe1, 0xe2,
+        0xe3, 0xe4, 0xe5, 0xe6, 0xe7, 0xe8, 0xe9, 0xea, 0xf1, 0xf2, 0xf3, 0xf4, 0xf5, 0xf6, 0xf7, 0xf8,
+        0xf9, 0xfa)),
+    (1, 1): bytes((0, 2, 1, 2, 4, 4, 3, 4, 7, 5, 4, 4, 0, 1, 2, 0x77)) + bytes((
+        0x00, 0x01, 0x02, 0x03, 0x11, 0x04, 0x05, 0x21, 0x31, 0x06, 0x12, 0x41, 0x51, 0x07, 0x61, 0x71,
+        0x13, 0x22, 0x32, 0x81, 0x08, 0x14, 0x42, 0x91, 0xa1, 0xb1, 0xc1, 0x09, 0x23, 0x33, 0x52, 0xf0,
+        0x15, 0x62, 0x72, 0xd1, 0x0a, 0x16, 0x24, 0x34, 0xe1, 0x25, 0xf1, 0x17, 0x18, 0x19, 0x1a, 0x26,
+        0x27, 0x28, 0x29, 0x2a, 0x35, 0x36, 0x37, 0x38, 0x39, 0x3a, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48,
+        0x49, 0x4a, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58, 0x59, 0x5a, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68,
+        0x69, 0x6a, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78, 0x79, 0x7a, 0x82, 0x83, 0x84, 0x85, 0x86, 0x87,
+        0x88, 0x89, 0x8a, 0x92, 0x93, 0x94, 0x95, 0x96, 0x97, 0x98, 0x99, 0x9a, 0xa2, 0xa3, 0xa4, 0xa5,
+        0xa6, 0xa7, 0xa8, 0xa9, 0xaa, 0xb2, 0xb3, 0xb4, 0xb5, 0xb6, 0xb7, 0xb8, 0xb9, 0xba, 0xc2, 0xc3,
+        0xc4, 0xc5, 0xc6, 0xc7, 0xc8, 0xc9, 0xca, 0xd2, 0xd3, 0xd4, 0xd5, 0xd6, 0xd7, 0xd8, 0xd9, 0xda,
+        0xe2, 0xe3, 0xe4, 0xe5, 0xe6, 0xe7, 0xe8, 0xe9, 0xea, 0xf2, 0xf3, 0xf4, 0xf5, 0xf6, 0xf7, 0xf8,
+        0xf9, 0xfa)),
+}
+
+class JpegFrame:
+    """O que o RFC 2435 transporta de um JPEG: parâmetros, tabelas e dados da varredura."""
+
+    __slots__ = ('type', 'width', 'height', 'dri', 'tables', 'scanStart', 'scanEnd')
+
+    def __init__(self, type, width, height, dri, tables, scanStart, scanEnd):
+        self.type = type            # 0 (4:2:2) ou 1 (4:2:0); +64 com intervalo de restart
+        self.width = width
+        self.height = height
+        self.dri = dri
+        self.tables = tables        # luminância + crominância, 64 bytes cada, em zigue-zague
+        self.scanStart = scanStart
+        self.scanEnd = scanEnd
+
+def parseJpeg(data):
+    """`JpegFrame` de um JFIF, ou `None` se ele não couber no RFC 2435.
+
+    O formato só descreve JPEG baseline de 8 bits com três componentes
+    (Y 2x1 ou 2x2, Cb e Cr 1x1), tabelas de quantização de 8 bits e as
+    tabelas de Huffman padrão; dimensões múltiplas de 8 até 2040.
+    """
+    end = len(data)
+    if data[:2] != SOI:
+        return None
+    pos = 2
+    quant = {}
+    dri = 0
+    sof = None
+    while pos + 4 <= end:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        length = (data[pos + 2] << 8) | data[pos + 3]
+        segment = pos + 4
+        segmentEnd = pos + 2 + length
+        if length < 2 or segmentEnd > end:
+            return None
+        if marker == 0xDB:
+            # DQT: uma ou mais tabelas (precisão/id, 64 valores)
+            while segment < segmentEnd:
+                pq, tq = data[segment] >> 4, data[segment] & 0x0F
+                if pq != 0 or segment + 65 > segmentEnd:
+                    return None
+                quant[tq] = bytes(data[segment + 1 : segment + 65])
+                segment += 65
+        elif marker == 0xC4:
+            # DHT: só as tabelas padrão podem ser omitidas na transmissão
+            while segment < segmentEnd:
+                key = (data[segment] >> 4, data[segment] & 0x0F)
+                count = sum(data[segment + 1 : segment + 17])
+                table = bytes(data[segment + 1 : segment + 17 + count])
+                if HUFFMAN_TABLES.get(key) != table:
+                    return None
+                segment += 17 + count
+        elif marker == 0xDD:
+            dri = (data[segment] << 8) | data[segment + 1]
+        elif marker == 0xC0:
+            sof = bytes(data[segment : segmentEnd])
+        elif 0xC1 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            # progressivo, aritmético, sem perdas...
+            return None
+        elif marker == 0xDA:
+            if sof is None or data[segment] != 3:
+                return None
+            # componentes com as tabelas DC/AC 0 (Y) e 1 (Cb, Cr)
+            if bytes(data[segment + 2 : segment + 7 : 2]) != b'\x00\x11\x11':
+                return None
+            scanStart = segmentEnd
+            break
+        pos = segmentEnd
+    else:
+        return None
+
+    # SOF0: precisão, altura, largura, componentes (id, amostragem, tabela de quantização)
+    if len(sof) < 15 or sof[0] != 8 or sof[5] != 3:
+        return None
+    height = (sof[1] << 8) | sof[2]
+    width = (sof[3] << 8) | sof[4]
+    if width % 8 or height % 8 or not 0 < width <= 2040 or not 0 < height <= 2040:
+        return None
+    sampling = (sof[7], sof[10], sof[13])
+    if sampling == (0x21, 0x11, 0x11):
+        type = 0
+    elif sampling == (0x22, 0x11, 0x11):
+        type = 1
+    else:
+        return None
+    if sof[8] != 0 or sof[11] != 1 or sof[14] != 1 or 0 not in quant or 1 not in quant:
+        return None
+    if dri:
+        type += 64
+
+    # o EOI (fora do payload) fica no fim, às vezes seguido de preenchimento
+    tailStart = max(scanStart, end - 64)
+    eoi = bytes(data[tailStart:end]).rfind(EOI)
+    scanEnd = tailStart + eoi if eoi >= 0 else end
+    return JpegFrame(type, width, height, dri, quant[0] + quant[1], scanStart, scanEnd)
+
+def makeTables(q):
+    """Tabelas (luminância + crominância, em zigue-zague) para Q 1..99 (RFC 2435, apêndice A)."""
+    factor = min(max(q, 1), 99)
+    scale = 5000 // factor if factor < 50 else 200 - factor * 2
+    luma = bytes(min(max((LUMA_QUANTIZER[z] * scale + 50) // 100, 1), 255) for z in ZIGZAG)
+    chroma = bytes(min(max((CHROMA_QUANTIZER[z] * scale + 50) // 100, 1), 255) for z in ZIGZAG)
+    return luma + chroma
+
+def makeHeaders(type, width, height, tables, dri=0):
+    """Cabeçalho JFIF (SOI até SOS) equivalente aos parâmetros do RFC 2435 (apêndice B)."""
+    out = bytearray(SOI)
+    # DQT: tabela 0 (luminância) e 1 (crominância)
+    out += b'\xff\xdb' + struct.pack('!H', 2 + 2 * 65)
+    out += b'\x00' + tables[:64] + b'\x01' + tables[64:128]
+    if dri:
+        out += b'\xff\xdd\x00\x04' + struct.pack('!H', dri)
+    # SOF0: Y com amostragem 2x1 (tipo 0) ou 2x2 (tipo 1); Cb e Cr 1x1
+    out += b'\xff\xc0\x00\x11\x08' + struct.pack('!HH', height, width) + b'\x03'
+    out += bytes((1, 0x21 if type & 0x3F == 0 else 0x22, 0, 2, 0x11, 1, 3, 0x11, 1))
+    # DHT com as quatro tabelas padrão
+    for (tc, th), table in HUFFMAN_TABLES.items():
+        out += b'\xff\xc4' + struct.pack('!H', 3 + len(table)) + bytes(((tc << 4) | th,)) + table
+    # SOS
+    out += b'\xff\xda\x00\x0c\x03\x01\x00\x02\x11\x03\x11\x00\x3f\x00'
+    return bytes(out)
+
+class Rfc2435Packetizer:
+    """Empacota quadros JFIF no formato do RFC 2435, por sessão.
+
+    Só os dados da varredura vão nos payloads (fatias sem cópia do quadro),
+    com o offset de cada fragmento; as tabelas de quantização vão no
+    primeiro pacote apenas quando o Q delas ainda não foi enviado (ou a cada
+    `refresh` quadros, para quem perdeu o envio anterior).
+    """
+
+    def __init__(self, maxPayload, refresh=QTABLE_REFRESH):
+        self.maxPayload = maxPayload
+        self.refresh = refresh
+        self.qValues = {}       # tabelas -> Q (128..254)
+        self.sentAt = {}        # Q -> nº do quadro em que as tabelas foram enviadas
+        self.frames = 0
+
+    def qFor(self, tables):
+        q = self.qValues.get(tables)
+        if q is None:
+            if len(self.qValues) >= Q_DYNAMIC - Q_INBAND:
+                # valores de Q esgotados: tabelas vão em todo quadro
+                return Q_DYNAMIC
+            q = Q_INBAND + len(self.qValues)
+            self.qValues[tables] = q
+        return q
+
+    def tablesDue(self, q):
+        """Conta mais um quadro com o Q dado; diz se as tabelas dele vão neste quadro."""
+        self.frames += 1
+        sendTables = q == Q_DYNAMIC or self.frames - self.sentAt.get(q, -self.refresh) >= self.refresh
+        if sendTables and q != Q_DYNAMIC:
+            self.sentAt[q] = self.frames
+        return sendTables
+
+    def resendTables(self):
+        """Manda as tabelas já no próximo quadro (um receptor novo entrou no meio)."""
+        self.sentAt.clear()
+
+    def packetize(self, data, seq, ssrc, timestamp):
+        """Lista de (cabeçalho, payload) do quadro, ou `None` se ele não couber no RFC 2435."""
+        frame = parseJpeg(data)
+        if frame is None:
+            return None
+        q = self.qFor(frame.tables)
+        sendTables = self.tablesDue(q)
+
+        extra = b''
+        if frame.dri:
+            # fragmentos não alinhados aos intervalos de restart: F=L=1, contagem 0x3FFF
+            extra = RESTART_HEADER.pack(frame.dri, 0xFFFF)
+        view = memoryview(data)[frame.scanStart : frame.scanEnd]
+        size = len(view)
+        pack = RTP_JPEG_HEADER.pack
+        b0, pt = 2 << 6, PT_JPEG
+        timestamp &= 0xFFFFFFFF
+        ssrc &= 0xFFFFFFFF
+        w, h = frame.width >> 3, frame.height >> 3
+        packets = []
+        offset = 0
+        while True:
+            header = extra
+            if offset == 0:
+                tables = frame.tables if sendTables else b''
+                header = extra + QTABLE_HEADER.pack(0, 0, len(tables)) + tables
+            room = self.maxPayload - JPEG_HEADER_SIZE - len(header)
+            last = offset + room >= size
+            packets.append((pack(b0, (0x80 if last else 0) | pt, seq, timestamp, ssrc,
+                                 offset, frame.type, q, w, h) + header,
+                            view[offset : offset + room]))
+            seq = (seq + 1) & 0xFFFF
+            offset += room
+            if last:
+                return packets
+
+class Rfc2435Reassembler(FrameReassembler):
+    """Remonta quadros RFC 2435 (PT 26) pelo offset de cada fragmento.
+
+    Cada fragmento é copiado direto para a sua posição no quadro, então a
+    ordem de chegada não importa; o quadro está completo quando o último
+    (marcador) chegou e os bytes recebidos cobrem todo o intervalo. O
+    cabeçalho JFIF é refeito a partir do tipo, Q e dimensões. Pacotes de
+    outro PT (JFIF fatiado) seguem para a remontagem por SOI/marcador.
+    """
+
+    def __init__(self, maxFrames=8, history=64):
+        super().__init__(maxFrames, history)
+        self.qTables = {}       # Q -> tabelas recebidas na banda
+        self.headers = {}       # parâmetros -> cabeçalho JFIF já montado
+
+    def push(self, frameId, seq, marker, payload, pt=PT_JPEG):
+        """Adiciona um fragmento; devolve o quadro JFIF (`bytes`) quando ele se completa."""
+        if pt != PT_JPEG:
+            return super().push(frameId, seq, marker, payload)
+        if len(payload) < JPEG_HEADER_SIZE:
+            return None
+        word, type, q, w, h = JPEG_HEADER.unpack_from(payload)
+        offset = word & 0xFFFFFF
+        pos = JPEG_HEADER_SIZE
+        dri = 0
+        if 64 <= type < 128:
+            dri, = struct.unpack_from('!H', payload, pos)
+            pos += RESTART_HEADER.size
+        tables = None
+        if offset == 0 and q >= Q_INBAND:
+            _, precision, length = QTABLE_HEADER.unpack_from(payload, pos)
+            pos += QTABLE_HEADER.size
+            if length:
+                if precision or length < 128:
+                    # tabelas de 16 bits não são suportadas
+                    return None
+                tables = bytes(payload[pos : pos + 128])
+                if q != Q_DYNAMIC:
+                    self.qTables[q] = tables
+            pos += length
+        data = payload[pos:]
+
+        frame = self.frames.get(frameId)
+        if frame is None:
+            if frameId in self.finished:
+                return None
+            if len(self.frames) >= self.maxFrames:
+                self.drop(next(iter(self.frames)))
+            # [dados, bytes recebidos, tamanho total, offsets já vistos, parâmetros]
+            frame = [bytearray(), 0, None, set(), None]
+            self.frames[frameId] = frame
+        if offset in frame[3]:
+            return None
+        end = offset + len(data)
+        if end > MAX_FRAME_BYTES:
+            self.drop(frameId)
+            return None
+        buf = frame[0]
+        if len(buf) < end:
+            buf.extend(bytes(end - len(buf)))
+        buf[offset:end] = data
+        frame[1] += len(data)
+        frame[3].add(offset)
+        if offset == 0:
+            if tables is None:
+                tables = self.qTables.get(q) if q >= Q_INBAND else makeTables(q)
+            frame[4] = (type & 0x3F, w << 3, h << 3, tables, dri)
+        if marker:
+            frame[2] = end
+
+        total = frame[2]
+        if total is None or frame[1] < total or frame[4] is None:
+            return None
+        self.finish(frameId)
+        params = frame[4]
+        if params[3] is None:
+            # Q sem tabelas conhecidas (envio anterior perdido)
+            self.dropped += 1
+            return None
+        header = self.headers.get(params)
+        if header is None:
+            if len(self.headers) >= 64:
+                # tabelas dinâmicas (Q 255) mudam a cada quadro
+                self.headers.clear()
+            header = self.headers[params] = makeHeaders(*params)
+        self.completed += 1
+        return b"".join((header, memoryview(buf)[:total], EOI))
@@ -0,0 +1,247 @@
+import struct
+
+# tipos de pacote RTCP (RFC 3550, seção 12.1; RFC 4585, seção 6.1)
+RTCP_SR = 200
+RTCP_RR = 201
+RTCP_RTPFB = 205
+FMT_GENERIC_NACK = 1
+
+# cabeçalho comum: V/P/RC, PT, tamanho (em palavras de 32 bits - 1), SSRC de quem envia
+HEADER = struct.Struct('!BBHI')
+# bloco de relatório: SSRC da fonte, fração/perda acumulada, maior seq estendido, jitter, LSR, DLSR
+REPORT_BLOCK = struct.Struct('!IIIIII')
+# FCI do NACK genérico: PID (primeiro seq perdido) e BLP (máscara dos 16 seguintes)
+NACK_FCI = struct.Struct('!HH')
+
+# intervalo (s) entre relatórios do receptor; menor que os 5 s do RFC, pois a
+# adaptação do servidor depende deles (o RFC permite intervalos reduzidos)
+RTCP_INTERVAL = 1.0
+
+# limites do RFC 3550 (apêndice A.1) para saltos de sequência
+MAX_DROPOUT = 3000
+MAX_MISORDER = 100
+
+class ReceptionStats:
+    """Estatísticas de recepção de uma fonte RTP (RFC 3550, apêndice A).
+
+    Alimentada a cada pacote com `update`; `report` devolve o bloco de
+    relatório do intervalo desde o relatório anterior.
+    """
+
+    def __init__(self, clockRate=90000):
+        self.clockRate = clockRate
+        self.ssrc = None
+        self.reset()
+
+    def reset(self):
+        self.baseSeq = None
+        self.badSeq = None
+        self.maxSeq = 0
+        self.cycles = 0
+        self.received = 0
+        self.expectedPrior = 0
+        self.receivedPrior = 0
+        self.transit = None
+        self.jitter = 0.0         # em unidades do relógio RTP
+
+    def update(self, ssrc, seq, timestamp, arrival):
+        """Registra um pacote (`arrival` em segundos, relógio monotônico)."""
+        if self.baseSeq is None or ssrc != self.ssrc:
+            self.reset()
+            self.ssrc = ssrc
+            self.baseSeq = self.maxSeq = seq
+        else:
+            delta = (seq - self.maxSeq) & 0xFFFF
+            if delta < MAX_DROPOUT:
+                if seq < self.maxSeq:
+                    self.cycles += 0x10000
+                self.maxSeq = seq
+            elif delta <= 0x10000 - MAX_MISORDER:
+                if seq != self.badSeq:
+                    # salto grande: só reinicia se o pacote seguinte confirmar
+                    self.badSeq = (seq + 1) & 0xFFFF
+                    return
+                # a fonte reiniciou a sequência
+                self.reset()
+                self.ssrc = ssrc
+                self.baseSeq = self.maxSeq = seq
+            # senão: duplicado, fora de ordem ou retransmitido, só conta como recebido
+        self.received += 1
+
+        # jitter entre chegadas (RFC 3550, seção 6.4.1 e apêndice A.8)
+        transit = arrival * self.clockRate - timestamp
+        if self.transit is not None:
+            # o timestamp de 32 bits pode dar a volta
+            d = abs((transit - self.transit + 0x80000000) % 0x100000000 - 0x80000000)
+            self.jitter += (d - self.jitter) / 16
+        self.transit = transit
+
+    def extendedMax(self):
+        return self.cycles + self.maxSeq
+
+    def cumulativeLost(self):
+        if self.baseSeq is None:
+            return 0
+        return self.extendedMax() - self.baseSeq + 1 - self.received
+
+    def lossRatio(self):
+        """Perda acumulada desde o início (0..1), para exibição."""
+        if self.baseSeq is None:
+            return 0.0
+        expected = self.extendedMax() - self.baseSeq + 1
+        return max(0, expected - self.received) / expected if expected > 0 else 0.0
+
+    def report(self):
+        """Bloco de relatório do intervalo atual (ou `None` se nada foi recebido)."""
+        if self.baseSeq is None:
+            return None
+        expected = self.extendedMax() - self.baseSeq + 1
+        expectedInterval = expected - self.expectedPrior
+        receivedInterval = self.received - self.receivedPrior
+        self.expectedPrior = expected
+        self.receivedPrior = self.received
+        lostInterval = expectedInterval - receivedInterval
+        if expectedInterval <= 0 or lostInterval <= 0:
+            fraction = 0
+        else:
+            fraction = min(255, (lostInterval << 8) // expectedInterval)
+        return {
+            'ssrc': self.ssrc,
+            'fractionLost': fraction,
+            'cumulativeLost': self.cumulativeLost(),
+            'highestSeq': self.extendedMax() & 0xFFFFFFFF,
+            'jitter': int(self.jitter),
+            'lsr': 0,
+            'dlsr': 0,
+        }
+
+def buildReceiverReport(reporterSsrc, blocks):
+    """Pacote RR (PT 201) com até 31 blocos de relatório."""
+    blocks = [b for b in blocks if b is not None][:31]
+    out = bytearray(HEADER.size + REPORT_BLOCK.size * len(blocks))
+    HEADER.pack_into(out, 0, 0x80 | len(blocks), RTCP_RR, len(out) // 4 - 1, reporterSsrc)
+    offset = HEADER.size
+    for b in blocks:
+        # perda acumulada: inteiro de 24 bits com sinal
+        lost = max(-0x800000, min(0x7FFFFF, b['cumulativeLost'])) & 0xFFFFFF
+        REPORT_BLOCK.pack_into(out, offset, b['ssrc'], (b['fractionLost'] << 24) | lost,
+                               b['highestSeq'], b['jitter'], b['lsr'], b['dlsr'])
+        offset += REPORT_BLOCK.size
+    return bytes(out)
+
+def buildNack(senderSsrc, mediaSsrc, seqs):
+    """Pacote NACK genérico (RTPFB, FMT 1) pedindo os números de sequência `seqs`."""
+    fci = []
+    for seq in sorted(seqs, key=lambda s: (s - seqs[0]) & 0xFFFF):
+        if fci:
+            pid, blp = fci[-1]
+            offset = (seq - pid) & 0xFFFF
+            if 1 <= offset <= 16:
+                fci[-1] = (pid, blp | (1 << (offset - 1)))
+                continue
+        fci.append((seq, 0))
+    out = bytearray(HEADER.size + 4 + NACK_FCI.size * len(fci))
+    HEADER.pack_into(out, 0, 0x80 | FMT_GENERIC_NACK, RTCP_RTPFB, len(out) // 4 - 1, senderSsrc)
+    struct.pack_into('!I', out, HEADER.size, mediaSsrc)
+    offset = HEADER.size + 4
+    for pid, blp in fci:
+        NACK_FCI.pack_into(out, offset, pid, blp)
+        offset += NACK_FCI.size
+    return bytes(out)
+
+def parseRtcp(data):
+    """Itens de um pacote RTCP composto: blocos de relatório e NACKs.
+
+    Blocos de SR/RR são dicts como o de `ReceptionStats.report` com
+    `type='report'`; NACKs genéricos são `{'type': 'nack', 'ssrc', 'seqs'}`.
+    Todos trazem `reporter` (SSRC de quem enviou); outros tipos são ignorados.
+    """
+    blocks = []
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        first, pt, length, reporter = HEADER.unpack_from(data, offset)
+        end = offset + (length + 1) * 4
+        if first >> 6 != 2 or end > len(data):
+            break
+        count = first & 0x1F
+        blockOffset = offset + HEADER.size
+        if pt == RTCP_SR:
+            blockOffset += 20      # NTP, timestamp RTP e contadores do emissor
+        if pt in (RTCP_SR, RTCP_RR):
+            for _ in range(count):
+                if blockOffset + REPORT_BLOCK.size > end:
+                    break
+                ssrc, lossWord, highest, jitter, lsr, dlsr = REPORT_BLOCK.unpack_from(data, blockOffset)
+                lost = lossWord & 0xFFFFFF
+                if lost & 0x800000:
+                    lost -= 0x1000000
+                blocks.append({'type': 'report', 'reporter': reporter, 'ssrc': ssrc, 'fractionLost': lossWord >> 24,
+                               'cumulativeLost': lost, 'highestSeq': highest, 'jitter': jitter,
+                               'lsr': lsr, 'dlsr': dlsr})
+                blockOffset += REPORT_BLOCK.size
+        elif pt == RTCP_RTPFB and count == FMT_GENERIC_NACK and end - blockOffset >= 4:
+            mediaSsrc, = struct.unpack_from('!I', data, blockOffset)
+            seqs = []
+            for fciOffset in range(blockOffset + 4, end - NACK_FCI.size + 1, NACK_FCI.size):
+                pid, blp = NACK_FCI.unpack_from(data, fciOffset)
+                seqs.append(pid)
+                for bit in range(16):
+                    if blp & (1 << bit):
+                        seqs.append((pid + bit + 1) & 0xFFFF)
+            blocks.append({'type': 'nack', 'reporter': reporter, 'ssrc': mediaSsrc, 'seqs': seqs})
+        offset = end
+    return blocks
+
+class NackTracker:
+    """Lado do receptor: detecta lacunas de sequência e decide quando pedir (NACK).
+
+    Cada número faltante é pedido após `reorderDelay` (dá tempo a pacotes só
+    fora de ordem) e de novo a cada `retryInterval`, até chegar, passar de
+    `maxAge` ou esgotar `maxRetries`.
+    """
+
+    def __init__(self, reorderDelay=0.005, retryInterval=0.03, maxAge=0.25, maxRetries=3, maxGap=256):
+        self.reorderDelay = reorderDelay
+        self.retryInterval = retryInterval
+        self.maxAge = maxAge
+        self.maxRetries = maxRetries
+        self.maxGap = maxGap
+        self.highest = None
+        self.pending = {}     # seq -> [detectado em, próximo pedido, pedidos feitos]
+        self.requested = 0
+        self.recovered = 0
+
+    def onPacket(self, seq, now):
+        if self.highest is None:
+            self.highest = seq
+            return
+        delta = (seq - self.highest) & 0xFFFF
+        if 0 < delta < 0x8000:
+            if delta > self.maxGap:
+                # salto grande demais (nova sequência): nada a recuperar
+                self.pending.clear()
+            else:
+                for i in range(1, delta):
+                    self.pending[(self.highest + i) & 0xFFFF] = [now, now + self.reorderDelay, 0]
+            self.highest = seq
+        elif self.pending.pop(seq, None) is not None:
+            self.recovered += 1
+
+    def due(self, now):
+        """Números de sequência a pedir agora."""
+        if not self.pending:
+            return []
+        seqs = []
+        for seq, state in list(self.pending.items()):
+            if now - state[0] > self.maxAge or state[2] >= self.maxRetries:
+                del self.pending[seq]
+            elif now >= state[1]:
+                state[1] = now + self.retryInterval
+                state[2] += 1
+                seqs.append(seq)
+        self.requested += len(seqs)
+        return seqs
+
+    def reset(self):
+        self.highest = None
+        self.pending.clear()
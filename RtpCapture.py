@@ -0,0 +1,97 @@
+"""Captura dos datagramas RTP recebidos na porta do cliente, para reprodução.
+
+O arquivo `.rtpcap` é um cabeçalho fixo seguido, por datagrama, do instante
+de chegada (ns desde o primeiro) e do tamanho, e dos bytes como chegaram
+(cabeçalho RTP incluído). É gravado pelo `HeadlessClient.py --capture` e
+lido pelo `benchmarks/bench_replay.py`, que reproduz a sessão no caminho de
+recepção do cliente sem servidor nem rede.
+
+Uso: python3 RtpCapture.py captura.rtpcap [...]   (resumo de cada captura)
+"""
+import time, struct, argparse
+from RtpPacket import HEADER, HEADER_SIZE
+
+CAPTURE_SUFFIX = '.rtpcap'
+MAGIC = b'RTPC'
+VERSION = 1
+
+# mágico, versão, hora do início (epoch, só informativa)
+FILE_HEADER = struct.Struct('!4sB3xd')
+# chegada em ns desde o primeiro datagrama, tamanho
+RECORD = struct.Struct('!QH')
+
+class CaptureWriter:
+    """Grava datagramas num `.rtpcap`; `write` serve de `tap` do `RtpReceiver`."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'wb')
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, time.time()))
+        self.origin = None
+        self.count = 0
+
+    def write(self, datagram, arrival):
+        """Acrescenta um datagrama recebido no instante `arrival` (`time.monotonic()`)."""
+        if self.origin is None:
+            self.origin = arrival
+        self.file.write(RECORD.pack(round((arrival - self.origin) * 1e9), len(datagram)))
+        self.file.write(datagram)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+def readCapture(filename):
+    """[(chegada em s desde o primeiro, datagrama)] de um `.rtpcap`; `ValueError` se não for um."""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        raise ValueError("arquivo curto demais: %s" % filename)
+    magic, version, _ = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("não é uma captura RTP: %s" % filename)
+    records = []
+    offset = FILE_HEADER.size
+    while offset + RECORD.size <= len(data):
+        arrival, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if offset + length > len(data):
+            # gravação interrompida no meio do último datagrama
+            break
+        records.append((arrival / 1e9, data[offset : offset + length]))
+        offset += length
+    return records
+
+def summarize(records):
+    """Datagramas, bytes, duração, quadros (marcadores) e SSRCs de uma captura."""
+    frames = 0
+    ssrcs = set()
+    for _, datagram in records:
+        if len(datagram) >= HEADER_SIZE:
+            _, second, _, _, ssrc = HEADER.unpack_from(datagram)
+            frames += second >> 7
+            ssrcs.add(ssrc)
+    return {
+        'datagrams': len(records),
+        'bytes': sum(len(d) for _, d in records),
+        'duration': records[-1][0] if records else 0.0,
+        'frames': frames,
+        'ssrcs': len(ssrcs),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="RtpCapture.py",
+        usage="%(prog)s Captura [...]",
+        epilog="Exemplo: python3 HeadlessClient.py 127.0.0.1 12000 movie.Mjpeg --duration 5 --capture movie.rtpcap")
+    parser.add_argument("captures", nargs='+', help="arquivos .rtpcap")
+    args = parser.parse_args()
+
+    for filename in args.captures:
+        try:
+            s = summarize(readCapture(filename))
+        except (OSError, ValueError) as e:
+            print(f"{filename}: erro: {e}")
+            continue
+        print(f"{filename}: {s['datagrams']} datagramas, {s['bytes'] / 1e6:.1f} MB em {s['duration']:.1f} s, "
+              f"{s['frames']} quadros, {s['ssrcs']} SSRC(s)")
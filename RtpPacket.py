@@ -1,64 +1,144 @@
+import struct
 from time import time
 HEADER_SIZE = 12
 
-class RtpPacket:    
-    header = bytearray(HEADER_SIZE)
-    
+# V/P/X/CC, M/PT, seq (16 bits), timestamp (32 bits), SSRC (32 bits)
+HEADER = struct.Struct('!BBHII')
+EMPTY_HEADER = bytes(HEADER_SIZE)
+# campos regravados por `restamp`
+SEQ = struct.Struct('!H')
+SSRC = struct.Struct('!I')
+
+class RtpPacket:
+    """Pacote RTP. Os campos do cabeçalho são desempacotados uma única vez."""
+
+    __slots__ = ('header', 'payload', 'fields')
+
     def __init__(self):
-        pass
-        
-    def encode(self, version, padding, extension, cc, seqnum, marker, pt, ssrc, payload):
+        self.header = EMPTY_HEADER
+        self.payload = b''
+        # (V/P/X/CC, M/PT, seq, timestamp, SSRC) como vieram do struct
+        self.fields = (0, 0, 0, 0, 0)
+
+    def encode(self, version, padding, extension, cc, seqnum, marker, pt, ssrc, payload, timestamp=None):
         """Codifica pacote RTP (cabeçalho + payload)."""
-        timestamp = int(time())
-        header = bytearray(HEADER_SIZE)
-        
-        # Byte 0: versão | padding | extension | cc
-        header[0] = ((version & 0x03) << 6) | ((padding & 0x01) << 5) | ((extension & 0x01) << 4) | (cc & 0x0F)
-        
-        # Byte 1: marker (1 bit) | payload type (7 bits)
-        header[1] = ((marker & 0x01) << 7) | (pt & 0x7F)
-        
-        # Bytes 2-3: número de sequência (16 bits)
-        header[2] = (seqnum >> 8) & 0xFF
-        header[3] = seqnum & 0xFF
-        
-        # Bytes 4-7: timestamp (32 bits)
-        header[4] = (timestamp >> 24) & 0xFF
-        header[5] = (timestamp >> 16) & 0xFF
-        header[6] = (timestamp >> 8) & 0xFF
-        header[7] = timestamp & 0xFF
-        
-        # Bytes 8-11: SSRC (32 bits)
-        header[8] = (ssrc >> 24) & 0xFF
-        header[9] = (ssrc >> 16) & 0xFF
-        header[10] = (ssrc >> 8) & 0xFF
-        header[11] = ssrc & 0xFF
-        
-        self.header = header
+        if timestamp is None:
+            timestamp = int(time())
+        self.header = self.packHeader(seqnum, marker, pt, ssrc, timestamp, version, padding, extension, cc)
         self.payload = payload
-        
+        self.fields = HEADER.unpack(self.header)
+
     def decode(self, byteStream):
-        """Decodifica pacote RTP a partir de bytes."""
-        self.header = bytearray(byteStream[:HEADER_SIZE])
+        """Decodifica pacote RTP a partir de bytes.
+
+        Cabeçalho e payload são fatias de `byteStream`: se ele for um
+        `memoryview` (buffer reaproveitado), as fatias não copiam dados.
+        """
+        self.fields = HEADER.unpack_from(byteStream)
+        self.header = byteStream[:HEADER_SIZE]
         self.payload = byteStream[HEADER_SIZE:]
-    
+
     def version(self):
-        return int(self.header[0] >> 6)
-    
+        return self.fields[0] >> 6
+
     def seqNum(self):
-        seqNum = self.header[2] << 8 | self.header[3]
-        return int(seqNum)
-    
+        return self.fields[2]
+
     def timestamp(self):
-        timestamp = self.header[4] << 24 | self.header[5] << 16 | self.header[6] << 8 | self.header[7]
-        return int(timestamp)
-    
+        return self.fields[3]
+
     def payloadType(self):
-        pt = self.header[1] & 127
-        return int(pt)
-    
+        return self.fields[1] & 127
+
+    def marker(self):
+        return self.fields[1] >> 7
+
+    def ssrc(self):
+        return self.fields[4]
+
     def getPayload(self):
         return self.payload
-        
+
     def getPacket(self):
-        return self.header + self.payload
\ No newline at end of file
+        # `join` aceita `bytes` e `memoryview` (pacote decodificado de um buffer reaproveitado)
+        return b"".join((self.header, self.payload))
+
+    def packInto(self, buffer, offset=0):
+        """Escreve o pacote em `buffer` (pré-alocado) a partir de `offset`; retorna o tamanho."""
+        end = offset + HEADER_SIZE + len(self.payload)
+        buffer[offset : offset + HEADER_SIZE] = self.header
+        buffer[offset + HEADER_SIZE : end] = self.payload
+        return end - offset
+
+    @staticmethod
+    def packHeader(seqnum, marker, pt, ssrc, timestamp, version=2, padding=0, extension=0, cc=0):
+        """Apenas os 12 bytes do cabeçalho."""
+        return HEADER.pack(
+            ((version & 0x03) << 6) | ((padding & 0x01) << 5) | ((extension & 0x01) << 4) | (cc & 0x0F),
+            ((marker & 0x01) << 7) | (pt & 0x7F),
+            seqnum & 0xFFFF, timestamp & 0xFFFFFFFF, ssrc & 0xFFFFFFFF)
+
+    @staticmethod
+    def packHeaderInto(buffer, offset, seqnum, marker, pt, ssrc, timestamp, version=2):
+        """Escreve o cabeçalho direto em `buffer` (sem alocar)."""
+        HEADER.pack_into(buffer, offset, (version & 0x03) << 6, ((marker & 0x01) << 7) | (pt & 0x7F),
+                         seqnum & 0xFFFF, timestamp & 0xFFFFFFFF, ssrc & 0xFFFFFFFF)
+
+    @staticmethod
+    def encodeBatch(payloads, seqnum, pt, ssrc, timestamp=None, marker=1):
+        """Cabeçalhos para uma lista de payloads (ex.: fragmentos de um quadro).
+
+        Os números de sequência são consecutivos a partir de `seqnum` e o
+        marcador vai só no último. Os cabeçalhos ficam num único `bytearray`;
+        retorna a lista de pares (cabeçalho, payload) como `memoryview`.
+        """
+        if timestamp is None:
+            timestamp = int(time())
+        count = len(payloads)
+        headers = bytearray(HEADER_SIZE * count)
+        pack_into = HEADER.pack_into
+        b0 = 2 << 6
+        b1 = pt & 0x7F
+        timestamp &= 0xFFFFFFFF
+        ssrc &= 0xFFFFFFFF
+        for i in range(count):
+            pack_into(headers, i * HEADER_SIZE, b0, b1, (seqnum + i) & 0xFFFF, timestamp, ssrc)
+        if count and marker:
+            headers[(count - 1) * HEADER_SIZE + 1] |= 0x80
+        view = memoryview(headers)
+        return [(view[i * HEADER_SIZE : (i + 1) * HEADER_SIZE], payloads[i]) for i in range(count)]
+
+    @staticmethod
+    def restamp(packets, seqnum, ssrc):
+        """Os mesmos pacotes com outro SSRC e sequência a partir de `seqnum`.
+
+        Só os cabeçalhos são copiados (para um único `bytearray`); os
+        payloads continuam compartilhados com a lista original.
+        """
+        headers = bytearray(b"".join([header for header, _ in packets]))
+        view = memoryview(headers)
+        seqOffset, ssrcOffset = 2, 8
+        ssrc &= 0xFFFFFFFF
+        out = []
+        offset = 0
+        for i, (header, payload) in enumerate(packets):
+            SEQ.pack_into(headers, offset + seqOffset, (seqnum + i) & 0xFFFF)
+            SSRC.pack_into(headers, offset + ssrcOffset, ssrc)
+            out.append((view[offset : offset + len(header)], payload))
+            offset += len(header)
+        return out
+
+    @staticmethod
+    def decodeBatch(datagrams):
+        """Decodifica uma lista de datagramas em pacotes."""
+        new = RtpPacket.__new__
+        unpack_from = HEADER.unpack_from
+        packets = []
+        for data in datagrams:
+            # decode já preenche todos os campos: dispensa o __init__
+            packet = new(RtpPacket)
+            packet.fields = unpack_from(data)
+            packet.header = data[:HEADER_SIZE]
+            packet.payload = data[HEADER_SIZE:]
+            packets.append(packet)
+        return packets
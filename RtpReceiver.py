@@ -0,0 +1,202 @@
+import socket, threading, queue, time
+from collections import deque
+from RtpPacket import HEADER, HEADER_SIZE
+
+# maior datagrama esperado: payload de até 1400 bytes + cabeçalho, com folga
+SLOT_SIZE = 2048
+# buffers do pool e lotes que cabem na fila até o consumidor
+POOL_SLOTS = 1024
+QUEUE_BATCHES = 256
+# datagramas lidos no máximo por despertar
+MAX_BATCH = 64
+
+HAS_DONTWAIT = hasattr(socket, 'MSG_DONTWAIT')
+
+def openMulticastSocket(group, port, interface=None, rcvbuf=2 * 1024 * 1024):
+    """Socket UDP inscrito no grupo multicast `group`:`port` (sessão em modo broadcast).
+
+    `interface` é o IP local pelo qual entrar no grupo (o da conexão RTSP;
+    `None` deixa o kernel escolher). Com `SO_REUSEADDR`, vários receptores
+    da mesma máquina ouvem a mesma porta e cada um recebe sua cópia.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.bind(("", port))
+    membership = socket.inet_aton(group) + socket.inet_aton(interface or "0.0.0.0")
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    return sock
+
+class RtpReceiver:
+    """Etapa de recepção RTP: esvazia o socket sem alocar por pacote.
+
+    Os datagramas são lidos com `recv_into` em buffers fixos de um pool
+    pré-alocado; a cada despertar, todos os já enfileirados no kernel são
+    lidos de uma vez, e o cabeçalho é desempacotado ali mesmo. Cada
+    fragmento vira um descritor
+
+        (slot, início, fim, seq, timestamp, marcador, PT, SSRC, chegada)
+
+    e os lotes seguem por uma fila limitada até o consumidor (remontagem),
+    que copia o payload com `take` e devolve o buffer ao pool. Com `start`
+    a leitura roda numa thread própria, que nunca espera pelo consumidor:
+    se o pool ou a fila se esgotarem, o datagrama é descartado e contado
+    em `overruns` (o NACK ainda pode recuperá-lo), em vez de deixar o
+    `SO_RCVBUF` transbordar sem aviso.
+
+    `tap`, se definido, recebe cada datagrama lido e o instante de chegada
+    antes da análise (ex.: `RtpCapture.CaptureWriter.write`).
+    """
+
+    def __init__(self, sock, slots=POOL_SLOTS, slotSize=SLOT_SIZE, queueBatches=QUEUE_BATCHES, maxBatch=MAX_BATCH):
+        self.sock = sock
+        self.slotSize = slotSize
+        self.maxBatch = maxBatch
+        self.arena = bytearray(slots * slotSize)
+        view = memoryview(self.arena)
+        self.slots = [view[i * slotSize : (i + 1) * slotSize] for i in range(slots)]
+        # deque: append/popleft são atômicos entre a thread de recepção e o consumidor
+        self.free = deque(range(slots))
+        self.scratch = bytearray(slotSize)    # destino dos descartes quando o pool esgota
+        self.queue = queue.Queue(queueBatches)
+        self.thread = None
+        self.stopped = False
+        self.received = 0
+        self.batches = 0
+        self.overruns = 0
+        self.malformed = 0
+        self.tap = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="RtpReceiver", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.flush()
+
+    def run(self):
+        """Laço da thread de recepção (o socket deve ter timeout)."""
+        while not self.stopped:
+            try:
+                batch = self.receiveBatch()
+            except OSError:
+                # socket fechado (TEARDOWN)
+                break
+            if not batch:
+                continue
+            try:
+                self.queue.put_nowait(batch)
+            except queue.Full:
+                self.overruns += len(batch)
+                for desc in batch:
+                    self.free.append(desc[0])
+
+    def receiveBatch(self):
+        """Lê os datagramas já enfileirados no socket; devolve os descritores.
+
+        Só a primeira leitura pode esperar (conforme o timeout do socket);
+        as seguintes não bloqueiam. Sem `MSG_DONTWAIT`, um socket bloqueante
+        rende um datagrama por chamada.
+        """
+        sock = self.sock
+        recv_into = sock.recv_into
+        slots, free, scratch = self.slots, self.free, self.scratch
+        size = self.slotSize
+        drain = HAS_DONTWAIT or sock.gettimeout() == 0.0
+        flags = 0
+        batch = []
+        while len(batch) < self.maxBatch:
+            index = free.popleft() if free else None
+            buf = slots[index] if index is not None else scratch
+            try:
+                length = recv_into(buf, size, flags)
+            except (BlockingIOError, InterruptedError, socket.timeout):
+                if index is not None:
+                    free.append(index)
+                break
+            except OSError:
+                if index is not None:
+                    free.append(index)
+                if batch:
+                    break
+                raise
+            arrival = time.monotonic()
+            if self.tap is not None:
+                self.tap(buf[:length], arrival)
+            if index is None:
+                self.overruns += 1
+            else:
+                desc = self.parse(index, length, arrival)
+                if desc is None:
+                    self.malformed += 1
+                    free.append(index)
+                else:
+                    batch.append(desc)
+            if not drain:
+                break
+            flags = socket.MSG_DONTWAIT if HAS_DONTWAIT else 0
+        if batch:
+            self.received += len(batch)
+            self.batches += 1
+        return batch
+
+    def parse(self, index, length, arrival):
+        """Descritor do datagrama no slot `index`, ou `None` se não for RTP válido."""
+        if length < HEADER_SIZE:
+            return None
+        buf = self.slots[index]
+        first, second, seq, timestamp, ssrc = HEADER.unpack_from(buf)
+        if first >> 6 != 2:
+            return None
+        start = HEADER_SIZE + 4 * (first & 0x0F)
+        if first & 0x10:
+            # extensão de cabeçalho: 4 bytes + tamanho em palavras de 32 bits
+            if start + 4 > length:
+                return None
+            start += 4 + 4 * ((buf[start + 2] << 8) | buf[start + 3])
+        end = length
+        if first & 0x20:
+            end -= buf[length - 1]
+        if start > end:
+            return None
+        return (index, start, end, seq, timestamp, second >> 7, second & 127, ssrc, arrival)
+
+    def get(self, timeout=None):
+        """Próximo lote de descritores, ou lista vazia se nada chegar até `timeout`."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return []
+
+    def take(self, index, start, end):
+        """Copia o payload do slot e o devolve ao pool."""
+        payload = bytes(self.slots[index][start:end])
+        self.free.append(index)
+        return payload
+
+    def release(self, index):
+        """Devolve um slot ao pool sem ler o payload (pacote descartado)."""
+        self.free.append(index)
+
+    def flush(self):
+        """Descarta os lotes ainda não consumidos (ex.: pacotes de antes do PAUSE)."""
+        while True:
+            try:
+                batch = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            for desc in batch:
+                self.free.append(desc[0])
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'batches': self.batches,
+            'overruns': self.overruns,
+            'malformed': self.malformed,
+            'freeSlots': len(self.free),
+        }
@@ -0,0 +1,183 @@
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+class RtspParseError(ValueError):
+    """Mensagem RTSP malformada ou grande demais."""
+
+def parseNpt(value):
+    """Segundos de um tempo NPT (RFC 2326 3.6): `12.5` ou `h:mm:ss.fff`; `None` para `now`."""
+    value = value.strip()
+    if value == 'now':
+        return None
+    seconds = 0.0
+    for part in value.split(':'):
+        seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError("tempo NPT negativo: %r" % value)
+    return seconds
+
+class RtspMessage:
+    """Uma requisição ou resposta RTSP já analisada.
+
+    `headers` usa nomes em minúsculas (RTSP, como HTTP, não diferencia
+    maiúsculas nos nomes dos cabeçalhos).
+    """
+
+    __slots__ = ('startLine', 'method', 'uri', 'version', 'statusCode', 'reason', 'headers', 'body')
+
+    def __init__(self, startLine, headers, body=""):
+        self.startLine = startLine
+        self.headers = headers
+        self.body = body
+        self.method = self.uri = self.reason = None
+        self.statusCode = 0
+        parts = startLine.split(' ', 2)
+        if parts[0].startswith('RTSP/'):
+            # resposta: RTSP/1.0 200 OK
+            self.version = parts[0]
+            try:
+                self.statusCode = int(parts[1])
+            except (IndexError, ValueError):
+                raise RtspParseError(f"linha de status inválida: {startLine!r}")
+            self.reason = parts[2] if len(parts) > 2 else ""
+        else:
+            # requisição: METHOD uri RTSP/1.0
+            if len(parts) < 2:
+                raise RtspParseError(f"linha de requisição inválida: {startLine!r}")
+            self.method = parts[0]
+            self.uri = parts[1]
+            self.version = parts[2] if len(parts) > 2 else ""
+
+    def isResponse(self):
+        return self.method is None
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    def cseq(self):
+        return self.headers.get('cseq', "0")
+
+    def session(self):
+        """Identificador da sessão, sem parâmetros como `;timeout=`."""
+        value = self.headers.get('session')
+        return value.split(';', 1)[0].strip() if value else None
+
+    def transportParam(self, name):
+        """Valor de um parâmetro do cabeçalho Transport (ex.: `client_port`)."""
+        for param in self.headers.get('transport', "").split(';'):
+            key, sep, value = param.partition('=')
+            if key.strip() == name:
+                return value.strip() if sep else ""
+        return None
+
+    def nptRange(self):
+        """(início, fim) em segundos do `Range: npt=...`, ou `None` sem o cabeçalho.
+
+        Extremos abertos ou `now` viram `None`; `ValueError` se o intervalo
+        for malformado ou usar outra unidade (smpte, clock).
+        """
+        value = self.headers.get('range')
+        if value is None:
+            return None
+        unit, sep, spec = value.split(';', 1)[0].partition('=')
+        if unit.strip() != 'npt' or not sep or '-' not in spec:
+            raise ValueError("Range não suportado: %r" % value)
+        start, _, end = spec.partition('-')
+        start = parseNpt(start) if start.strip() else None
+        end = parseNpt(end) if end.strip() else None
+        if start is not None and end is not None and end < start:
+            raise ValueError("Range invertido: %r" % value)
+        return (start, end)
+
+    def scale(self):
+        """Valor do cabeçalho `Scale` (1 = velocidade normal), ou `None` sem ele."""
+        value = self.headers.get('scale')
+        return float(value) if value is not None else None
+
+    def parameters(self):
+        """Corpo `text/parameters` (GET/SET_PARAMETER) como dict `nome -> valor`."""
+        params = {}
+        for line in self.body.splitlines():
+            name, sep, value = line.partition(':')
+            if sep and name.strip():
+                params[name.strip().lower()] = value.strip()
+        return params
+
+    def __repr__(self):
+        return f"RtspMessage({self.startLine!r})"
+
+class RtspParser:
+    """Analisador incremental de mensagens RTSP.
+
+    Acumula bytes de quantos `recv` forem necessários, separa as mensagens
+    pelo CRLFCRLF do fim dos cabeçalhos e pelo `Content-Length` do corpo, e
+    devolve todas as que estiverem completas, na ordem: requisições
+    encadeadas num mesmo segmento (ex.: DESCRIBE+SETUP+PLAY) saem juntas.
+    """
+
+    def __init__(self, maxHeaderBytes=MAX_HEADER_BYTES, maxBodyBytes=MAX_BODY_BYTES):
+        self.maxHeaderBytes = maxHeaderBytes
+        self.maxBodyBytes = maxBodyBytes
+        self.buffer = bytearray()
+        self.pending = None       # (linha inicial, cabeçalhos, tamanho do corpo) à espera do corpo
+        self.scanFrom = 0         # onde retomar a busca pelo fim dos cabeçalhos
+
+    def feed(self, data):
+        """Adiciona bytes recebidos; devolve a lista de mensagens completas."""
+        self.buffer += data
+        messages = []
+        while True:
+            message = self.next()
+            if message is None:
+                return messages
+            messages.append(message)
+
+    def next(self):
+        buf = self.buffer
+        if self.pending is None:
+            # linhas vazias entre mensagens são toleradas (RFC 2326, seção 4)
+            start = 0
+            while buf.startswith(b'\r\n', start):
+                start += 2
+            if start:
+                del buf[:start]
+                self.scanFrom = max(0, self.scanFrom - start)
+            end = buf.find(b'\r\n\r\n', self.scanFrom)
+            if end < 0:
+                if len(buf) > self.maxHeaderBytes:
+                    raise RtspParseError("cabeçalhos RTSP grandes demais")
+                # o terminador pode começar nos últimos 3 bytes já vistos
+                self.scanFrom = max(0, len(buf) - 3)
+                return None
+            self.pending = self.parseHead(bytes(buf[:end]))
+            del buf[:end + 4]
+            self.scanFrom = 0
+
+        startLine, headers, length = self.pending
+        if len(buf) < length:
+            return None
+        body = bytes(buf[:length]).decode('utf-8', 'replace')
+        del buf[:length]
+        self.pending = None
+        return RtspMessage(startLine, headers, body)
+
+    def parseHead(self, head):
+        lines = head.decode('utf-8', 'replace').split('\r\n')
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise RtspParseError(f"cabeçalho inválido: {line!r}")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise RtspParseError("Content-Length inválido")
+        if length < 0 or length > self.maxBodyBytes:
+            raise RtspParseError(f"Content-Length fora do limite: {length}")
+        return lines[0], headers, length
+
+    def reset(self):
+        self.buffer.clear()
+        self.pending = None
+        self.scanFrom = 0
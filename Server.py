@@ -1,26 +1,120 @@
-import sys, socket
+import sys, socket, argparse, logging
 from ServerWorker import ServerWorker
+from FrameCache import FrameCache
+from AsyncServer import AsyncServer
+from Metrics import startMetricsServer
+from WorkerPool import WorkerPool
+from MediaCatalog import MediaCatalog
+from Prefetcher import Prefetcher
+from SessionRegistry import SessionRegistry, DEFAULT_TIMEOUT
+from BroadcastHub import BroadcastHub, MULTICAST_GROUP, MULTICAST_PORT, MULTICAST_TTL
+
+logger = logging.getLogger("Server")
 
 class Server:
+    def parseArgs(self):
+        """Lê os argumentos de linha de comando."""
+        parser = argparse.ArgumentParser(
+            prog="Server.py",
+            usage="%(prog)s Porta_Servidor [opções]",
+            epilog="Exemplo: python3 Server.py 12000")
+        parser.add_argument("port", type=int, help="porta RTSP do servidor")
+        parser.add_argument("--cache-mb", type=int, default=64,
+                            help="orçamento do cache de quadros compartilhado, em MB (padrão: 64); "
+                                 "0 desativa o cache e serve os quadros direto do mmap, sem cópia")
+        parser.add_argument("--engine", choices=["thread", "asyncio"], default="thread",
+                            help="thread: uma thread por cliente; asyncio: todas as sessões em um laço de eventos")
+        parser.add_argument("--prefetch", type=int, default=8,
+                            help="quadros lidos à frente de cada sessão em threads de E/S; 0 desativa (padrão: 8)")
+        parser.add_argument("--io-threads", type=int, default=4,
+                            help="threads de E/S da leitura antecipada (padrão: 4)")
+        parser.add_argument("--session-timeout", type=int, default=DEFAULT_TIMEOUT,
+                            help="segundos sem requisição RTSP nem RTCP até liberar a sessão (padrão: %d)" % DEFAULT_TIMEOUT)
+        parser.add_argument("--broadcast", choices=["off", "unicast", "multicast"], default="off",
+                            help="sessões do mesmo arquivo compartilham um canal ao vivo: "
+                                 "unicast replica os pacotes a cada cliente, multicast os envia a um grupo (padrão: off)")
+        parser.add_argument("--multicast-group", default=MULTICAST_GROUP,
+                            help="grupo do primeiro arquivo transmitido; os seguintes usam os próximos endereços (padrão: %s)" % MULTICAST_GROUP)
+        parser.add_argument("--multicast-port", type=int, default=MULTICAST_PORT,
+                            help="porta RTP dos grupos multicast (padrão: %d)" % MULTICAST_PORT)
+        parser.add_argument("--multicast-ttl", type=int, default=MULTICAST_TTL,
+                            help="TTL dos pacotes multicast; 1 não sai da rede local (padrão: %d)" % MULTICAST_TTL)
+        parser.add_argument("--workers", type=int, default=1,
+                            help="número de processos servidores na mesma porta (SO_REUSEPORT); padrão: 1")
+        parser.add_argument("--metrics-port", type=int, default=0,
+                            help="porta HTTP do endpoint /metrics (Prometheus); 0 desativa")
+        parser.add_argument("--log-level", default="INFO",
+                            choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                            help="nível de log (DEBUG mostra cada requisição RTSP)")
+        args = parser.parse_args()
+        if args.broadcast == "multicast" and args.workers > 1:
+            # cada processo teria seu canal e todos mandariam para o mesmo grupo
+            parser.error("--broadcast multicast exige --workers 1")
+        return args
+
     def main(self):
-        try:
-            SERVER_PORT = int(sys.argv[1])
-        except:
-            print("[Uso: Server.py Porta_Servidor]")
-            print("Exemplo: python3 Server.py 12000")
+        args = self.parseArgs()
+        SERVER_PORT = args.port
+        logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+        if args.workers > 1:
+            # cada processo tem seu próprio GIL, cache e escalonador; o pai só agrega as métricas
+            pool = WorkerPool(SERVER_PORT, args.workers, args.engine, args.cache_mb, args.log_level,
+                              (args.prefetch, args.io_threads), args.session_timeout, args.broadcast)
+            if args.metrics_port:
+                startMetricsServer(args.metrics_port, snapshot=pool.snapshot)
+                logger.info("Métricas em http://127.0.0.1:%d/metrics", args.metrics_port)
+            pool.run()
             return
 
-        rtspSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        rtspSocket.bind(("", SERVER_PORT))
-        rtspSocket.listen(5)
+        FrameCache.configure(args.cache_mb * 1024 * 1024)
+        Prefetcher.configure(args.prefetch, args.io_threads)
+        SessionRegistry.configure(args.session_timeout)
+        BroadcastHub.configure(args.broadcast, args.multicast_group, args.multicast_port, args.multicast_ttl)
+        if args.metrics_port:
+            startMetricsServer(args.metrics_port)
+            logger.info("Métricas em http://127.0.0.1:%d/metrics", args.metrics_port)
+        self.serve(SERVER_PORT, args.engine)
 
-        print(f"Servidor RTSP ouvindo na porta {SERVER_PORT}...")
+    def serve(self, port, engine, listenSocket=None, reusePort=False):
+        """Atende clientes até um KeyboardInterrupt (Ctrl-C ou SIGTERM nos processos filhos)."""
+        # metadados, SDP e índices de quadros prontos antes do primeiro cliente
+        count = MediaCatalog.shared().scan()
+        logger.info("Catálogo: %d vídeo(s) no diretório servido", count)
+
+        if engine == "asyncio":
+            AsyncServer(port, listenSocket, reusePort).run()
+            return
+
+        rtspSocket = listenSocket
+        if rtspSocket is None:
+            rtspSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if reusePort:
+                rtspSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            rtspSocket.bind(("", port))
+            rtspSocket.listen(128)
+
+        logger.info("Servidor RTSP ouvindo na porta %d...", port)
 
         # aceita conexões e cria um worker por cliente
-        while True:
-            clientInfo = {}
-            clientInfo['rtspSocket'] = rtspSocket.accept()
-            ServerWorker(clientInfo).run()
+        workers = []
+        try:
+            while True:
+                clientInfo = {}
+                clientInfo['rtspSocket'] = rtspSocket.accept()
+                workers = [w for w in workers if w.thread.is_alive()]
+                worker = ServerWorker(clientInfo)
+                worker.run()
+                workers.append(worker)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # desligamento: para de aceitar e encerra as sessões abertas
+            rtspSocket.close()
+            for worker in workers:
+                worker.shutdown()
+            for worker in workers:
+                worker.thread.join(2.0)
 
 if __name__ == "__main__":
     (Server()).main()
\ No newline at end of file
@@ -1,8 +1,46 @@
 from random import randint
-import sys, traceback, threading, socket
+import sys, traceback, threading, socket, logging, math
 import time
 from VideoStream import VideoStream
+from FrameCache import FrameCache
 from RtpPacket import RtpPacket
+from PacingScheduler import PacingScheduler
+from Metrics import MetricsRegistry, SessionMetrics, renderParameters
+from RtspParser import RtspParser, RtspParseError
+from Rtcp import parseRtcp
+from RateController import RateController
+from PacketHistory import PacketHistory
+from MediaCatalog import MediaCatalog
+from Rfc2435 import Rfc2435Packetizer
+from FramePacketizer import packetizeFrame, planBursts, MAX_RTP_PAYLOAD, CLOCK_RATE
+from SessionRegistry import SessionRegistry
+from BroadcastHub import BroadcastHub
+
+logger = logging.getLogger(__name__)
+
+# sendmsg permite enviar cabeçalho e payload sem concatená-los (não existe no Windows)
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+def openPortPair(host="", attempts=64):
+    """Sockets UDP (RTP, RTCP) em portas vizinhas: RTP par e RTCP = RTP + 1.
+
+    É o par que o `server_port` do Transport descreve (RFC 2326, 12.39);
+    as portas efêmeras vêm do kernel e, se a vizinha estiver ocupada,
+    tenta-se outra.
+    """
+    for _ in range(attempts):
+        rtpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rtpSocket.bind((host, 0))
+        port = rtpSocket.getsockname()[1]
+        if port % 2 == 0:
+            rtcpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                rtcpSocket.bind((host, port + 1))
+                return rtpSocket, rtcpSocket
+            except OSError:
+                rtcpSocket.close()
+        rtpSocket.close()
+    raise OSError("nenhum par de portas RTP/RTCP livre")
 
 class ServerWorker:
 
@@ -11,6 +49,8 @@ class ServerWorker:
     PAUSE = 'PAUSE'
     TEARDOWN = 'TEARDOWN'
     DESCRIBE = 'DESCRIBE'
+    GET_PARAMETER = 'GET_PARAMETER'
+    SET_PARAMETER = 'SET_PARAMETER'
     
     # (FSM)
     INIT = 0
@@ -21,112 +61,218 @@ class ServerWorker:
     OK_200 = 0
     FILE_NOT_FOUND_404 = 1
     CON_ERR_500 = 2
+    INVALID_RANGE_457 = 3
+    PARAMETER_NOT_UNDERSTOOD_451 = 4
+    METHOD_NOT_VALID_455 = 5
     
-    # MTU Ethernet seguro ~1400 bytes
-    MAX_RTP_PAYLOAD = 1400 
+    # quadro ainda em leitura antecipada: nova tentativa a cada PREFETCH_RETRY s,
+    # por até PREFETCH_WAIT do intervalo; depois disso lê direto
+    PREFETCH_RETRY = 0.002
+    PREFETCH_WAIT = 0.5
+
+    # envios recusados seguidos (ICMP "porta inalcançável") até dar o cliente por perdido
+    UNREACHABLE_LIMIT = 3
+
+    # maior Scale aceito no PLAY (avanço rápido de até 1 a cada 64 quadros)
+    MAX_SCALE = 64.0
 
     clientInfo = {}
     
     def __init__(self, clientInfo):
         self.clientInfo = clientInfo
+        # número de sequência, SSRC e base do timestamp aleatórios (RFC 3550)
+        self.rtpSeq = randint(0, 0xFFFF)
+        self.ssrc = randint(1, 0xFFFFFFFF)
+        self.timestampBase = randint(0, 0xFFFFFFFF)
+        self.metrics = SessionMetrics()
+        self.parser = RtspParser()
+        self.rateControl = RateController()
+        self.history = PacketHistory()
+        self.jpeg = Rfc2435Packetizer(MAX_RTP_PAYLOAD)
+        # renovado por requisições RTSP e RTCP; o `SessionRegistry` expira a sessão ociosa
+        self.lastActivity = time.monotonic()
+        self.refusals = 0
+        # canal ao vivo compartilhado (modo broadcast), no lugar do VideoStream próprio
+        self.channel = None
+        # trecho e velocidade do PLAY em curso (Range/Scale)
+        self.scale = 1.0
+        self.playStart = 0      # quadro em que o PLAY começou
+        self.endFrame = None    # quadro em que o envio para (fim do Range)
+        # versão (escada de qualidade) em uso e a pedida para a próxima fronteira de quadro,
+        # como (versão, VideoStream já aberto); a thread RTSP a deixa, o laço de envio a aplica
+        self.rendition = None
+        self.pendingRendition = None
+        self.renditionLock = threading.Lock()
         
     def run(self):
         """Inicia thread que recebe requisições RTSP do cliente."""
-        threading.Thread(target=self.recvRtspRequest).start()
+        SessionRegistry.shared().register(self)
+        self.thread = threading.Thread(target=self.recvRtspRequest)
+        self.thread.start()
         
     def recvRtspRequest(self):
         """Loop que lê dados RTSP do socket TCP do cliente."""
         connSocket = self.clientInfo['rtspSocket'][0]
         while True:            
             try:
-                data = connSocket.recv(256)
+                data = connSocket.recv(4096)
                 if data:
-                    data_str = data.decode('utf-8')
-                    print("-" * 20)
-                    print(f"RTSP Recebido:\n{data_str}")
-                    self.processRtspRequest(data_str)
+                    self.rtspDataReceived(data)
                 else:
                     break
+            except RtspParseError as e:
+                logger.warning("Requisição RTSP inválida: %s", e)
+                break
             except:
                 break
+        # conexão RTSP encerrada (com ou sem TEARDOWN): libera a sessão
+        self.releaseSession()
+        SessionRegistry.shared().unregister(self)
+        try: connSocket.close()
+        except OSError: pass
+
+    def shutdown(self):
+        """Encerra a sessão por iniciativa do servidor (desligamento)."""
+        self.stopRtp()
+        self.closeConnection()
+
+    def localAddress(self):
+        """Endereço local da conexão de controle (interface de saída do multicast)."""
+        try: return self.clientInfo['rtspSocket'][0].getsockname()[0]
+        except OSError: return None
+
+    def closeConnection(self):
+        """Derruba a conexão de controle; a thread RTSP libera o resto ao sair."""
+        try: self.clientInfo['rtspSocket'][0].shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+
+    def touch(self):
+        """Sinal de vida do cliente (requisição RTSP ou RTCP): renova o timeout."""
+        self.lastActivity = time.monotonic()
+        self.refusals = 0
+
+    def expire(self, reason):
+        """Encerra uma sessão abandonada (chamado pelo `SessionRegistry`)."""
+        logger.info("Sessão %s expirada: %s", self.clientInfo.get('session'), reason)
+        self.releaseSession()
+        self.closeConnection()
+
+    def releaseSession(self):
+        """Libera sockets RTP/RTCP, arquivo e métricas da sessão (pode ser chamado de novo)."""
+        self.stopRtp()
+        self.closeRtp()
+        MetricsRegistry.shared().unregister(self.metrics.sessionId)
+        if self.channel is not None:
+            BroadcastHub.shared().leave(self.channel, self)
+            self.channel = None
+        self.dropPendingRendition()
+        stream = self.clientInfo.pop('videoStream', None)
+        if stream is not None:
+            # fechado no escalonador, depois de algum envio do quadro ainda em andamento
+            self.scheduleAt(self.now(), stream.close)
+        self.state = self.INIT
     
-    def processRtspRequest(self, data):
-        """Processa requisição RTSP e responde conforme FSM."""
-        lines = data.splitlines()
-        if not lines: return
-        
-        line1 = lines[0].split(' ')
-        requestType = line1[0]
-        filename = line1[1]
-        
-        # extrai CSeq do cabeçalho
-        seq = "0"
-        for line in lines:
-            if "CSeq" in line:
-                try: seq = line.split("CSeq:")[1].strip()
-                except: pass
+    def rtspDataReceived(self, data):
+        """Alimenta o parser e processa, em ordem, cada requisição completa."""
+        self.touch()
+        for request in self.parser.feed(data):
+            logger.debug("RTSP Recebido: %s %s", request.startLine, request.headers)
+            self.processRtspRequest(request)
+    
+    def processRtspRequest(self, request):
+        """Processa requisição RTSP (`RtspMessage`) e responde conforme FSM."""
+        requestType = request.method
+        filename = request.uri
+        seq = request.cseq()
 
         # SETUP
         if requestType == self.SETUP:
             if self.state == self.INIT:
-                print("Processando SETUP...")
+                logger.debug("Processando SETUP...")
                 try:
-                    self.clientInfo['videoStream'] = VideoStream(filename)
+                    hub = BroadcastHub.shared()
+                    if hub.enabled():
+                        # quem assiste ao mesmo arquivo compartilha leitura e empacotamento
+                        self.channel = hub.join(filename, self)
+                    else:
+                        # versão que cabe no `Bandwidth:` do cliente (sem ele, o original)
+                        try: bandwidth = int(request.header('bandwidth'))
+                        except (TypeError, ValueError): bandwidth = None
+                        # só o que está no catálogo: nada fora do diretório servido
+                        self.rendition = MediaCatalog.shared().rendition(filename, bandwidth=bandwidth)
+                        if self.rendition is None:
+                            raise IOError("arquivo não encontrado: %s" % filename)
+                        self.clientInfo['filename'] = filename
+                        self.clientInfo['videoStream'] = VideoStream(self.rendition['path'], FrameCache.active())
+                        self.clientInfo['videoStream'].startPrefetch()
                     self.state = self.READY
                 except IOError:
+                    # sem arquivo não há sessão: nada de registro, sockets nem 200
                     self.replyRtsp(self.FILE_NOT_FOUND_404, seq)
+                    return
                 
                 self.clientInfo['session'] = randint(100000, 999999)
-                self.replyRtsp(self.OK_200, seq)
+                self.metrics.sessionId = self.clientInfo['session']
+                MetricsRegistry.shared().register(self.metrics)
                 
                 # extrai porta RTP informada pelo cliente
-                try:
-                    for line in lines:
-                        if "client_port=" in line:
-                            self.clientInfo['rtpPort'] = line.split("client_port=")[1].split(';')[0].strip()
-                except: 
-                    print("Erro ao ler porta RTP")
+                clientPort = request.transportParam('client_port')
+                if self.channel is not None and self.channel.group is not None:
+                    # multicast: o cliente entra no grupo do canal
+                    self.ssrc = self.channel.ssrc
+                    self.replyRtsp(self.OK_200, seq, self.channel.transportHeader())
+                elif clientPort:
+                    self.clientInfo['rtpPort'] = clientPort.split('-')[0]
+                    # portas do servidor (RTP e RTCP) vão no Transport da resposta
+                    self.openRtp()
+                    self.openRtcp()
+                    self.replyRtsp(self.OK_200, seq, self.transportHeader())
+                else:
+                    logger.warning("Erro ao ler porta RTP")
+                    self.replyRtsp(self.OK_200, seq)
         
         # PLAY
         elif requestType == self.PLAY:
             if self.state == self.READY:
-                print("Processando PLAY...")
+                logger.debug("Processando PLAY...")
+                try:
+                    headers = self.preparePlay(request)
+                except ValueError as e:
+                    logger.warning("PLAY recusado: %s", e)
+                    self.replyRtsp(self.INVALID_RANGE_457, seq)
+                    return
                 self.state = self.PLAYING
-                self.clientInfo["rtpSocket"] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                self.replyRtsp(self.OK_200, seq)
-                
-            # inicia thread de envio RTP
-                self.clientInfo['event'] = threading.Event()
-                self.clientInfo['worker'] = threading.Thread(target=self.sendRtp) 
-                self.clientInfo['worker'].start()
+                self.replyRtsp(self.OK_200, seq, headers)
+                self.startRtp()
+            elif self.state == self.INIT:
+                # sem SETUP aceito (ex.: arquivo inexistente) não há o que tocar
+                self.replyRtsp(self.METHOD_NOT_VALID_455, seq)
         
         # PAUSE
         elif requestType == self.PAUSE:
             if self.state == self.PLAYING:
-                print("Processando PAUSE...")
+                logger.debug("Processando PAUSE...")
                 self.state = self.READY
-                self.clientInfo['event'].set()
+                self.stopRtp()
                 self.replyRtsp(self.OK_200, seq)
         
         # TEARDOWN
         elif requestType == self.TEARDOWN:
-            print("Processando TEARDOWN...")
-            self.clientInfo['event'].set()
+            logger.debug("Processando TEARDOWN...")
+            self.stopRtp()
             self.replyRtsp(self.OK_200, seq)
-            try: self.clientInfo['rtpSocket'].close()
-            except: pass
-            self.state = self.INIT
+            self.releaseSession()
 
         # DESCRIBE
         elif requestType == self.DESCRIBE:
-            print("Processando DESCRIBE...")
-            # monta corpo SDP
-            sdp_body = "v=0\r\n"
-            sdp_body += "o=- " + str(self.clientInfo.get('session', 123456)) + " 1 IN IP4 " + str(self.clientInfo['rtspSocket'][1][0]) + "\r\n"
-            sdp_body += "s=Mjpeg Stream Python\r\n"
-            sdp_body += "i=Filme MJPEG\r\n"
-            sdp_body += "m=video " + str(self.clientInfo.get('rtpPort', 0)) + " RTP/AVP 26\r\n"
-            sdp_body += "a=control:streamid=0\r\n"
+            logger.debug("Processando DESCRIBE...")
+            # corpo SDP pré-renderizado pelo catálogo (com duração, quadros e tamanho máximo)
+            sdp_body = MediaCatalog.shared().describe(filename, self.clientInfo.get('session', 123456),
+                                                      self.clientInfo['rtspSocket'][1][0], self.clientInfo.get('rtpPort', 0),
+                                                      BroadcastHub.shared().describeGroup(filename))
+            if sdp_body is None:
+                self.replyRtsp(self.FILE_NOT_FOUND_404, seq)
+                return
             
             # Header RTSP (SDP)
             reply = 'RTSP/1.0 200 OK\r\nCSeq: ' + str(seq) + '\r\n'
@@ -135,66 +281,414 @@ class ServerWorker:
             reply += 'Content-Length: ' + str(len(sdp_body)) + '\r\n\r\n'
             reply += sdp_body
             
-            self.clientInfo['rtspSocket'][0].send(reply.encode('utf-8'))
+            self.sendRtspReply(reply)
 
-    def sendRtp(self):
-        """Envia frames RTP com fragmentação para suportar UDP."""
-        while True:
-            self.clientInfo['event'].wait(0.033)  # ~30 FPS
-            if self.clientInfo['event'].isSet(): 
-                break 
-            
-            # Obtém o quadro inteiro
-            frame_data = self.clientInfo['videoStream'].nextFrame()
+        # GET_PARAMETER: métricas da sessão e do servidor
+        elif requestType == self.GET_PARAMETER:
+            logger.debug("Processando GET_PARAMETER...")
+            snap = MetricsRegistry.shared().snapshot()
+            body = ""
+            if self.metrics.sessionId in snap['sessions']:
+                body += renderParameters(snap['sessions'][self.metrics.sessionId])
+            if self.rendition is not None:
+                pending = self.pendingRendition
+                body += "rendition: " + (pending[0] if pending else self.rendition)['name'] + "\r\n"
+            body += renderParameters(snap['total'], "server.")
             
-            if frame_data: 
-                frameNumber = self.clientInfo['videoStream'].frameNbr()
-                address = self.clientInfo['rtspSocket'][1][0]
-                port = int(self.clientInfo['rtpPort'])
-                
-                # --- Fragmentação do Quadro ---
-                total_len = len(frame_data)
-                offset = 0
-                
-                # Loop de Quebra (Chunks)
-                while offset < total_len:
-                    end = min(offset + self.MAX_RTP_PAYLOAD, total_len)
-                    chunk = frame_data[offset : end]
-                    
-                    # Define bit de Marcador: 1 se for o último pedaço do quadro, 0 caso contrário
-                    marker = 1 if end >= total_len else 0
-                    
-                    try:
-                        packet = self.makeRtp(chunk, frameNumber, marker)
-                        self.clientInfo['rtpSocket'].sendto(packet, (address, port))
-                        
-                        # Pausa minúscula para evitar estouro de buffer no SO (Anti-burst)
-                        time.sleep(0.0005) 
-                    except Exception as e:
-                        print("Erro envio RTP:", e)
-                        
-                    offset += self.MAX_RTP_PAYLOAD
-
-    def makeRtp(self, payload, frameNbr, marker=0):
-        """Empacota dados com cabeçalho RTP."""
-        version = 2
-        padding = 0
-        extension = 0
-        cc = 0
-        pt = 26 # Payload Type MJPEG
-        seqnum = frameNbr
-        ssrc = 0 
-        
-        rtpPacket = RtpPacket()
-        rtpPacket.encode(version, padding, extension, cc, seqnum, marker, pt, ssrc, payload)
-        return rtpPacket.getPacket()
+            reply = 'RTSP/1.0 200 OK\r\nCSeq: ' + str(seq) + '\r\n'
+            if 'session' in self.clientInfo:
+                reply += 'Session: ' + str(self.clientInfo['session']) + '\r\n'
+            reply += 'Content-Type: text/parameters\r\n'
+            reply += 'Content-Length: ' + str(len(body)) + '\r\n\r\n'
+            reply += body
             
-    def replyRtsp(self, code, seq):
-        """Envia resposta RTSP ao cliente."""
+            self.sendRtspReply(reply)
+
+        # SET_PARAMETER: troca de versão (`rendition: nome` ou `bandwidth: bit/s`)
+        elif requestType == self.SET_PARAMETER:
+            logger.debug("Processando SET_PARAMETER...")
+            if self.state == self.INIT or 'videoStream' not in self.clientInfo:
+                self.replyRtsp(self.METHOD_NOT_VALID_455, seq)
+                return
+            params = request.parameters()
+            try: bandwidth = int(params['bandwidth']) if 'bandwidth' in params else None
+            except ValueError: bandwidth = None
+            rendition = None
+            if 'rendition' in params or bandwidth is not None:
+                rendition = MediaCatalog.shared().rendition(self.clientInfo['filename'], params.get('rendition'), bandwidth)
+            if rendition is None:
+                self.replyRtsp(self.PARAMETER_NOT_UNDERSTOOD_451, seq)
+                return
+            try:
+                self.switchRendition(rendition)
+            except IOError:
+                logger.warning("Versão %s indisponível: %s", rendition['name'], rendition['path'])
+                self.replyRtsp(self.FILE_NOT_FOUND_404, seq)
+                return
+            self.replyRtsp(self.OK_200, seq)
+
+    def preparePlay(self, request):
+        """Aplica `Range: npt=` e `Scale` do PLAY; devolve os cabeçalhos da resposta.
+
+        A busca é só uma consulta ao índice de quadros (nada antes do ponto
+        é lido). `Scale` > 1 avança rápido mandando 1 a cada `ceil(Scale)`
+        quadros, no mesmo ritmo de quadros por segundo; entre 0 e 1 é câmera
+        lenta. Sem os cabeçalhos o PLAY continua de onde parou.
+        `ValueError` se o intervalo for inválido.
+        """
+        if self.channel is not None:
+            # canal ao vivo: todos assistem ao mesmo ponto, sem busca nem velocidade
+            return "Range: npt=now-\r\n"
+        stream = self.clientInfo['videoStream']
+        nptRange = request.nptRange()
+        try:
+            scale = request.scale()
+        except ValueError:
+            scale = None
+        if scale is not None and scale <= 0:
+            # reprodução reversa não é suportada: responde com a velocidade aplicada
+            scale = 1.0
+        self.scale = min(scale, self.MAX_SCALE) if scale is not None else 1.0
+        stride = max(1, math.ceil(self.scale))
+
+        position = stream.frameNbr()
+        self.endFrame = None
+        if nptRange is not None:
+            start, end = nptRange
+            if start is not None:
+                if start > stream.duration():
+                    raise ValueError("início %.3f além do fim (%.3f s)" % (start, stream.duration()))
+                position = stream.frameAt(start)
+            if end is not None:
+                self.endFrame = stream.frameAt(end)
+        stream.seek(position, stride)
+        self.playStart = position
+
+        end = stream.timeOf(self.endFrame) if self.endFrame is not None else stream.duration()
+        headers = "Range: npt=%.3f-%.3f\r\n" % (stream.timeOf(position), end)
+        if scale is not None:
+            headers += "Scale: %g\r\n" % self.scale
+        # onde o PLAY começa na sequência e no relógio RTP (o cliente recomeça o buffer)
+        headers += "RTP-Info: url=%s;seq=%d;rtptime=%d\r\n" % (
+            stream.filename, self.rtpSeq, self.mediaTimestamp(position + 1))
+        return headers
+
+    def switchRendition(self, rendition):
+        """Passa a enviar a versão `rendition` do catálogo, na próxima fronteira de quadro.
+
+        O `VideoStream` novo é aberto aqui, na thread RTSP: sem `.rtpx` nem
+        índice no cache, abri-lo varre o arquivo inteiro, o que travaria o
+        escalonador compartilhado por todas as sessões. `IOError` se a
+        versão não abrir.
+        """
+        if self.rendition is not None and rendition['path'] == self.rendition['path']:
+            self.dropPendingRendition()
+            return
+        old = self.clientInfo['videoStream']
+        stream = VideoStream(rendition['path'], FrameCache.active())
+        stream.seek(old.frameNbr(), old.stride)
+        if self.state == self.PLAYING:
+            # aplicada pelo laço de envio, entre dois quadros
+            with self.renditionLock:
+                previous, self.pendingRendition = self.pendingRendition, (rendition, stream)
+            if previous is not None:
+                previous[1].close()
+        else:
+            self.dropPendingRendition()
+            self.applyRendition(rendition, stream)
+
+    def dropPendingRendition(self):
+        """Desiste da troca de versão ainda não aplicada."""
+        with self.renditionLock:
+            pending, self.pendingRendition = self.pendingRendition, None
+        if pending is not None:
+            pending[1].close()
+
+    def applyRendition(self, rendition, stream):
+        """Troca o `VideoStream` pelo `stream` já aberto da versão pedida, no mesmo quadro e passo."""
+        old = self.clientInfo['videoStream']
+        # o envio andou desde a abertura: reposicionar é só ajustar o número do quadro
+        stream.seek(old.frameNbr(), old.stride)
+        stream.startPrefetch()
+        self.clientInfo['videoStream'] = stream
+        logger.info("Sessão %s: versão %s -> %s no quadro %d", self.clientInfo.get('session'),
+                    self.rendition['name'] if self.rendition else "?", rendition['name'], old.frameNbr())
+        self.rendition = rendition
+        # outras tabelas de quantização com os mesmos valores de Q: o receptor precisa das novas
+        self.jpeg.resendTables()
+        # fechado depois das rajadas ainda agendadas do quadro anterior
+        self.scheduleAt(self.now(), old.close)
+
+    def startRtp(self):
+        """Começa a enviar quadros a partir de agora, no ritmo do arquivo."""
+        # cada PLAY tem seu próprio evento: callbacks de um PLAY anterior morrem sozinhos
+        event = threading.Event()
+        self.clientInfo['event'] = event
+        if self.channel is not None:
+            # o canal envia; a sessão só entra na lista de quem recebe
+            if self.channel.group is None:
+                self.openRtp()
+            BroadcastHub.shared().activate(self.channel, self)
+            return
+        self.openRtp()
+        stream = self.clientInfo['videoStream']
+        # com Scale, cada envio avança `stride` quadros do arquivo em `stride / Scale` quadros de tempo
+        self.frameInterval = stream.stride / (stream.frameRate() * self.scale)
+        self.scheduleFrame(self.now(), event)
+
+    def openRtp(self):
+        """Cria os sockets RTP e RTCP da sessão, em portas vizinhas."""
+        if 'rtpSocket' not in self.clientInfo:
+            rtpSocket, rtcpSocket = openPortPair()
+            # buffer de envio grande: um quadro inteiro sai em poucas rajadas
+            rtpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1024 * 1024)
+            # socket conectado: o kernel não resolve o destino a cada pacote
+            rtpSocket.connect(self.rtpAddress())
+            # lido sem bloquear a cada quadro (`pollRtcp`)
+            rtcpSocket.setblocking(False)
+            self.clientInfo['rtpSocket'] = rtpSocket
+            self.clientInfo['rtcpSocket'] = rtcpSocket
+
+    def openRtcp(self):
+        """Socket que recebe os relatórios RTCP do cliente (aberto em par com o RTP)."""
+        self.openRtp()
+
+    def serverPorts(self):
+        """Portas locais (RTP, RTCP) anunciadas no Transport do SETUP."""
+        return (self.clientInfo['rtpSocket'].getsockname()[1], self.clientInfo['rtcpSocket'].getsockname()[1])
+
+    def transportHeader(self):
+        clientPort = int(self.clientInfo['rtpPort'])
+        rtpPort, rtcpPort = self.serverPorts()
+        return (f"Transport: RTP/AVP;unicast;client_port={clientPort}-{clientPort + 1};"
+                f"server_port={rtpPort}-{rtcpPort};ssrc={self.ssrc:08X}\r\n")
+
+    def pollRtcp(self):
+        """Lê, sem bloquear, os relatórios RTCP que chegaram desde o último quadro."""
+        rtcpSocket = self.clientInfo.get('rtcpSocket')
+        if rtcpSocket is None:
+            return
+        while True:
+            try:
+                data = rtcpSocket.recv(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            for block in parseRtcp(data):
+                if block['ssrc'] == self.ssrc:
+                    self.handleRtcp(block)
+
+    def handleRtcp(self, block):
+        """Trata um item RTCP (relatório ou NACK) sobre o fluxo desta sessão."""
+        self.touch()
+        if block['type'] == 'nack':
+            self.onNack(block['seqs'])
+        else:
+            self.onReceiverReport(block)
+
+    def onNack(self, seqs):
+        """Reenvia, do histórico, os pacotes pedidos que ainda chegam a tempo."""
+        self.metrics.nacksReceived += 1
+        packets = self.history.retransmit(seqs, self.now())
+        if not packets:
+            return
+        try:
+            self.sendPackets(packets)
+        except Exception as e:
+            logger.warning("Erro reenvio RTP: %s", e)
+            return
+        self.metrics.packetsRetransmitted += len(packets)
+
+    def onReceiverReport(self, block):
+        """Ajusta a taxa de quadros pela perda informada pelo cliente."""
+        self.metrics.rtcpReports += 1
+        if self.rateControl.onReport(block['fractionLost'] / 256, block['jitter'] / CLOCK_RATE):
+            logger.info("Sessão %s: perda %.1f%%, enviando 1 a cada %d quadros",
+                        self.clientInfo.get('session'), self.rateControl.loss * 100, self.rateControl.divisor)
+
+    def stopRtp(self):
+        """Sinaliza o fim do envio RTP (PAUSE/TEARDOWN)."""
+        if 'event' in self.clientInfo:
+            self.clientInfo['event'].set()
+        if self.channel is not None:
+            BroadcastHub.shared().deactivate(self.channel, self)
+
+    def prepareBroadcast(self, packets, frameNumber):
+        """Pacotes de um quadro do canal regravados para esta sessão, ou `None` se ela o pula.
+
+        Chamado pelo `BroadcastChannel` a cada quadro: o SSRC e a sequência
+        são os da sessão, então RTCP, NACK e adaptação de taxa não mudam.
+        """
+        if not self.rateControl.shouldSend(frameNumber):
+            self.metrics.framesSkipped += 1
+            return None
+        packets = RtpPacket.restamp(packets, self.rtpSeq, self.ssrc)
+        self.rtpSeq = (self.rtpSeq + len(packets)) & 0xFFFF
+        self.metrics.framesSent += 1
+        return packets
+
+    def closeRtp(self):
+        """Fecha os sockets RTP e RTCP da sessão."""
+        for key in ('rtpSocket', 'rtcpSocket'):
+            try: self.clientInfo.pop(key).close()
+            except: pass
+
+    def now(self):
+        """Relógio monotônico usado para os prazos de envio."""
+        return PacingScheduler.now()
+
+    def scheduleAt(self, deadline, callback):
+        """Agenda `callback` no escalonador compartilhado."""
+        PacingScheduler.shared().schedule(deadline, callback)
+
+    def clock(self):
+        """(now, scheduleAt) do motor, sem referência à sessão: usados por quem vive mais que ela."""
+        return PacingScheduler.now, PacingScheduler.shared().schedule
+
+    def scheduleFrame(self, deadline, event):
+        self.scheduleAt(deadline, lambda: self.sendNextFrame(deadline, event))
+
+    def sendNextFrame(self, deadline, event):
+        """Envia o quadro devido em `deadline` e agenda o próximo em prazo absoluto."""
+        if event.isSet():
+            return
+        if self.pendingRendition is not None:
+            with self.renditionLock:
+                pending, self.pendingRendition = self.pendingRendition, None
+            if pending is not None:
+                self.applyRendition(*pending)
+        metrics = self.metrics
+        stream = self.clientInfo['videoStream']
+        if self.endFrame is not None and stream.frameNbr() >= self.endFrame:
+            # fim do Range pedido no PLAY
+            return
+        # ordem do envio neste PLAY (no avanço rápido os quadros do arquivo vêm de `stride` em `stride`)
+        slot = (stream.frameNbr() - self.playStart) // stream.stride
+        now = self.now()
+        if (not stream.frameReady() and self.rateControl.shouldSend(slot)
+                and now - deadline < self.frameInterval * self.PREFETCH_WAIT):
+            # disco lento: não trava o escalonador (compartilhado) esperando a leitura
+            metrics.prefetchStalls += 1
+            self.scheduleAt(now + self.PREFETCH_RETRY, lambda: self.sendNextFrame(deadline, event))
+            return
+        metrics.pacingLateness.observe(max(0.0, now - deadline))
+        self.pollRtcp()
+
+        if not self.rateControl.shouldSend(slot):
+            # link congestionado: pula o quadro, mas mantém o relógio de mídia
+            if not stream.skipFrame():
+                return
+            metrics.framesSkipped += 1
+        else:
+            # Obtém o quadro inteiro
+            started = time.perf_counter()
+            frameNumber = stream.frameNbr() + 1
+            frame_data = stream.nextFrame()
+            metrics.readTime.observe(time.perf_counter() - started)
+            if frame_data is None:
+                return
+            metrics.framesSent += 1
+
+            packets = self.makeRtpPackets(frame_data, frameNumber)
+            # com quadros pulados, o intervalo até o próximo envio é maior e as
+            # rajadas se espalham por ele, baixando o pico de taxa no link
+            for when, burst in planBursts(len(packets), deadline, self.frameInterval * self.rateControl.divisor):
+                if when <= deadline:
+                    self.sendBurst(packets[burst], event)
+                else:
+                    self.scheduleAt(when, lambda burst=packets[burst]: self.sendBurst(burst, event))
+
+        # prazo absoluto: o tempo gasto lendo e enviando não se acumula
+        nextDeadline = deadline + self.frameInterval
+        now = self.now()
+        if now - nextDeadline > self.frameInterval:
+            # atrasado mais de um quadro: reancora em vez de despejar quadros atrasados
+            nextDeadline = now
+        self.scheduleFrame(nextDeadline, event)
+
+    def sendBurst(self, packets, event):
+        """Envia uma rajada de pacotes, a menos que a sessão tenha pausado."""
+        if event.isSet():
+            return
+        self.pollRtcp()
+        # guardados para reenvio sob NACK no instante em que saem de fato, não no
+        # empacotamento: as últimas rajadas partem até meio intervalo depois
+        header = packets[0][0]
+        self.history.store((header[2] << 8) | header[3], packets, self.now())
+        try:
+            started = time.perf_counter()
+            self.sendPackets(packets)
+            self.metrics.sendLatency.observe(time.perf_counter() - started)
+        except ConnectionRefusedError:
+            # ICMP "porta inalcançável" no socket conectado: o cliente fechou a porta RTP
+            self.rtpRefused()
+            return
+        except Exception as e:
+            logger.warning("Erro envio RTP: %s", e)
+            return
+        self.metrics.packetsSent += len(packets)
+        self.metrics.bytesSent += sum(len(header) + len(payload) for header, payload in packets)
+
+    def rtpRefused(self):
+        """Um envio RTP foi recusado; na `UNREACHABLE_LIMIT`-ésima recusa seguida, expira a sessão."""
+        self.refusals += 1
+        # só uma vez: outras recusas podem chegar antes de a sessão ser liberada
+        if self.refusals == self.UNREACHABLE_LIMIT:
+            self.expire("porta RTP %s inalcançável" % self.clientInfo.get('rtpPort'))
+
+    def rtpAddress(self):
+        """Endereço (IP, porta) de destino do RTP."""
+        return (self.clientInfo['rtspSocket'][1][0], int(self.clientInfo['rtpPort']))
+
+    def mediaTimestamp(self, frameNumber):
+        """Timestamp RTP (90 kHz) do início do quadro `frameNumber` (1 = primeiro).
+
+        Com Scale, o relógio RTP conta o tempo de exibição a partir do
+        início do PLAY, não a posição no arquivo: o cliente exibe os
+        quadros no ritmo em que chegam.
+        """
+        stream = self.clientInfo['videoStream']
+        start = stream.timeOf(self.playStart)
+        seconds = start + (stream.timeOf(frameNumber - 1) - start) / self.scale
+        return (self.timestampBase + round(seconds * CLOCK_RATE)) & 0xFFFFFFFF
+
+    def makeRtpPackets(self, frame_data, frameNumber):
+        """Lista de (cabeçalho, payload) do quadro, com a sequência e o SSRC da sessão (ver `packetizeFrame`)."""
+        packets = packetizeFrame(self.clientInfo['videoStream'], frameNumber - 1, frame_data,
+                                 self.rtpSeq, self.ssrc, self.mediaTimestamp(frameNumber), self.jpeg)
+        self.rtpSeq = (self.rtpSeq + len(packets)) & 0xFFFF
+        return packets
+
+    def sendPackets(self, packets):
+        """Envia os pacotes do quadro pelo socket UDP (conectado) da sessão."""
+        rtpSocket = self.clientInfo['rtpSocket']
+        if HAS_SENDMSG:
+            # scatter-gather: cabeçalho e payload vão em buffers separados
+            for packet in packets:
+                rtpSocket.sendmsg(packet)
+        else:
+            for header, payload in packets:
+                rtpSocket.send(b"".join((header, payload)))
+
+    def replyRtsp(self, code, seq, headers=""):
+        """Envia resposta RTSP ao cliente (`headers`: linhas extras, terminadas em CRLF)."""
         if code == self.OK_200:
-            reply = 'RTSP/1.0 200 OK\r\nCSeq: ' + str(seq) + '\r\nSession: ' + str(self.clientInfo['session']) + '\r\n\r\n'
-            self.clientInfo['rtspSocket'][0].send(reply.encode('utf-8'))
+            reply = ('RTSP/1.0 200 OK\r\nCSeq: ' + str(seq) + '\r\nSession: ' + str(self.clientInfo['session'])
+                     + ';timeout=' + str(SessionRegistry.shared().timeout) + '\r\n' + headers + '\r\n')
+            self.sendRtspReply(reply)
         elif code == self.FILE_NOT_FOUND_404:
-            print("404 NOT FOUND")
+            logger.warning("404 NOT FOUND")
+            self.sendRtspReply('RTSP/1.0 404 Not Found\r\nCSeq: ' + str(seq) + '\r\n\r\n')
         elif code == self.CON_ERR_500:
-            print("500 CONNECTION ERROR")
\ No newline at end of file
+            logger.warning("500 CONNECTION ERROR")
+        elif code == self.INVALID_RANGE_457:
+            self.sendRtspReply('RTSP/1.0 457 Invalid Range\r\nCSeq: ' + str(seq) + '\r\n\r\n')
+        elif code == self.PARAMETER_NOT_UNDERSTOOD_451:
+            self.sendRtspReply('RTSP/1.0 451 Parameter Not Understood\r\nCSeq: ' + str(seq) + '\r\n\r\n')
+        elif code == self.METHOD_NOT_VALID_455:
+            self.sendRtspReply('RTSP/1.0 455 Method Not Valid in This State\r\nCSeq: ' + str(seq) + '\r\n\r\n')
+
+    def sendRtspReply(self, reply):
+        """Envia texto de resposta RTSP pela conexão de controle."""
+        self.clientInfo['rtspSocket'][0].send(reply.encode('utf-8'))
\ No newline at end of file
@@ -0,0 +1,76 @@
+import threading, time, logging
+
+logger = logging.getLogger(__name__)
+
+# tempo (s) sem requisição RTSP nem RTCP até a sessão expirar (padrão do RTSP, RFC 2326 12.37)
+DEFAULT_TIMEOUT = 60
+# maior intervalo (s) entre duas varreduras do coletor
+REAP_INTERVAL = 5.0
+
+class SessionRegistry:
+    """Conexões RTSP ativas do processo e o coletor das abandonadas.
+
+    Cada `ServerWorker` se registra ao aceitar a conexão e sai ao fechá-la.
+    Qualquer requisição RTSP ou pacote RTCP renova a sessão (`touch`); uma
+    thread varre o registro e expira as que passaram do timeout, liberando
+    sockets, arquivo e conexão de controle (`ServerWorker.expire`).
+    """
+
+    timeout = DEFAULT_TIMEOUT
+    _shared = None
+    _sharedLock = threading.Lock()
+
+    @classmethod
+    def configure(cls, timeout=DEFAULT_TIMEOUT):
+        """Define o timeout das sessões do processo (antes de atender clientes)."""
+        cls.timeout = timeout
+
+    @classmethod
+    def shared(cls):
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or self.timeout
+        self.lock = threading.Lock()
+        self.workers = set()
+        self.expired = 0
+        self.thread = None
+
+    def register(self, worker):
+        with self.lock:
+            self.workers.add(worker)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="SessionReaper", daemon=True)
+                self.thread.start()
+
+    def unregister(self, worker):
+        with self.lock:
+            self.workers.discard(worker)
+
+    def count(self):
+        with self.lock:
+            return len(self.workers)
+
+    def run(self):
+        interval = min(REAP_INTERVAL, self.timeout / 4)
+        while True:
+            time.sleep(interval)
+            try:
+                self.reap()
+            except Exception:
+                logger.exception("Erro no coletor de sessões")
+
+    def reap(self, now=None):
+        """Expira as sessões ociosas há mais de `timeout`; devolve quantas."""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            idle = [w for w in self.workers if now - w.lastActivity > self.timeout]
+            self.workers.difference_update(idle)
+        for worker in idle:
+            worker.expire("sem atividade há %.0f s" % (now - worker.lastActivity))
+        self.expired += len(idle)
+        return len(idle)
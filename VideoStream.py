@@ -1,33 +1,180 @@
+import mmap, os, bisect
+from array import array
+from Prefetcher import Prefetcher
+from Prepack import PrepackedIndex
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+
+# taxa usada quando o arquivo não tem `<arquivo>.fps` ao lado
+DEFAULT_FRAME_RATE = 30.0
+
 class VideoStream:
-    def __init__(self, filename):
+    def __init__(self, filename, cache=None, prepacked=True):
         self.filename = filename
+        self.cache = cache
         try:
             self.file = open(filename, 'rb')
         except:
             raise IOError
         self.frameNum = 0
-        self.buffer = b""
+        # quadros avançados por leitura: >1 no avanço rápido (Scale do PLAY)
+        self.stride = 1
+        self.fps = self.readFrameRate(filename)
+        self.prefetcher = None
 
-    def nextFrame(self):
-        """Retorna o próximo quadro JPEG completo ou `None` se acabar."""
+        # mapeia o arquivo inteiro (arquivo vazio não pode ser mapeado)
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.data = b""
+        self.view = memoryview(self.data)
+
+        # chave do arquivo: muda se o arquivo for substituído em disco
+        st = os.fstat(self.file.fileno())
+        self.fileKey = (os.path.realpath(filename), st.st_mtime_ns, st.st_size)
+
+        # `<arquivo>.rtpx` (ver Prepack.py): índice e fragmentos prontos, sem varrer o vídeo
+        self.prepacked = PrepackedIndex.open(filename, st.st_size, st.st_mtime_ns) if prepacked else None
+        if self.prepacked is not None:
+            self.starts, self.ends = self.prepacked.starts, self.prepacked.ends
+            self.fps = self.prepacked.fps
+        elif cache is None:
+            self.starts, self.ends = self.buildIndex(self.data)
+        else:
+            self.starts, self.ends = cache.getIndex(self.fileKey, lambda: self.buildIndex(self.data))
+
+    @staticmethod
+    def readFrameRate(filename):
+        """Lê a taxa de quadros de `<arquivo>.fps` (um número), se existir."""
+        try:
+            with open(filename + '.fps') as f:
+                fps = float(f.read().strip())
+            if fps > 0:
+                return fps
+        except (OSError, ValueError):
+            pass
+        return DEFAULT_FRAME_RATE
+
+    @staticmethod
+    def buildIndex(data):
+        """Varre o arquivo uma única vez e devolve os offsets (início, fim) de cada quadro."""
+        starts = array('Q')
+        ends = array('Q')
+        pos = 0
         while True:
-            # procura marcadores JPEG no buffer
-            start_index = self.buffer.find(b'\xff\xd8')
-            end_index = self.buffer.find(b'\xff\xd9')
+            start = data.find(SOI, pos)
+            if start == -1:
+                break
+            end = data.find(EOI, start + 2)
+            if end == -1:
+                break
+            starts.append(start)
+            ends.append(end + 2)
+            pos = end + 2
+        return starts, ends
+
+    def startPrefetch(self, depth=None):
+        """Liga a leitura antecipada dos próximos quadros (ver `Prefetcher`)."""
+        if self.prefetcher is None and (depth or Prefetcher.depth):
+            self.prefetcher = Prefetcher(self, depth)
+            self.prefetcher.schedule()
 
-            if start_index != -1 and end_index != -1 and end_index > start_index:
-                # recorta quadro e atualiza buffer
-                frame = self.buffer[start_index : end_index + 2]
-                self.buffer = self.buffer[end_index + 2:]
-                self.frameNum += 1
-                return frame
+    def frameReady(self):
+        """Se `nextFrame` pode retornar sem ler o disco (sempre, sem leitura antecipada)."""
+        n = self.frameNum
+        if self.prefetcher is None or n >= len(self.starts):
+            return True
+        return self.prefetcher.isReady(n)
 
-            chunk = self.file.read(4096)
-            if not chunk:
-                return None
+    def nextFrame(self):
+        """Retorna o próximo quadro JPEG completo ou `None` se acabar.
 
-            self.buffer += chunk
+        Sem cache o quadro é um `memoryview` do mapeamento (sem cópia); com
+        cache é o `bytes` compartilhado entre as sessões. Com leitura
+        antecipada, vem pronto da memória quando `frameReady()`.
+        """
+        n = self.frameNum
+        if n >= len(self.starts):
+            return None
+        frame = self.prefetcher.take(n) if self.prefetcher is not None else None
+        if frame is None:
+            # sem leitura antecipada (ou quadro ainda não pronto): lê direto
+            if self.cache is None:
+                frame = self.view[self.starts[n] : self.ends[n]]
+            else:
+                frame = self.cache.get((self.fileKey, n), lambda: bytes(self.view[self.starts[n] : self.ends[n]]))
+        self.frameNum += self.stride
+        return frame
+
+    def skipFrame(self):
+        """Avança um quadro sem lê-lo; devolve `False` se o arquivo acabou."""
+        if self.frameNum >= len(self.starts):
+            return False
+        if self.prefetcher is not None:
+            self.prefetcher.discard(self.frameNum)
+        self.frameNum += self.stride
+        return True
+
+    def rewind(self):
+        """Volta ao primeiro quadro (os canais ao vivo repetem o arquivo)."""
+        self.seek(0)
+
+    def seek(self, frameNumber, stride=None):
+        """Posiciona no quadro `frameNumber` (a partir de 0) sem ler nada antes dele.
+
+        Com `stride` > 1 as leituras seguintes pulam de `stride` em `stride`
+        quadros (avanço rápido); a leitura antecipada segue o mesmo passo.
+        """
+        self.frameNum = min(max(0, frameNumber), len(self.starts))
+        if stride is not None:
+            self.stride = max(1, stride)
+        if self.prefetcher is not None:
+            self.prefetcher.reset()
+
+    def frameAt(self, seconds):
+        """Quadro exibido no instante `seconds` do vídeo (busca no índice, sem ler o arquivo)."""
+        if self.prepacked is not None:
+            # tempos de apresentação do `.rtpx`: o último quadro que começa até `seconds`
+            return max(0, bisect.bisect_right(self.prepacked.pts, round(seconds * 90000)) - 1)
+        return int(seconds * self.fps + 1e-6)
+
+    def timeOf(self, frameNumber):
+        """Instante (s) em que o quadro `frameNumber` começa."""
+        if self.prepacked is not None and frameNumber < len(self.starts):
+            return self.prepacked.pts[frameNumber] / 90000
+        return frameNumber / self.fps
+
+    def duration(self):
+        """Duração do vídeo em segundos."""
+        return self.timeOf(len(self.starts))
+
+    def frameCount(self):
+        """Número total de quadros do arquivo."""
+        return len(self.starts)
+
+    def frameRate(self):
+        """Quadros por segundo do arquivo."""
+        return self.fps
 
     def frameNbr(self):
         """Número do quadro atual."""
-        return self.frameNum
\ No newline at end of file
+        return self.frameNum
+
+    def close(self):
+        """Libera o mapeamento e o arquivo."""
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        try:
+            self.view.release()
+            if isinstance(self.data, mmap.mmap):
+                self.data.close()
+        except BufferError:
+            # ainda há fatias em uso; o GC libera o mapeamento depois
+            pass
+        if self.prepacked is not None:
+            try:
+                self.prepacked.close()
+            except BufferError:
+                pass
+        self.file.close()
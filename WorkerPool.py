@@ -0,0 +1,140 @@
+import os, signal, socket, logging, threading, time, queue, multiprocessing
+from Metrics import MetricsRegistry, mergeSnapshots
+
+logger = logging.getLogger(__name__)
+
+# com SO_REUSEPORT cada filho tem seu socket de escuta e o kernel distribui as conexões
+HAS_REUSEPORT = hasattr(socket, 'SO_REUSEPORT')
+
+# intervalo (s) entre os snapshots de métricas que cada filho manda ao pai
+REPORT_INTERVAL = 1.0
+
+def workerMain(index, port, engine, cacheMb, logLevel, prefetch, sessionTimeout, broadcast, listenSocket, reports):
+    """Ponto de entrada de um processo filho: um servidor completo na mesma porta."""
+    from Server import Server
+    from FrameCache import FrameCache
+    from Prefetcher import Prefetcher
+    from SessionRegistry import SessionRegistry
+    from BroadcastHub import BroadcastHub
+
+    logging.basicConfig(level=logLevel, format=f"%(asctime)s %(levelname)s [w{index}] %(name)s: %(message)s", force=True)
+    # SIGTERM segue o mesmo caminho do Ctrl-C: KeyboardInterrupt e desligamento limpo
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    FrameCache.configure(cacheMb * 1024 * 1024)
+    Prefetcher.configure(*prefetch)
+    SessionRegistry.configure(sessionTimeout)
+    # só unicast: o multicast com vários processos é recusado no Server
+    BroadcastHub.configure(broadcast)
+
+    stop = threading.Event()
+    def report():
+        while not stop.wait(REPORT_INTERVAL):
+            reports.put((index, MetricsRegistry.shared().snapshot()))
+    threading.Thread(target=report, name="MetricsReporter", daemon=True).start()
+
+    try:
+        Server().serve(port, engine, listenSocket, reusePort=listenSocket is None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # um segundo sinal não deve interromper o relatório final
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        stop.set()
+        reports.put((index, MetricsRegistry.shared().snapshot()))
+
+class WorkerPool:
+    """N processos servidores atendendo a mesma porta RTSP.
+
+    Com SO_REUSEPORT cada filho abre seu próprio socket de escuta; sem ele
+    (ex.: Windows), o pai abre um só e os filhos o herdam e disputam o
+    `accept`. Os filhos mandam snapshots periódicos das métricas por uma
+    fila, que o pai agrega para o `/metrics` e para o resumo final.
+    """
+
+    def __init__(self, port, workers, engine="thread", cacheMb=64, logLevel="INFO", prefetch=(8, 4), sessionTimeout=60, broadcast="off"):
+        self.port = port
+        self.workerCount = workers
+        self.engine = engine
+        self.cacheMb = cacheMb
+        self.logLevel = logLevel
+        self.prefetch = prefetch     # (profundidade, threads de E/S) de cada filho
+        self.sessionTimeout = sessionTimeout
+        self.broadcast = broadcast
+        self.processes = []
+        self.lock = threading.Lock()
+        self.latest = {}       # índice do filho -> último snapshot recebido
+        self.reports = None
+        self.listenSocket = None
+
+    def start(self):
+        if not HAS_REUSEPORT:
+            self.listenSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listenSocket.bind(("", self.port))
+            self.listenSocket.listen(128)
+        self.reports = multiprocessing.Queue()
+        for index in range(self.workerCount):
+            process = multiprocessing.Process(
+                target=workerMain, name=f"rtsp-worker-{index}",
+                args=(index, self.port, self.engine, self.cacheMb, self.logLevel, self.prefetch,
+                      self.sessionTimeout, self.broadcast, self.listenSocket, self.reports))
+            process.start()
+            self.processes.append(process)
+        logger.info("%d processos servidores (%s) na porta %d, pid do pai %d",
+                    self.workerCount, "SO_REUSEPORT" if HAS_REUSEPORT else "socket herdado", self.port, os.getpid())
+
+    def collect(self, timeout):
+        """Recebe os snapshots que chegarem em até `timeout` segundos."""
+        try:
+            index, snap = self.reports.get(timeout=timeout)
+            while True:
+                with self.lock:
+                    self.latest[index] = snap
+                index, snap = self.reports.get_nowait()
+        except queue.Empty:
+            pass
+
+    def snapshot(self):
+        with self.lock:
+            return mergeSnapshots(dict(self.latest))
+
+    def run(self):
+        """Sobe os filhos e espera até Ctrl-C/SIGTERM ou até todos saírem."""
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        self.start()
+        crashed = set()
+        try:
+            while any(p.is_alive() for p in self.processes):
+                self.collect(REPORT_INTERVAL)
+                for process in self.processes:
+                    if process.exitcode not in (None, 0) and process.name not in crashed:
+                        crashed.add(process.name)
+                        logger.warning("%s saiu com código %s", process.name, process.exitcode)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self, timeout=5.0):
+        """Desligamento limpo: SIGTERM aos filhos, espera e mata os que restarem."""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        # a fila precisa ser esvaziada enquanto os filhos saem, senão o join pode travar
+        deadline = time.monotonic() + timeout
+        while any(p.is_alive() for p in self.processes) and time.monotonic() < deadline:
+            self.collect(0.1)
+        for process in self.processes:
+            if process.is_alive():
+                logger.warning("%s não encerrou a tempo; matando", process.name)
+                process.kill()
+            process.join()
+        self.collect(0.1)
+        if self.listenSocket is not None:
+            self.listenSocket.close()
+
+        total = self.snapshot()['total']
+        logger.info("Encerrado: %d quadros, %d pacotes, %d bytes enviados por %d processos",
+                    total['framesSent'], total['packetsSent'], total['bytesSent'], self.workerCount)
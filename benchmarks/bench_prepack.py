@@ -0,0 +1,77 @@
+"""Benchmark do formato pré-empacotado (`.rtpx`, Prepack.py).
+
+Gera um vídeo MJPEG determinístico de quadros JPEG reais e mede, com e
+sem o `.rtpx`, o tempo de abrir um `VideoStream` (varredura do arquivo x
+mapeamento do índice pronto) e o de montar os pacotes RTP de todos os
+quadros (`Rfc2435Packetizer` x `PrepackedIndex.packets`).
+
+Uso: python3 benchmarks/bench_prepack.py [--frames 300] [--size 1280x720] [--repeat 20] [--json saida.json]
+"""
+import os, sys, json, time, tempfile, argparse, statistics
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from bench_renditions import makeJpegMovie
+from VideoStream import VideoStream
+from Prepack import convert, DEFAULT_MAX_PAYLOAD
+from Rfc2435 import Rfc2435Packetizer
+
+def timeOpen(movie, prepacked, repeat):
+    """Mediana (s) de abrir e fechar o vídeo `repeat` vezes."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stream = VideoStream(movie, prepacked=prepacked)
+        samples.append(time.perf_counter() - started)
+        assert (stream.prepacked is not None) == prepacked
+        stream.close()
+    return statistics.median(samples)
+
+def timePacketize(movie, prepacked):
+    """(segundos, pacotes) para montar os pacotes de todos os quadros."""
+    stream = VideoStream(movie, prepacked=prepacked)
+    packetizer = Rfc2435Packetizer(DEFAULT_MAX_PAYLOAD)
+    packets = 0
+    seq = 0
+    try:
+        started = time.perf_counter()
+        for n in range(stream.frameCount()):
+            frame = stream.nextFrame()
+            if prepacked:
+                out = stream.prepacked.packets(n, frame, seq, 1, n * 3000, packetizer)
+            else:
+                out = packetizer.packetize(frame, seq, 1, n * 3000)
+            packets += len(out)
+            seq = (seq + len(out)) & 0xFFFF
+        return time.perf_counter() - started, packets
+    finally:
+        stream.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+    size = tuple(int(x) for x in args.size.split('x'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        movie = os.path.join(tmp, "bench.Mjpeg")
+        makeJpegMovie(movie, args.frames, size)
+        convert(movie)
+        print(f"{args.frames} quadros {size[0]}x{size[1]}, {os.path.getsize(movie) / 1e6:.1f} MB")
+        result = {'frames': args.frames}
+        for prepacked, label in ((False, 'varredura'), (True, '.rtpx')):
+            opened = timeOpen(movie, prepacked, args.repeat)
+            seconds, packets = timePacketize(movie, prepacked)
+            print(f"  {label:<10} abertura {opened * 1000:8.3f} ms  empacotamento {seconds / args.frames * 1e6:7.1f} µs/quadro"
+                  f" ({packets} pacotes)")
+            result['rtpx' if prepacked else 'scan'] = {'openSeconds': opened, 'packetizeSeconds': seconds, 'packets': packets}
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
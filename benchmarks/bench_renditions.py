@@ -0,0 +1,61 @@
+"""Benchmark da geração de versões (RenditionBuilder) com 1..N processos.
+
+Gera um vídeo MJPEG determinístico de quadros JPEG reais (gradiente com
+ruído) e mede quadros/s da reencodificação na escada de qualidade para
+cada número de processos do pool, com o ganho em relação a um processo.
+
+Uso: python3 benchmarks/bench_renditions.py [--frames 120] [--size 1280x720] [--jobs 1,2,4] [--json saida.json]
+"""
+import os, io, sys, json, random, tempfile, argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from PIL import Image
+from RenditionBuilder import build, parseLadder, DEFAULT_LADDER, CHUNK_FRAMES
+
+def makeJpegMovie(path, frames, size, seed=1234):
+    """Quadros baseline 4:2:0 que mudam a cada quadro (o cache do JPEG não ajuda)."""
+    rng = random.Random(seed)
+    width, height = size
+    base = Image.linear_gradient('L').resize(size).convert('RGB')
+    with open(path, 'wb') as f:
+        for n in range(frames):
+            noise = Image.frombytes('L', (width // 8, height // 8), bytes(rng.randrange(256) for _ in range(width * height // 64)))
+            frame = Image.blend(base, noise.resize(size).convert('RGB'), 0.3 + 0.2 * (n % 10) / 10)
+            buffer = io.BytesIO()
+            frame.save(buffer, 'JPEG', quality=90, subsampling=2)
+            f.write(buffer.getvalue())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--jobs", default=",".join(str(j) for j in sorted({1, 2, 4, os.cpu_count() or 1})))
+    parser.add_argument("--ladder", default=DEFAULT_LADDER)
+    parser.add_argument("--chunk", type=int, default=CHUNK_FRAMES)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+    size = tuple(int(x) for x in args.size.split('x'))
+    ladder = parseLadder(args.ladder)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        movie = os.path.join(tmp, "bench.Mjpeg")
+        makeJpegMovie(movie, args.frames, size)
+        print(f"{args.frames} quadros {size[0]}x{size[1]}, {os.path.getsize(movie) / 1e6:.1f} MB, "
+              f"{os.cpu_count()} núcleo(s), escada {args.ladder}")
+        baseline = None
+        for jobs in [int(x) for x in args.jobs.split(',')]:
+            summary = build(movie, ladder, jobs, args.chunk)
+            fps = summary['frames'] / summary['seconds']
+            baseline = baseline or fps
+            print(f"  {jobs} processo(s): {summary['seconds']:.2f} s, {fps:.1f} quadros/s, ganho {fps / baseline:.2f}x")
+            results.append({'jobs': jobs, 'seconds': summary['seconds'], 'framesPerSecond': fps,
+                            'speedup': fps / baseline, 'frames': summary['frames']})
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Benchmark do caminho de recepção do cliente, reproduzindo uma captura RTP.
+
+Os datagramas de um `.rtpcap` (gravado com `HeadlessClient.py --capture`)
+passam por um socket UDP local até o `RtpReceiver` e seguem as etapas do
+`Client.listenRtp`: estatísticas de recepção e NACK, remontagem RFC 2435 e
+decodificação (`FrameDecoder.decode`), sem Tk. A reprodução vai o mais
+rápido possível (`--rate 0`) ou no ritmo da captura multiplicado por
+`--rate`. Perda e reordenação são injetadas com semente fixa, e as etapas
+recebem os instantes de chegada da captura, então quadros, perdas e NACKs
+se repetem entre execuções; só os tempos variam.
+
+Sem captura, `--movie` gera uma a partir de um `.Mjpeg`, no ritmo nominal.
+O pico de memória vem de uma passada à parte com `tracemalloc` (que só vê
+as alocações do Python, não os buffers de imagem do Pillow).
+
+Uso: python3 benchmarks/bench_replay.py captura.rtpcap [--rate 0] [--loss 0.01] [--reorder 0.02] [--repeat 3] [--json saida.json]
+     python3 benchmarks/bench_replay.py --movie movie.Mjpeg [...]
+"""
+import os, sys, json, time, random, socket, argparse, tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from RtpCapture import readCapture, summarize
+from RtpReceiver import RtpReceiver, MAX_BATCH
+from Rfc2435 import Rfc2435Reassembler, Rfc2435Packetizer
+from FramePacketizer import packetizeFrame, MAX_RTP_PAYLOAD, CLOCK_RATE
+from FrameDecoder import FrameDecoder
+from VideoStream import VideoStream
+from Rtcp import ReceptionStats, NackTracker
+
+# mesmo tamanho de exibição do Client
+DISPLAY_SIZE = (640, 480)
+STAGES = ('recepção', 'estatísticas', 'remontagem', 'decodificação')
+
+def packetizeMovie(filename, seed=1234):
+    """Captura sintética: os pacotes que o servidor mandaria, chegando no ritmo nominal."""
+    rng = random.Random(seed)
+    stream = VideoStream(filename, prepacked=False)
+    try:
+        fps = stream.frameRate()
+        packetizer = Rfc2435Packetizer(MAX_RTP_PAYLOAD)
+        seq, ssrc = rng.randrange(0x10000), rng.randrange(1, 0x100000000)
+        records = []
+        for n in range(stream.frameCount()):
+            frame = stream.nextFrame()
+            timestamp = round(n * CLOCK_RATE / fps)
+            packets = packetizeFrame(stream, n, frame, seq, ssrc, timestamp, packetizer)
+            seq = (seq + len(packets)) & 0xFFFF
+            # fragmentos de um quadro espalhados na primeira metade do intervalo, como nas rajadas do servidor
+            step = 0.5 / fps / len(packets)
+            records.extend((n / fps + i * step, b"".join((header, payload)))
+                           for i, (header, payload) in enumerate(packets))
+    finally:
+        stream.close()
+    return records
+
+def perturb(records, loss=0.0, reorder=0.0, depth=8, seed=1):
+    """Perda e reordenação determinísticas; os instantes de chegada ficam nas posições."""
+    rng = random.Random(seed)
+    kept = [r for r in records if not (loss and rng.random() < loss)]
+    datagrams = [d for _, d in kept]
+    for i in range(len(datagrams) - 1):
+        if reorder and rng.random() < reorder:
+            j = min(len(datagrams) - 1, i + rng.randint(1, depth))
+            datagrams[i], datagrams[j] = datagrams[j], datagrams[i]
+    return [(t, d) for (t, _), d in zip(kept, datagrams)]
+
+def openLoopback():
+    """Par de sockets UDP em 127.0.0.1: o de envio já conectado ao de recepção."""
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2 * 1024 * 1024)
+    rx.bind(("127.0.0.1", 0))
+    rx.setblocking(False)
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    tx.connect(rx.getsockname())
+    return tx, rx
+
+def replay(records, rate=0.0, decode=True, size=DISPLAY_SIZE):
+    """Reproduz `records` no caminho de recepção; devolve contagens e tempos por etapa."""
+    tx, rx = openLoopback()
+    receiver = RtpReceiver(rx, slots=MAX_BATCH)
+    reception = ReceptionStats()
+    nack = NackTracker()
+    reassembler = Rfc2435Reassembler()
+    decoder = FrameDecoder(size)
+    stages = dict.fromkeys(STAGES, 0.0)
+    frames = decoded = errors = nacked = 0
+    clock = time.perf_counter
+    origin = records[0][0] if records else 0.0
+    started = clock()
+    i = 0
+    try:
+        while i < len(records):
+            if rate > 0:
+                wait = (records[i][0] - origin) / rate - (clock() - started)
+                if wait > 0:
+                    time.sleep(wait)
+                due = origin + (clock() - started) * rate
+                end = i + 1
+                while end < len(records) and end - i < MAX_BATCH and records[end][0] <= due:
+                    end += 1
+            else:
+                end = min(len(records), i + MAX_BATCH)
+            for _, datagram in records[i:end]:
+                tx.send(datagram)
+            arrivals = [t for t, _ in records[i:end]]
+            i = end
+
+            t0 = clock()
+            batch = []
+            while True:
+                got = receiver.receiveBatch()
+                if not got:
+                    break
+                batch.extend(got)
+            payloads = [receiver.take(d[0], d[1], d[2]) for d in batch]
+            t1 = clock()
+            # o relógio das etapas é o da captura: NACK e jitter não dependem da velocidade da máquina
+            for (_, _, _, seq, timestamp, _, _, ssrc, _), now in zip(batch, arrivals):
+                reception.update(ssrc, seq, timestamp, now)
+                nack.onPacket(seq, now)
+                nacked += len(nack.due(now))
+            t2 = clock()
+            complete = []
+            for (_, _, _, seq, timestamp, marker, pt, _, _), payload in zip(batch, payloads):
+                frame = reassembler.push(timestamp, seq, marker, payload, pt)
+                if frame is not None:
+                    complete.append(frame)
+            t3 = clock()
+            frames += len(complete)
+            if decode:
+                for frame in complete:
+                    try:
+                        decoder.decode(frame)
+                        decoded += 1
+                    except Exception:
+                        errors += 1
+            t4 = clock()
+            stages['recepção'] += t1 - t0
+            stages['estatísticas'] += t2 - t1
+            stages['remontagem'] += t3 - t2
+            stages['decodificação'] += t4 - t3
+    finally:
+        wall = clock() - started
+        tx.close()
+        rx.close()
+    return {
+        'datagrams': receiver.received,
+        'overruns': receiver.overruns,
+        'malformed': receiver.malformed,
+        'frames': frames,
+        'decoded': decoded,
+        'decodeErrors': errors,
+        'framesDropped': reassembler.dropped,
+        'loss': reception.lossRatio(),
+        'nacked': nacked,
+        'wallSeconds': wall,
+        'stageSeconds': stages,
+    }
+
+def peakMemory(records, rate, decode, size):
+    """Pico de memória do Python (bytes) numa passada com `tracemalloc`."""
+    tracemalloc.start()
+    try:
+        replay(records, rate, decode, size)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capture", nargs='?', help="arquivo .rtpcap")
+    parser.add_argument("--movie", help="gera a captura a partir deste .Mjpeg em vez de ler um .rtpcap")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="ritmo em relação à captura (1 = tempo real); 0 = o mais rápido possível")
+    parser.add_argument("--loss", type=float, default=0.0, help="fração de datagramas descartados")
+    parser.add_argument("--reorder", type=float, default=0.0, help="fração de datagramas trocados com um seguinte")
+    parser.add_argument("--reorder-depth", type=int, default=8, help="distância máxima da troca, em datagramas")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="passadas cronometradas (vale a mais rápida)")
+    parser.add_argument("--size", default="%dx%d" % DISPLAY_SIZE, help="tamanho de exibição da decodificação")
+    parser.add_argument("--no-decode", action="store_true", help="para na remontagem")
+    parser.add_argument("--no-memory", action="store_true", help="pula a passada com tracemalloc")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+    if not args.capture and not args.movie:
+        parser.error("informe uma captura .rtpcap ou --movie")
+    size = tuple(int(x) for x in args.size.split('x'))
+    decode = not args.no_decode
+
+    records = packetizeMovie(args.movie) if args.movie else readCapture(args.capture)
+    s = summarize(records)
+    print(f"{args.movie or args.capture}: {s['datagrams']} datagramas, {s['frames']} quadros, "
+          f"{s['bytes'] / 1e6:.1f} MB, {s['duration']:.1f} s capturados")
+    records = perturb(records, args.loss, args.reorder, args.reorder_depth, args.seed)
+    print(f"reprodução: {'o mais rápido possível' if args.rate <= 0 else '%gx o tempo real' % args.rate}, "
+          f"perda {args.loss * 100:g}%, reordenação {args.reorder * 100:g}% (até {args.reorder_depth}), semente {args.seed}")
+
+    runs = [replay(records, args.rate, decode, size) for _ in range(max(1, args.repeat))]
+    best = min(runs, key=lambda r: sum(r['stageSeconds'].values()))
+    pipeline = sum(best['stageSeconds'].values())
+    frames = best['decoded'] if decode else best['frames']
+    result = dict(best, pipelineSeconds=pipeline,
+                  framesPerSecond=frames / pipeline if pipeline else 0.0,
+                  peakMemoryBytes=None if args.no_memory else peakMemory(records, args.rate, decode, size))
+
+    print(f"  quadros: {best['frames']} completos, {best['decoded']} decodificados, {best['framesDropped']} descartados, "
+          f"{best['decodeErrors']} com erro")
+    print(f"  perda vista: {best['loss'] * 100:.2f}%, NACK: {best['nacked']} pedidos, overruns: {best['overruns']}")
+    print(f"  {result['framesPerSecond']:.1f} quadros/s no pipeline ({pipeline:.3f} s; {best['wallSeconds']:.3f} s de relógio)")
+    for stage in STAGES:
+        seconds = best['stageSeconds'][stage]
+        perFrame = seconds / frames * 1e6 if frames else 0.0
+        print(f"    {stage:<14} {seconds * 1000:9.1f} ms  {perFrame:8.1f} µs/quadro  {seconds / pipeline * 100 if pipeline else 0:5.1f}%")
+    if result['peakMemoryBytes'] is not None:
+        print(f"  pico de memória (tracemalloc): {result['peakMemoryBytes'] / 1e6:.2f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Micro-benchmark do codec RTP: implementação antiga (byte a byte) x atual.
+
+Uso: python3 benchmarks/bench_rtppacket.py [n_pacotes]
+"""
+import os, sys, timeit
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from RtpPacket import RtpPacket, HEADER_SIZE
+
+class LegacyRtpPacket:
+    """Cópia da implementação original, como referência."""
+
+    def encode(self, version, padding, extension, cc, seqnum, marker, pt, ssrc, payload):
+        timestamp = int(time())
+        header = bytearray(HEADER_SIZE)
+        header[0] = ((version & 0x03) << 6) | ((padding & 0x01) << 5) | ((extension & 0x01) << 4) | (cc & 0x0F)
+        header[1] = ((marker & 0x01) << 7) | (pt & 0x7F)
+        header[2] = (seqnum >> 8) & 0xFF
+        header[3] = seqnum & 0xFF
+        header[4] = (timestamp >> 24) & 0xFF
+        header[5] = (timestamp >> 16) & 0xFF
+        header[6] = (timestamp >> 8) & 0xFF
+        header[7] = timestamp & 0xFF
+        header[8] = (ssrc >> 24) & 0xFF
+        header[9] = (ssrc >> 16) & 0xFF
+        header[10] = (ssrc >> 8) & 0xFF
+        header[11] = ssrc & 0xFF
+        self.header = header
+        self.payload = payload
+
+    def decode(self, byteStream):
+        self.header = bytearray(byteStream[:HEADER_SIZE])
+        self.payload = byteStream[HEADER_SIZE:]
+
+    def seqNum(self):
+        return int(self.header[2] << 8 | self.header[3])
+
+    def timestamp(self):
+        return int(self.header[4] << 24 | self.header[5] << 16 | self.header[6] << 8 | self.header[7])
+
+    def getPacket(self):
+        return self.header + self.payload
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    payload = os.urandom(1400)
+    payloads = [memoryview(payload)] * 64
+    datagram = RtpPacket.packHeader(1, 0, 26, 0, 0) + payload
+
+    def legacyEncode():
+        p = LegacyRtpPacket()
+        p.encode(2, 0, 0, 0, 1, 0, 26, 0, payload)
+        return p.getPacket()
+
+    def newEncode():
+        p = RtpPacket()
+        p.encode(2, 0, 0, 0, 1, 0, 26, 0, payload)
+        return p.getPacket()
+
+    headerBuf = bytearray(HEADER_SIZE)
+    def newPackInto():
+        RtpPacket.packHeaderInto(headerBuf, 0, 1, 0, 26, 0, 0)
+
+    def legacyDecode():
+        p = LegacyRtpPacket()
+        p.decode(datagram)
+        return p.seqNum(), p.timestamp()
+
+    def newDecode():
+        p = RtpPacket()
+        p.decode(datagram)
+        return p.seqNum(), p.timestamp()
+
+    def newEncodeBatch():
+        RtpPacket.encodeBatch(payloads, 1, 26, 0, 0)
+
+    datagrams = [datagram] * 64
+    def newDecodeBatch():
+        for p in RtpPacket.decodeBatch(datagrams):
+            p.seqNum(), p.timestamp()
+
+    cases = [
+        ("encode+getPacket (antigo)", legacyEncode, 1),
+        ("encode+getPacket (novo)", newEncode, 1),
+        ("packHeaderInto (novo)", newPackInto, 1),
+        ("encodeBatch x64 (novo)", newEncodeBatch, 64),
+        ("decode+campos (antigo)", legacyDecode, 1),
+        ("decode+campos (novo)", newDecode, 1),
+        ("decodeBatch x64 (novo)", newDecodeBatch, 64),
+    ]
+    print(f"{'caso':<28}{'ns/pacote':>12}")
+    for name, fn, perCall in cases:
+        calls = max(1, n // perCall)
+        best = min(timeit.repeat(fn, number=calls, repeat=3))
+        print(f"{name:<28}{best / (calls * perCall) * 1e9:>12.0f}")
+
+if __name__ == "__main__":
+    main()
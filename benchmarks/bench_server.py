@@ -0,0 +1,122 @@
+"""Benchmark ponta a ponta do servidor em localhost.
+
+Gera um vídeo MJPEG sintético (determinístico), sobe `Server.py` em cada
+motor e mede, com o `LoadGenerator` do cliente sem interface, vazão, FPS
+por sessão, perda e jitter entre quadros para cada cenário.
+
+Com `--read-ms`, cada leitura do vídeo no servidor demora esse tempo a
+mais (o benchmark sobe o `Server.py` com `Prefetcher.readRange` e a leitura
+direta do `VideoStream.nextFrame` atrasados), e `--prefetch` varia a
+leitura antecipada: mostra se o envio segura o FPS com o disco lento.
+
+Com `--broadcast unicast,multicast`, as sessões de cada cenário assistem
+ao mesmo canal ao vivo (`Server.py --broadcast`); o multicast usa o grupo
+padrão pela interface de loopback.
+
+Uso: python3 benchmarks/bench_server.py [--duration 5] [--sessions 1,10,50] [--frame-kb 20,100] [--json saida.json]
+     python3 benchmarks/bench_server.py --sessions 3 --frame-kb 20 --read-ms 80 --prefetch 0,8
+     python3 benchmarks/bench_server.py --sessions 1,10 --frame-kb 20 --broadcast off,unicast,multicast
+"""
+import os, sys, json, random, runpy, socket, subprocess, tempfile, time, argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from HeadlessClient import LoadGenerator, printReport
+
+def makeSyntheticMovie(path, frameBytes, frames=300, seed=1234):
+    """Quadros SOI + bytes sem 0xFF + EOI: o servidor só enxerga os marcadores."""
+    rng = random.Random(seed)
+    with open(path, 'wb') as f:
+        for _ in range(frames):
+            body = bytes(rng.randrange(0, 255) for _ in range(64))
+            f.write(b'\xff\xd8' + body * (frameBytes // len(body)) + b'\xff\xd9')
+
+def freePort():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def serveWithReadDelay(readMs):
+    """Roda o `Server.py` (argumentos em `sys.argv`) com `readMs` somados a cada leitura do vídeo."""
+    from Prefetcher import Prefetcher
+    from VideoStream import VideoStream
+    delay = readMs / 1000
+    readRange, nextFrame = Prefetcher.readRange, VideoStream.nextFrame
+
+    def slowReadRange(self, offset, length):
+        time.sleep(delay)
+        return readRange(self, offset, length)
+
+    def slowNextFrame(self):
+        # só a leitura direta vai ao disco; quadro já lido antecipadamente sai da memória
+        n = self.frameNum
+        if n < len(self.starts) and (self.prefetcher is None or not self.prefetcher.isReady(n)):
+            time.sleep(delay)
+        return nextFrame(self)
+
+    Prefetcher.readRange = slowReadRange
+    VideoStream.nextFrame = slowNextFrame
+    runpy.run_path(os.path.join(ROOT, 'Server.py'), run_name='__main__')
+
+def startServer(port, engine, cwd, workers=1, extra=(), readMs=0.0):
+    command = [sys.executable, os.path.join(ROOT, 'Server.py')]
+    if readMs:
+        bench = os.path.dirname(os.path.abspath(__file__))
+        command = [sys.executable, '-c', 'import sys; sys.path.insert(0, %r); import bench_server; '
+                   'bench_server.serveWithReadDelay(%r)' % (bench, readMs)]
+    proc = subprocess.Popen(command + [str(port), '--engine', engine, '--workers', str(workers)] + list(extra),
+                            cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("servidor não subiu")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--sessions", default="1,10,50")
+    parser.add_argument("--frame-kb", default="20,100")
+    parser.add_argument("--engines", default="thread,asyncio")
+    parser.add_argument("--workers", type=int, default=1, help="processos servidores (Server.py --workers)")
+    parser.add_argument("--read-ms", type=float, default=0.0, help="atraso simulado por leitura do vídeo no servidor")
+    parser.add_argument("--prefetch", default="8", help="profundidades da leitura antecipada a comparar (0 desativa)")
+    parser.add_argument("--broadcast", default="off", help="modos de Server.py --broadcast a comparar (off,unicast,multicast)")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for frameKb in [int(x) for x in args.frame_kb.split(',')]:
+            movie = f"synthetic-{frameKb}k.Mjpeg"
+            makeSyntheticMovie(os.path.join(tmp, movie), frameKb * 1024)
+            for engine in args.engines.split(','):
+                for prefetch in [int(x) for x in args.prefetch.split(',')]:
+                    for broadcast in args.broadcast.split(','):
+                        for sessions in [int(x) for x in args.sessions.split(',')]:
+                            port = freePort()
+                            extra = ['--prefetch', str(prefetch), '--broadcast', broadcast]
+                            server = startServer(port, engine, tmp, args.workers, extra, args.read_ms)
+                            try:
+                                report = LoadGenerator("127.0.0.1", port, movie, sessions).run(args.duration)
+                            finally:
+                                server.terminate()
+                                server.wait()
+                            print(f"\n== motor={engine} processos={args.workers} quadro={frameKb} KB sessões={sessions}"
+                                  f" leitura antecipada={prefetch} atraso de leitura={args.read_ms:g} ms broadcast={broadcast}")
+                            printReport(report)
+                            del report['perSession']
+                            report.update(engine=engine, workers=args.workers, frameKb=frameKb, prefetch=prefetch,
+                                          readMs=args.read_ms, broadcast=broadcast)
+                            results.append(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os, sys, socket, subprocess, time
+import pytest
+
+# os módulos ficam soltos na raiz do repositório
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+def freePort():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@pytest.fixture
+def startServer():
+    """Sobe `Server.py` num diretório (com opções extras); devolve a porta RTSP."""
+    servers = []
+
+    def start(cwd, *args):
+        port = freePort()
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'Server.py'), str(port)] + list(args),
+                                  cwd=str(cwd), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        servers.append(server)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                return port
+            except OSError:
+                if time.monotonic() > deadline:
+                    pytest.fail("servidor não subiu")
+                time.sleep(0.05)
+
+    yield start
+    for server in servers:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,53 @@
+import os, time
+import pytest
+from BroadcastHub import BroadcastHub
+from HeadlessClient import LoadGenerator
+
+MOVIE = "bcast.Mjpeg"
+
+def writeMovie(directory, frames=60):
+    # quadros SOI + corpo sem 0xFF + EOI: vão como JFIF fatiado (PT 96)
+    with open(os.path.join(directory, MOVIE), 'wb') as f:
+        for n in range(frames):
+            f.write(b"\xff\xd8" + bytes([n % 200]) * 4000 + b"\xff\xd9")
+
+class StubWorker:
+    def __init__(self):
+        self.scheduled = []
+
+    def clock(self):
+        scheduled = self.scheduled
+        return time.monotonic, lambda deadline, callback: scheduled.append(callback)
+
+    def localAddress(self):
+        return "127.0.0.1"
+
+def test_channel_does_not_keep_the_first_session(tmp_path, monkeypatch):
+    writeMovie(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    hub = BroadcastHub()
+    first, second = StubWorker(), StubWorker()
+    channel = hub.join(MOVIE, first)
+    assert hub.join(MOVIE, second) is channel
+    hub.leave(channel, first)
+    assert getattr(channel.now, '__self__', None) is not first
+    assert getattr(channel.scheduleAt, '__self__', None) is not first
+    hub.leave(channel, second)
+    assert MOVIE not in [os.path.basename(p) for p in hub.channels]
+    for callback in first.scheduled:
+        callback()
+
+@pytest.mark.parametrize("mode", ["unicast", "multicast"])
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_broadcast_over_loopback(tmp_path, startServer, mode, engine):
+    writeMovie(str(tmp_path))
+    port = startServer(tmp_path, '--engine', engine, '--broadcast', mode)
+    try:
+        report = LoadGenerator("127.0.0.1", port, MOVIE, sessions=2).run(1.5)
+    except OSError as e:
+        if mode == "multicast":
+            pytest.skip("multicast indisponível nesta máquina: %s" % e)
+        raise
+    # ~45 quadros em 1,5 s a 30 fps: as duas sessões recebem o mesmo canal
+    for session in report['perSession']:
+        assert session['frames'] >= 30
@@ -0,0 +1,33 @@
+import os
+from MediaCatalog import MediaCatalog
+
+FRAME = b"\xff\xd8" + b"\x00" * 32 + b"\xff\xd9"
+
+def makeTree(tmp_path):
+    root = tmp_path / "media"
+    root.mkdir()
+    (root / "movie.Mjpeg").write_bytes(FRAME * 3)
+    (root / "notes.txt").write_bytes(FRAME)
+    (tmp_path / "secret.Mjpeg").write_bytes(FRAME)
+    return root
+
+def test_lookup_serves_media_inside_root(tmp_path):
+    catalog = MediaCatalog(str(makeTree(tmp_path)))
+    entry = catalog.lookup("movie.Mjpeg")
+    assert entry is not None and entry['frameCount'] == 3
+    assert catalog.describe("movie.Mjpeg", 1, "127.0.0.1", 0) is not None
+
+def test_lookup_rejects_paths_outside_root(tmp_path):
+    root = makeTree(tmp_path)
+    catalog = MediaCatalog(str(root))
+    assert catalog.lookup("../secret.Mjpeg") is None
+    assert catalog.lookup(str(tmp_path / "secret.Mjpeg")) is None
+    assert catalog.describe("sub/../../secret.Mjpeg", 1, "127.0.0.1", 0) is None
+
+def test_lookup_rejects_symlink_escaping_root(tmp_path):
+    root = makeTree(tmp_path)
+    os.symlink(tmp_path / "secret.Mjpeg", root / "link.Mjpeg")
+    assert MediaCatalog(str(root)).lookup("link.Mjpeg") is None
+
+def test_lookup_rejects_other_extensions(tmp_path):
+    assert MediaCatalog(str(makeTree(tmp_path))).lookup("notes.txt") is None
@@ -0,0 +1,47 @@
+from PacketHistory import PacketHistory
+from Rtcp import NackTracker
+
+def packets(count):
+    return [(b"h%d" % i, b"p%d" % i) for i in range(count)]
+
+def test_history_across_sequence_wrap():
+    history = PacketHistory(size=1024, budget=0.2)
+    sent = packets(6)
+    history.store(65533, sent, now=10.0)
+    # 65533, 65534, 65535, 0, 1, 2
+    assert history.retransmit([65535, 0, 2], now=10.05) == [sent[2], sent[3], sent[5]]
+
+def test_history_slot_reused_after_wrap_forgets_old_packet():
+    history = PacketHistory(size=1024)
+    history.store(5, packets(1), now=1.0)
+    history.store(5 + 1024, packets(1), now=1.0)
+    assert history.retransmit([5], now=1.01) == []
+
+def test_history_budget_expiry_and_holdoff():
+    history = PacketHistory(budget=0.2, holdoff=0.01)
+    sent = packets(1)
+    history.store(100, sent, now=0.0)
+    assert history.retransmit([100], now=0.1) == sent
+    # pedido repetido dentro do holdoff é ignorado
+    assert history.retransmit([100], now=0.105) == []
+    assert history.retransmit([100], now=0.15) == sent
+    # velho demais: já passou do ponto de exibição
+    assert history.retransmit([100], now=0.25) == []
+
+def test_nack_tracker_gap_across_wrap():
+    nack = NackTracker(reorderDelay=0.005)
+    nack.onPacket(65534, 0.0)
+    nack.onPacket(1, 0.001)           # faltam 65535 e 0
+    assert nack.due(0.002) == []      # ainda pode ser só reordenação
+    assert sorted(nack.due(0.01)) == [0, 65535]
+    nack.onPacket(65535, 0.02)
+    assert nack.recovered == 1
+    assert nack.due(0.05) == [0]
+
+def test_nack_tracker_gives_up_after_max_age():
+    nack = NackTracker(reorderDelay=0.005, retryInterval=0.03, maxAge=0.25, maxRetries=10)
+    nack.onPacket(10, 0.0)
+    nack.onPacket(12, 0.0)
+    assert nack.due(0.01) == [11]
+    assert nack.due(0.3) == []
+    assert not nack.pending
@@ -0,0 +1,55 @@
+import io, random
+from PIL import Image
+from RtpPacket import HEADER_SIZE
+from Rfc2435 import Rfc2435Packetizer, Rfc2435Reassembler, Q_INBAND
+from FramePacketizer import packetizeFrame, MAX_RTP_PAYLOAD
+from VideoStream import VideoStream
+import Prepack
+
+def makeJpeg(quality, seed=1, size=(64, 48)):
+    rng = random.Random(seed)
+    image = Image.frombytes('RGB', size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3)))
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=quality, subsampling=2)
+    return out.getvalue()
+
+def pixels(jpeg):
+    return Image.open(io.BytesIO(jpeg)).convert('RGB').tobytes()
+
+def receive(reassembler, packets, timestamp):
+    frame = None
+    for header, payload in packets:
+        seq = (header[2] << 8) | header[3]
+        frame = reassembler.push(timestamp, seq, header[1] >> 7, bytes(header[HEADER_SIZE:]) + bytes(payload))
+    return frame
+
+def test_prepacked_q_does_not_collide_with_live_packetizer(tmp_path):
+    live, prepacked = makeJpeg(50, seed=1), makeJpeg(90, seed=2)
+    path = str(tmp_path / "hq.Mjpeg")
+    with open(path, 'wb') as f:
+        f.write(prepacked * 2)
+    Prepack.convert(path)
+    stream = VideoStream(path)
+    assert stream.prepacked is not None and stream.prepacked.q[0] == Q_INBAND
+
+    # a sessão tocava outra versão sem `.rtpx` e já deu o primeiro Q às tabelas dela
+    packetizer = Rfc2435Packetizer(MAX_RTP_PAYLOAD)
+    reassembler = Rfc2435Reassembler()
+    first = packetizer.packetize(live, 0, 1, 0)
+    assert first[0][0][HEADER_SIZE + 5] == Q_INBAND
+    assert pixels(receive(reassembler, first, 0)) == pixels(live)
+    try:
+        seq = len(first)
+        for n, timestamp in ((0, 3000), (1, 6000)):
+            packets = packetizeFrame(stream, n, stream.nextFrame(), seq, 1, timestamp, packetizer)
+            seq += len(packets)
+            # outro Q em todos os fragmentos; as tabelas só vão no primeiro quadro
+            assert {header[HEADER_SIZE + 5] for header, _ in packets} == {Q_INBAND + 1}
+            assert (packets[0][0][HEADER_SIZE + 10 : HEADER_SIZE + 12] == b'\x00\x00') == (n == 1)
+            assert pixels(receive(reassembler, packets, timestamp)) == pixels(prepacked)
+    finally:
+        stream.close()
+    # de volta à versão ao vivo: o Q dela continua com as tabelas certas no receptor
+    again = packetizer.packetize(live, seq, 1, 9000)
+    assert again[0][0][HEADER_SIZE + 10 : HEADER_SIZE + 12] == b'\x00\x00'
+    assert pixels(receive(reassembler, again, 9000)) == pixels(live)
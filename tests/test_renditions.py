@@ -0,0 +1,57 @@
+import io, os, random, select, time
+import pytest
+from PIL import Image
+from HeadlessClient import HeadlessSession
+from MediaCatalog import renditionDir
+from Rfc2435 import PT_JPEG
+import RenditionBuilder
+
+def makeMovie(path, frames=90, size=(128, 96)):
+    rng = random.Random(1)
+    with open(path, 'wb') as f:
+        for _ in range(frames):
+            image = Image.frombytes('RGB', size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3)))
+            out = io.BytesIO()
+            image.save(out, 'JPEG', quality=80, subsampling=2)
+            f.write(out.getvalue())
+
+def receive(session, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if select.select([session.rtpSocket], [], [], 0.05)[0]:
+            session.onReadable()
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_switch_rendition_while_playing(tmp_path, startServer, engine):
+    movie = str(tmp_path / "movie.Mjpeg")
+    makeMovie(movie)
+    RenditionBuilder.build(movie, [("small", 48, 50), ("tiny", 32, 40)], jobs=1)
+    folder = renditionDir(movie)
+    # sem `.rtpx`, abrir a versão varre o arquivo: é o que não pode rodar no laço de envio
+    os.remove(os.path.join(folder, "small.Mjpeg.rtpx"))
+    os.remove(os.path.join(folder, "tiny.Mjpeg"))
+    port = startServer(tmp_path, '--engine', engine)
+
+    session = HeadlessSession("127.0.0.1", port, "movie.Mjpeg")
+    widths = []
+    # largura/8 do cabeçalho RFC 2435 de cada fragmento
+    session.receiver.tap = lambda datagram, arrival: datagram[1] & 0x7F == PT_JPEG and widths.append(datagram[18])
+    try:
+        session.connect()
+        assert session.setup().statusCode == 200
+        assert session.play().statusCode == 200
+        receive(session, 0.3)
+        assert widths and set(widths) == {128 // 8}
+
+        # versão listada no catálogo, mas sem arquivo: a troca é recusada e nada muda
+        assert session.setRendition("tiny").statusCode == 404
+        assert session.setRendition("small").statusCode == 200
+        reply = session.request("GET_PARAMETER")
+        assert "rendition: small" in reply.body
+        before = len(widths)
+        receive(session, 0.3)
+        after = widths[before:]
+        assert after and after[-1] == 64 // 8
+        assert session.report(0.6)['frames'] > 0 and session.reassembler.dropped == 0
+    finally:
+        session.teardown()
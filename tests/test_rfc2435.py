@@ -0,0 +1,86 @@
+import io, random
+import pytest
+from PIL import Image
+from RtpPacket import RtpPacket, HEADER_SIZE
+from Rfc2435 import Rfc2435Packetizer, Rfc2435Reassembler, parseJpeg, PT_JPEG, PT_JFIF, Q_INBAND
+
+MAX_PAYLOAD = 400
+
+def makeJpeg(seed=1, size=(64, 48), **options):
+    """JPEG com ruído (varredura de vários fragmentos); baseline 4:2:0 por padrão."""
+    rng = random.Random(seed)
+    image = Image.frombytes('RGB', size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3)))
+    out = io.BytesIO()
+    image.save(out, 'JPEG', **dict(dict(quality=90, subsampling=2), **options))
+    return out.getvalue()
+
+def fragments(packets):
+    """(seq, marcador, payload) como o receptor os vê: cabeçalho RFC 2435 + dados."""
+    out = []
+    for header, payload in packets:
+        seq = (header[2] << 8) | header[3]
+        out.append((seq, header[1] >> 7, bytes(header[HEADER_SIZE:]) + bytes(payload)))
+    return out
+
+def pixels(jpeg):
+    return Image.open(io.BytesIO(jpeg)).convert('RGB').tobytes()
+
+def test_round_trip_baseline_jpeg():
+    data = makeJpeg()
+    packets = Rfc2435Packetizer(MAX_PAYLOAD).packetize(data, 65530, 0x1234, 9000)
+    assert packets is not None and len(packets) > 2
+    assert all(header[1] & 0x7F == PT_JPEG for header, _ in packets)
+    reassembler = Rfc2435Reassembler()
+    out = [reassembler.push(9000, seq, marker, payload) for seq, marker, payload in fragments(packets)]
+    assert out[:-1] == [None] * (len(packets) - 1)
+    frame = out[-1]
+    # cabeçalho refeito, mesma varredura e mesma imagem decodificada
+    parsed = parseJpeg(data)
+    assert bytes(data[parsed.scanStart : parsed.scanEnd]) in frame
+    assert pixels(frame) == pixels(data)
+
+def test_out_of_order_fragments():
+    data = makeJpeg(seed=2)
+    received = fragments(Rfc2435Packetizer(MAX_PAYLOAD).packetize(data, 100, 1, 0))
+    random.Random(3).shuffle(received)
+    reassembler = Rfc2435Reassembler()
+    frames = [f for f in (reassembler.push(0, *fragment) for fragment in received) if f is not None]
+    assert len(frames) == 1 and pixels(frames[0]) == pixels(data)
+    # reenvio tardio de um fragmento do quadro entregue não gera outro quadro
+    assert reassembler.push(0, *received[0]) is None
+
+def test_frame_dropped_when_inband_tables_were_lost():
+    data = makeJpeg(seed=4)
+    packetizer = Rfc2435Packetizer(MAX_PAYLOAD)
+    reassembler = Rfc2435Reassembler()
+    first = fragments(packetizer.packetize(data, 0, 1, 0))
+    assert first[0][2][5] >= Q_INBAND
+    # o fragmento com as tabelas se perde: o quadro não se completa
+    assert all(reassembler.push(0, *fragment) is None for fragment in first[1:])
+    # o seguinte usa o mesmo Q sem tabelas; o receptor não as conhece e o descarta
+    second = fragments(packetizer.packetize(data, len(first), 1, 3000))
+    assert second[0][2][10:12] == b'\x00\x00' and first[0][2][10:12] == b'\x00\x80'
+    assert [reassembler.push(3000, *fragment) for fragment in second] == [None] * len(second)
+    assert reassembler.dropped == 1
+    # com as tabelas reenviadas, volta a remontar
+    packetizer.resendTables()
+    third = fragments(packetizer.packetize(data, len(first) + len(second), 1, 6000))
+    assert pixels([reassembler.push(6000, *fragment) for fragment in third][-1]) == pixels(data)
+
+@pytest.mark.parametrize("options", [dict(progressive=True), dict(subsampling=0)], ids=["progressive", "4:4:4"])
+def test_unsupported_jpeg_falls_back_to_jfif(options):
+    data = makeJpeg(seed=5, **options)
+    assert Rfc2435Packetizer(MAX_PAYLOAD).packetize(data, 0, 1, 0) is None
+    # como o servidor faz: o JFIF inteiro fatiado, em PT 96
+    view = memoryview(data)
+    payloads = [view[i : i + MAX_PAYLOAD] for i in range(0, len(view), MAX_PAYLOAD)]
+    packets = RtpPacket.encodeBatch(payloads, 200, PT_JFIF, 1, 0)
+    reassembler = Rfc2435Reassembler()
+    out = [reassembler.push(0, seq, marker, payload, PT_JFIF) for seq, marker, payload in fragments(packets)]
+    assert out[-1] == data
+
+def test_grayscale_jpeg_is_not_rfc2435():
+    rng = random.Random(6)
+    out = io.BytesIO()
+    Image.frombytes('L', (32, 32), bytes(rng.randrange(256) for _ in range(1024))).save(out, 'JPEG')
+    assert parseJpeg(out.getvalue()) is None
@@ -0,0 +1,24 @@
+from RtpPacket import RtpPacket, HEADER_SIZE
+
+def test_decode_from_buffer_round_trips():
+    packet = RtpPacket()
+    packet.encode(2, 0, 0, 0, 65535, 1, 26, 0x12345678, b"payload")
+    data = packet.getPacket()
+
+    # buffer reaproveitado, como os slots do RtpReceiver
+    buffer = bytearray(2048)
+    buffer[:len(data)] = data
+    decoded = RtpPacket()
+    decoded.decode(memoryview(buffer)[:len(data)])
+
+    assert decoded.getPacket() == data
+    assert bytes(decoded.getPayload()) == b"payload"
+    assert (decoded.seqNum(), decoded.marker(), decoded.payloadType(), decoded.ssrc()) == (65535, 1, 26, 0x12345678)
+
+def test_pack_into_matches_get_packet():
+    packet = RtpPacket()
+    packet.encode(2, 0, 0, 0, 7, 0, 96, 1, b"abc")
+    buffer = bytearray(64)
+    size = packet.packInto(buffer, 4)
+    assert size == HEADER_SIZE + 3
+    assert bytes(buffer[4 : 4 + size]) == packet.getPacket()
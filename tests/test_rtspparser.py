@@ -0,0 +1,58 @@
+import pytest
+from RtspParser import RtspParser, RtspParseError
+
+DESCRIBE = "DESCRIBE movie.Mjpeg RTSP/1.0\r\nCSeq: 1\r\nAccept: application/sdp\r\n\r\n"
+SETUP = "SETUP movie.Mjpeg RTSP/1.0\r\nCSeq: 2\r\nTransport: RTP/AVP;unicast;client_port=5008-5009\r\n\r\n"
+PLAY = "PLAY movie.Mjpeg RTSP/1.0\r\nCSeq: 3\r\nSession: 123456\r\nRange: npt=2.5-\r\n\r\n"
+
+def test_pipelined_requests_in_one_feed():
+    messages = RtspParser().feed((DESCRIBE + SETUP + PLAY).encode('utf-8'))
+    assert [m.method for m in messages] == ['DESCRIBE', 'SETUP', 'PLAY']
+    assert [m.cseq() for m in messages] == ['1', '2', '3']
+    assert messages[1].transportParam('client_port') == '5008-5009'
+    assert messages[2].session() == '123456'
+    assert messages[2].nptRange() == (2.5, None)
+
+@pytest.mark.parametrize("cut", [1, 20, len(SETUP) - 3, len(SETUP) - 2, len(SETUP) - 1])
+def test_request_split_across_feeds(cut):
+    # os cortes no fim caem dentro do CRLFCRLF
+    parser = RtspParser()
+    data = SETUP.encode('utf-8')
+    assert parser.feed(data[:cut]) == []
+    messages = parser.feed(data[cut:])
+    assert len(messages) == 1 and messages[0].method == 'SETUP'
+
+def test_request_fed_byte_by_byte():
+    parser = RtspParser()
+    messages = []
+    for byte in (DESCRIBE + PLAY).encode('utf-8'):
+        messages += parser.feed(bytes([byte]))
+    assert [m.method for m in messages] == ['DESCRIBE', 'PLAY']
+
+def test_body_framed_by_content_length_in_pieces():
+    body = "rendition: 240p\r\n"
+    request = (f"SET_PARAMETER movie.Mjpeg RTSP/1.0\r\nCSeq: 4\r\nSession: 1\r\n"
+               f"Content-Type: text/parameters\r\nContent-Length: {len(body)}\r\n\r\n{body}" + PLAY).encode('utf-8')
+    headEnd = request.index(b"\r\n\r\n") + 4
+    parser = RtspParser()
+    assert parser.feed(request[:headEnd]) == []
+    assert parser.feed(request[headEnd : headEnd + 5]) == []
+    messages = parser.feed(request[headEnd + 5:])
+    assert [m.method for m in messages] == ['SET_PARAMETER', 'PLAY']
+    assert messages[0].body == body
+    assert messages[0].parameters() == {'rendition': '240p'}
+
+def test_response_with_body():
+    sdp = "v=0\r\na=framerate:30\r\n"
+    reply = f"RTSP/1.0 200 OK\r\nCSeq: 1\r\nContent-Length: {len(sdp)}\r\n\r\n{sdp}".encode('utf-8')
+    message, = RtspParser().feed(reply)
+    assert message.isResponse() and message.statusCode == 200 and message.body == sdp
+
+def test_oversize_header_is_rejected():
+    parser = RtspParser(maxHeaderBytes=256)
+    with pytest.raises(RtspParseError):
+        parser.feed(b"SETUP movie.Mjpeg RTSP/1.0\r\nX-Padding: " + b"a" * 300)
+
+def test_oversize_body_is_rejected():
+    with pytest.raises(RtspParseError):
+        RtspParser(maxBodyBytes=10).feed(b"SET_PARAMETER x RTSP/1.0\r\nCSeq: 1\r\nContent-Length: 11\r\n\r\n")
@@ -0,0 +1,54 @@
+import sys, socket
+import pytest
+from RtspParser import RtspParser
+
+def request(sock, parser, text):
+    sock.sendall(text.encode('utf-8'))
+    replies = []
+    while not replies:
+        chunk = sock.recv(4096)
+        assert chunk, "conexão fechada sem resposta"
+        replies = parser.feed(chunk)
+    return replies[0]
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_setup_and_play_on_missing_file(tmp_path, startServer, engine):
+    (tmp_path / "movie.Mjpeg").write_bytes((b"\xff\xd8" + b"\x00" * 64 + b"\xff\xd9") * 3)
+    port = startServer(tmp_path, '--engine', engine)
+    parser = RtspParser()
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        reply = request(sock, parser, "SETUP nope.Mjpeg RTSP/1.0\r\nCSeq: 1\r\n"
+                                      "Transport: RTP/AVP;unicast;client_port=40000-40001\r\n\r\n")
+        assert reply.statusCode == 404
+        assert reply.session() is None
+        assert reply.header('transport') is None
+
+        # sem sessão não há o que tocar, mas o cliente recebe resposta
+        reply = request(sock, parser, "PLAY nope.Mjpeg RTSP/1.0\r\nCSeq: 2\r\n\r\n")
+        assert reply.statusCode == 455
+
+        # a conexão continua utilizável para um arquivo que existe
+        reply = request(sock, parser, "SETUP movie.Mjpeg RTSP/1.0\r\nCSeq: 3\r\n"
+                                      "Transport: RTP/AVP;unicast;client_port=40000-40001\r\n\r\n")
+        assert reply.statusCode == 200
+        assert reply.session()
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_session_expires_when_rtp_port_is_closed(tmp_path, startServer, engine):
+    if engine == "asyncio" and not sys.platform.startswith('linux'):
+        pytest.skip("a recusa só chega à sessão pela fila de erros do Linux")
+    (tmp_path / "movie.Mjpeg").write_bytes((b"\xff\xd8" + b"\x00" * 64 + b"\xff\xd9") * 300)
+    port = startServer(tmp_path, '--engine', engine)
+    # porta UDP sem ninguém ouvindo: cada envio volta como ICMP "porta inalcançável"
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as closed:
+        closed.bind(("127.0.0.1", 0))
+        rtpPort = closed.getsockname()[1]
+    parser = RtspParser()
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        reply = request(sock, parser, "SETUP movie.Mjpeg RTSP/1.0\r\nCSeq: 1\r\n"
+                                      "Transport: RTP/AVP;unicast;client_port=%d-%d\r\n\r\n" % (rtpPort, rtpPort + 1))
+        assert reply.statusCode == 200
+        reply = request(sock, parser, "PLAY movie.Mjpeg RTSP/1.0\r\nCSeq: 2\r\nSession: %s\r\n\r\n" % reply.session())
+        assert reply.statusCode == 200
+        # bem antes do timeout da sessão, o servidor desiste e fecha a conexão
+        assert sock.recv(4096) == b""